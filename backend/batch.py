@@ -0,0 +1,106 @@
+"""
+Batch queries for the FastAPI backend.
+Answers several GET API requests in one round trip: each sub-query is run
+in-process through the full application (validation, response cache,
+errors) and the response bodies are spliced into one JSON document.
+"""
+
+import json
+from typing import List, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode
+
+
+# Maximum number of sub-queries per batch
+MAX_BATCH_QUERIES = 100
+
+
+def _split_query(query: str, api_prefix: str) -> Tuple[str, bytes]:
+    """
+    Split a sub-query into an ASGI path and query string.
+    
+    Args:
+        query: URL relative to the API prefix, e.g. '/summary/us?year=2023'
+        api_prefix: Prefix the sub-query is resolved under ('/api')
+    
+    Returns:
+        (path, URL-encoded query string)
+    """
+    path, _, query_string = query.partition('?')
+    if not path.startswith('/'):
+        path = '/' + path
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return api_prefix + unquote(path), urlencode(pairs).encode()
+
+
+async def _get(app, path: str, query_string: bytes) -> Tuple[int, bytes]:
+    """
+    Run one GET request through an ASGI application.
+    
+    Returns:
+        (status code, JSON body)
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string,
+        'root_path': '',
+        'headers': [(b'accept', b'application/json')],
+        'client': None,
+        'server': None,
+    }
+    response = {'status': 500, 'json': True}
+    chunks = []
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            content_type = dict(message.get('headers', [])).get(b'content-type', b'')
+            response['json'] = content_type.startswith(b'application/json')
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+    
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        return 500, json.dumps({"detail": str(e)}).encode()
+    
+    body = b''.join(chunks)
+    if not body:
+        body = b'null'
+    elif not response['json']:
+        body = json.dumps(body.decode('utf-8', 'replace')).encode()
+    return response['status'], body
+
+
+async def run_batch(app, queries: List[str], version: str, api_prefix: str = "/api") -> bytes:
+    """
+    Run sub-queries one after another and combine their responses.
+    
+    The caller pins the data snapshot, so all sub-queries see the same
+    dataset version. A failing sub-query does not fail the batch; its status
+    and error body are returned in its slot.
+    
+    Args:
+        app: ASGI application serving the sub-queries
+        queries: URLs relative to api_prefix, e.g. '/chart/state_trend?state=TX'
+        version: Dataset version the sub-queries are answered from
+        api_prefix: Prefix the sub-queries are resolved under
+    
+    Returns:
+        JSON body {"version": ..., "results": [{"status": ..., "body": ...}, ...]},
+        with results in the order of the queries
+    """
+    results = []
+    for query in queries:
+        status, body = await _get(app, *_split_query(query, api_prefix))
+        results.append(b'{"status":%d,"body":%s}' % (status, body))
+    return (b'{"version":' + json.dumps(version).encode()
+            + b',"results":[' + b','.join(results) + b']}')
@@ -0,0 +1,220 @@
+"""
+Response caching for the FastAPI backend.
+Caches API responses per dataset version with LRU eviction under a memory cap,
+and answers conditional requests with 304 Not Modified using strong ETags.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+
+# (status, headers, body) of a cached response
+CachedResponse = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+
+def normalize_request_key(path: str, query_string: bytes) -> str:
+    """
+    Build a cache key from a request path and query string.
+    
+    Trailing slashes are dropped and query parameters are sorted by name, so
+    equivalent URLs share one entry. Repeated parameters keep their order,
+    which can be significant (e.g. the entities of /api/chart/trends).
+    
+    Args:
+        path: Request path
+        query_string: Raw query string
+    
+    Returns:
+        Normalized "path?query" key
+    """
+    path = path.rstrip('/') or '/'
+    params = sorted(parse_qsl(query_string.decode('latin-1'), keep_blank_values=True), key=lambda param: param[0])
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def make_etag(version: str, key: str) -> str:
+    """
+    Build a strong ETag for a response.
+    
+    Responses are deterministic for a given dataset version and request, so
+    the tag can be derived without rendering the body.
+    
+    Args:
+        version: Dataset version hash
+        key: Normalized request key
+    
+    Returns:
+        Quoted ETag value
+    """
+    return '"' + hashlib.sha256(f"{version}:{key}".encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+class ResponseCache:
+    """LRU cache of responses with a cap on the total size of cached entries."""
+    
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize ResponseCache.
+        
+        Args:
+            max_bytes: Maximum total size of cached bodies, headers and keys
+        """
+        self.max_bytes = max_bytes
+        self.version: Optional[str] = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[CachedResponse, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Get a cached response and mark it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: str, response: CachedResponse) -> None:
+        """Cache a response, evicting least recently used entries to stay under the cap."""
+        status, headers, body = response
+        entry_size = len(key) + len(body) + sum(len(name) + len(value) for name, value in headers)
+        if entry_size > self.max_bytes:
+            return
+        
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (response, entry_size)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+    
+    def clear(self, version: Optional[str] = None) -> None:
+        """Drop all entries, e.g. when the dataset version changes."""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            self.version = version
+
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware serving cached GET responses under a path prefix.
+    
+    Successful responses get a strong ETag built from the dataset version and
+    the normalized request. Requests whose If-None-Match matches it get a 304
+    without running the endpoint; other repeat requests are answered from the
+    cache. Entries are keyed by dataset version. The cache is cleared whenever
+    the live version changes, and a response is only stored if the live
+    version did not change while it was built. Requests answered from an
+    older, pinned version (batch sub-requests that outlive a reload) bypass
+    the cache: they neither clear it nor store into it.
+    """
+    
+    def __init__(self,
+                 app,
+                 cache: ResponseCache,
+                 get_version: Callable[[], Optional[str]],
+                 path_prefix: str = "/api/",
+                 exclude_prefixes: Tuple[str, ...] = (),
+                 get_variant: Optional[Callable[[Dict], str]] = None,
+                 get_live_version: Optional[Callable[[], Optional[str]]] = None):
+        """
+        Initialize ResponseCacheMiddleware.
+        
+        Args:
+            app: Wrapped ASGI application
+            cache: Response cache
+            get_version: Returns the dataset version the request is answered
+                from (None if no data is loaded)
+            path_prefix: Only requests under this prefix are cached
+            exclude_prefixes: Paths under these prefixes are never cached
+            get_variant: Returns the representation a request negotiates (e.g.
+                format and compression); requests with different variants get
+                separate entries and ETags
+            get_live_version: Returns the version of the current snapshot,
+                ignoring any pinned one (default: get_version)
+        """
+        self.app = app
+        self.cache = cache
+        self.get_version = get_version
+        self.path_prefix = path_prefix
+        self.exclude_prefixes = exclude_prefixes
+        self.get_variant = get_variant
+        self.get_live_version = get_live_version or get_version
+    
+    async def __call__(self, scope, receive, send):
+        version = self.get_version() if scope['type'] == 'http' else None
+        if (version is None or scope['method'] not in ('GET', 'HEAD')
+                or not scope['path'].startswith(self.path_prefix)
+                or scope['path'].startswith(self.exclude_prefixes)):
+            await self.app(scope, receive, send)
+            return
+        
+        # A pinned older version must not clear or fill the live version's cache
+        use_cache = version == self.get_live_version()
+        if use_cache and self.cache.version != version:
+            self.cache.clear(version)
+        
+        key = normalize_request_key(scope['path'], scope['query_string'])
+        if self.get_variant is not None:
+            key = f"{key}#{self.get_variant(scope)}"
+        etag = make_etag(version, key)
+        cache_key = f"{version}:{key}"
+        etag_header = (b'etag', etag.encode())
+        cache_control = (b'cache-control', b'no-cache')
+        
+        if_none_match = next((value for name, value in scope['headers'] if name == b'if-none-match'), None)
+        if if_none_match is not None and etag_matches(if_none_match.decode('latin-1'), etag):
+            await send({'type': 'http.response.start', 'status': 304,
+                        'headers': [etag_header, cache_control]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        
+        cached = self.cache.get(cache_key) if use_cache else None
+        if cached is not None:
+            status, headers, body = cached
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body',
+                        'body': body if scope['method'] == 'GET' else b''})
+            return
+        
+        # Run the endpoint, tag successful responses and keep their body
+        start = {}
+        chunks = []
+        
+        async def send_and_capture(message):
+            if message['type'] == 'http.response.start':
+                start['status'] = message['status']
+                if message['status'] == 200:
+                    message['headers'] = [*message.get('headers', []), etag_header, cache_control]
+                start['headers'] = message.get('headers', [])
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+            await send(message)
+        
+        await self.app(scope, receive, send_and_capture)
+        
+        if (use_cache and start.get('status') == 200 and scope['method'] == 'GET'
+                and self.get_live_version() == version):
+            self.cache.put(cache_key, (200, list(start['headers']), b''.join(chunks)))
@@ -0,0 +1,420 @@
+"""
+Precomputed emissions cube for the FastAPI backend.
+Answers summary queries with array lookups instead of DataFrame scans.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from backend.indexes import KeyIndex, PackedGroups
+from backend.serializers import column_to_list, dumps_compact, to_records
+
+
+BASELINE_YEAR = 2010
+EMISSIONS_COLUMNS = ['total_emissions', 'co2', 'ch4', 'n2o']
+GAS_COLUMNS = ['co2', 'ch4', 'n2o']
+
+
+def _percent_change(current: float, baseline: float) -> float:
+    """Percent change from a baseline (0 if the baseline is not positive)."""
+    return ((current - baseline) / baseline * 100) if baseline > 0 else 0
+
+
+def _float_list(values: np.ndarray) -> List[Optional[float]]:
+    """Convert a float array to a list of floats, with None for NaN."""
+    result = values.tolist()
+    if np.isnan(values).any():
+        result = [None if value != value else value for value in result]
+    return result
+
+
+def _compute_year_totals(df: pd.DataFrame) -> Dict[int, Dict]:
+    """
+    Sum the emissions and facility counts of every year.
+    
+    Args:
+        df: Year aggregates with a 'year' column
+    
+    Returns:
+        Dictionary of year -> totals (with gas shares of the total)
+    """
+    totals = {}
+    for year, year_data in df.groupby('year'):
+        cell = {col: float(year_data[col].sum()) for col in EMISSIONS_COLUMNS}
+        cell['facility_count'] = int(year_data['facility_count'].sum())
+        total = cell['total_emissions']
+        for gas in GAS_COLUMNS:
+            cell[f'{gas}_share'] = (cell[gas] / total) if total > 0 else 0
+        totals[int(year)] = cell
+    return totals
+
+
+class CellTable:
+    """
+    Cells of an aggregate table, one row of a float64 array per (entity..., year) key.
+    
+    Behaves like a read-only dictionary of key -> cell. Only the stored
+    quantities are kept (as one array, found through a KeyIndex); the cell
+    dictionary, with the trend and share derived from them, is built by
+    each lookup.
+    """
+    
+    FIELDS = EMISSIONS_COLUMNS + ['facility_count', 'baseline_emissions', 'rank', 'year_total']
+    
+    def __init__(self, keys: List[Tuple], rows: List[Tuple]):
+        """
+        Initialize CellTable.
+        
+        Args:
+            keys: (entity..., year) keys
+            rows: Values of FIELDS for each key
+        """
+        self.keys = KeyIndex(keys)
+        self.values = np.array(rows, dtype='float64').reshape(len(keys), len(self.FIELDS))
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Get the cell of a key (None if there is no data)."""
+        position = self.keys.find(key)
+        if position is None:
+            return None
+        total, co2, ch4, n2o, facility_count, baseline_emissions, rank, year_total = self.values[position].tolist()
+        return {
+            'total_emissions': total,
+            'co2': co2,
+            'ch4': ch4,
+            'n2o': n2o,
+            'facility_count': int(facility_count),
+            'baseline_emissions': baseline_emissions,
+            'trend_since_baseline': _percent_change(total, baseline_emissions),
+            'rank': int(rank),
+            'percent_of_total': (total / year_total * 100) if year_total > 0 else 0,
+        }
+
+
+def _build_cells(df: pd.DataFrame,
+                 entity_cols: List[str],
+                 year_totals: Dict[int, Dict],
+                 baseline_year: int) -> CellTable:
+    """
+    Build one cell per (entity..., year) row of an aggregate table.
+    
+    Each cell holds the row's emissions and facility count, the entity's
+    baseline-year emissions and the trend since then, the entity's rank by
+    total emissions within the year (1 = largest) and its percent of the
+    year total.
+    
+    Args:
+        df: Aggregates with entity columns, 'year', emissions and 'facility_count'
+        entity_cols: Entity key columns (e.g. ['state'])
+        year_totals: Output of _compute_year_totals for the same table
+        baseline_year: Year the trend is measured from
+    
+    Returns:
+        Cells by (entity..., year)
+    """
+    df = df.reset_index(drop=True)
+    
+    ranks = df.groupby('year')['total_emissions'].rank(method='first', ascending=False)
+    
+    baseline = df.loc[df['year'] == baseline_year, entity_cols + ['total_emissions']]
+    baseline_lookup = {
+        tuple(key): float(value)
+        for key, value in zip(baseline[entity_cols].itertuples(index=False), baseline['total_emissions'])
+    }
+    
+    keys = df[entity_cols + ['year']].itertuples(index=False, name=None)
+    values = df[EMISSIONS_COLUMNS + ['facility_count']].itertuples(index=False, name=None)
+    
+    cell_keys, rows = [], []
+    for key, (total, co2, ch4, n2o, facility_count), rank in zip(keys, values, ranks):
+        year = int(key[-1])
+        entity = key[:-1]
+        cell_keys.append(entity + (year,))
+        rows.append((total, co2, ch4, n2o, int(facility_count), baseline_lookup.get(entity, 0.0), int(rank),
+                     year_totals[year]['total_emissions']))
+    return CellTable(cell_keys, rows)
+
+
+class Rankings:
+    """
+    Per-year rankings of the entities of an aggregate table, held in arrays.
+    
+    The ranked rows of all years are packed in one set of columns, with the
+    row positions of each year (PackedGroups); the records of a top-N query
+    are built from the first N rows of its year.
+    """
+    
+    def __init__(self, df: pd.DataFrame, entity_col: str, year_totals: Dict[int, Dict]):
+        """
+        Rank the entities of every year by total emissions.
+        
+        Args:
+            df: Aggregates with an entity column, 'year', emissions and 'facility_count'
+            entity_col: Entity column ('state' or 'sector')
+            year_totals: Output of _compute_year_totals for the same table
+        """
+        self.entity = entity_col
+        
+        ranked_years, rows_by_year, offset = [], {}, 0
+        for year, year_data in df.groupby('year'):
+            ranked = year_data.sort_values('total_emissions', ascending=False, kind='mergesort')
+            total = year_totals[int(year)]['total_emissions']
+            ranked_years.append(pd.DataFrame({
+                'entity': column_to_list(ranked[entity_col], 'str'),
+                'emissions': ranked['total_emissions'].to_numpy(dtype='float64'),
+                'percent': (ranked['total_emissions'] / total * 100).round(2).to_numpy(dtype='float64'),
+                'facility_count': ranked['facility_count'].fillna(0).to_numpy(dtype='int64'),
+            }))
+            rows_by_year[int(year)] = np.arange(offset, offset + len(ranked))
+            offset += len(ranked)
+        
+        columns = pd.concat(ranked_years, ignore_index=True) if ranked_years else pd.DataFrame(
+            {'entity': [], 'emissions': [], 'percent': [], 'facility_count': []})
+        self.rows = PackedGroups(rows_by_year)
+        self.names = np.array(columns['entity'].tolist(), dtype=str)
+        self.emissions = columns['emissions'].to_numpy(dtype='float64')
+        self.percents = columns['percent'].to_numpy(dtype='float64')
+        self.facility_counts = columns['facility_count'].to_numpy(dtype='int64')
+    
+    def top(self, year: int, limit: int) -> Optional[List[Dict]]:
+        """
+        Get the top entities of a year.
+        
+        Returns:
+            Ranking records (entity, emissions, rank, percent of the year
+            total, facility_count), largest first; None if there is no data
+        """
+        rows = self.rows.get(year)
+        if rows is None:
+            return None
+        rows = rows[:limit]
+        return to_records({
+            self.entity: self.names[rows].tolist(),
+            "emissions": _float_list(self.emissions[rows]),
+            "rank": list(range(1, len(rows) + 1)),
+            "percent": _float_list(self.percents[rows]),
+            "facility_count": self.facility_counts[rows].tolist()
+        })
+
+
+def _trend_records(df: pd.DataFrame) -> List[Dict]:
+    """Convert year rows to chart records (year, emissions, facilities), oldest first."""
+    ordered = df.sort_values('year')
+    return to_records({
+        "year": column_to_list(ordered['year'], 'int'),
+        "emissions": column_to_list(ordered['total_emissions']),
+        "facilities": column_to_list(ordered['facility_count'], 'int')
+    })
+
+
+class TrendMatrix:
+    """
+    Dense year x entity pivot of an aggregate table.
+    
+    Holds one (entity, year) array per metric, with NaN where an entity has
+    no row for a year, so the trends of any set of entities are a row
+    selection. The JSON text of every row is rendered once at build time,
+    into one byte buffer; encoding thousands of floats per request would
+    dominate the response time. Arrays must be treated as read-only.
+    """
+    
+    METRICS = EMISSIONS_COLUMNS + ['facility_count']
+    
+    def __init__(self, df: pd.DataFrame, entity_col: str):
+        """
+        Build the pivot.
+        
+        Args:
+            df: Aggregates with an entity column, 'year', emissions and 'facility_count'
+            entity_col: Entity column ('state' or 'sector')
+        """
+        self.entity = entity_col
+        self.years = sorted(int(year) for year in df['year'].unique())
+        self.names = sorted(df[entity_col].dropna().unique().tolist())
+        self.positions = {name: i for i, name in enumerate(self.names)}
+        
+        self.values: Dict[str, np.ndarray] = {}
+        for metric in self.METRICS:
+            pivot = df.pivot_table(index=entity_col, columns='year', values=metric, aggfunc='sum')
+            matrix = pivot.reindex(index=self.names, columns=self.years).to_numpy(dtype='float64')
+            self.values[metric] = matrix
+        
+        # Row JSON of every metric, in METRICS order, as one UTF-8 buffer with row offsets
+        row_json = [dumps_compact(row).encode("utf-8")
+                    for rows in self.to_payload()['values'].values() for row in rows]
+        self._row_json = np.frombuffer(b"".join(row_json), dtype=np.uint8)
+        self._row_offsets = np.concatenate([[0], np.cumsum([len(row) for row in row_json])]).astype(np.int64)
+    
+    def trend(self, name: Hashable) -> Optional[List[Dict]]:
+        """Get the yearly trend records (year, emissions, facilities) of an entity (None if there is no data)."""
+        row = self.positions.get(name)
+        if row is None:
+            return None
+        present = ~np.isnan(self.values['facility_count'][row])
+        return to_records({
+            "year": np.asarray(self.years, dtype='int64')[present].tolist(),
+            "emissions": _float_list(self.values['total_emissions'][row][present]),
+            "facilities": self.values['facility_count'][row][present].astype('int64').tolist()
+        })
+    
+    def missing(self, names: Sequence[Hashable]) -> List[Hashable]:
+        """Get the names that are not in the pivot."""
+        return [name for name in names if name not in self.positions]
+    
+    def select(self, names: Optional[Sequence[Hashable]] = None) -> Tuple[List[Hashable], Dict[str, np.ndarray]]:
+        """
+        Get the rows of some entities.
+        
+        Args:
+            names: Entities to include, in this order (default: all, sorted)
+        
+        Returns:
+            (names, metric -> (name, year) array with NaN where there is no data)
+        """
+        if names is None:
+            names = self.names
+        rows = [self.positions[name] for name in names]
+        return list(names), {metric: matrix[rows] for metric, matrix in self.values.items()}
+    
+    def to_payload(self, names: Optional[Sequence[Hashable]] = None) -> Dict:
+        """Get the trends of some entities as a JSON-ready dictionary shaped like to_json."""
+        names, matrices = self.select(names)
+        values = {}
+        for metric, matrix in matrices.items():
+            missing = np.isnan(matrix)
+            rows = np.where(missing, 0, matrix).astype('int64') if metric == 'facility_count' else matrix
+            rows = rows.astype(object)
+            rows[missing] = None
+            values[metric] = rows.tolist()
+        return {"entity": self.entity, "years": list(self.years), "names": names, "values": values}
+    
+    def to_json(self, names: Optional[Sequence[Hashable]] = None) -> bytes:
+        """
+        Get the trends of some entities as a columnar JSON document.
+        
+        Args:
+            names: Entities to include, in this order (default: all, sorted)
+        
+        Returns:
+            UTF-8 JSON object with 'entity', 'years', 'names' and 'values'
+            (metric -> one list per name, aligned with years, null where
+            there is no data)
+        """
+        if names is None:
+            names = self.names
+        rows = [self.positions[name] for name in names]
+        text, offsets, n_names = self._row_json, self._row_offsets, len(self.names)
+        
+        values = b",".join(
+            dumps_compact(metric).encode("utf-8") + b":[" + b",".join(
+                text[offsets[i]:offsets[i + 1]].tobytes() for i in (m * n_names + row for row in rows)
+            ) + b"]"
+            for m, metric in enumerate(self.METRICS)
+        )
+        return (
+            ('{"entity":' + dumps_compact(self.entity)
+             + ',"years":' + dumps_compact(self.years)
+             + ',"names":' + dumps_compact(list(names))
+             + ',"values":{').encode("utf-8") + values + b'}}'
+        )
+
+
+class EmissionsCube:
+    """
+    In-memory cube of emissions indexed by (state, sector, year).
+    
+    Built once from the aggregate tables; every lookup is a binary search
+    returning a precomputed cell (totals, baseline trend, rank and share).
+    Per-year state and sector rankings are also precomputed, so top-N
+    queries are array slices, and so are the yearly trends charted for the
+    US and each state and sector; dense trend matrices (TrendMatrix) serve
+    many trends at once. Cells, rankings and trends are held in arrays
+    (CellTable, Rankings, TrendMatrix) rather than dictionaries of records,
+    so worker processes share them through the shared dataset
+    (backend/shared.py). The US cells and trend are small dictionaries and
+    must be treated as read-only.
+    """
+    
+    def __init__(self,
+                 state_year_df: pd.DataFrame,
+                 sector_year_df: pd.DataFrame,
+                 state_sector_year_df: Optional[pd.DataFrame] = None,
+                 baseline_year: int = BASELINE_YEAR):
+        """
+        Build the cube.
+        
+        Args:
+            state_year_df: State-year aggregates
+            sector_year_df: Sector-year aggregates
+            state_sector_year_df: State-sector-year aggregates (optional)
+            baseline_year: Year trends are measured from
+        """
+        self.baseline_year = baseline_year
+        
+        # US totals come from the state table, sector shares from the sector table
+        # (it also includes facilities without a state)
+        self.us_years = _compute_year_totals(state_year_df)
+        self.sector_year_totals = _compute_year_totals(sector_year_df)
+        
+        self.state_years = _build_cells(state_year_df, ['state'], self.us_years, baseline_year)
+        self.sector_years = _build_cells(sector_year_df, ['sector'], self.sector_year_totals, baseline_year)
+        
+        self.state_sector_years = CellTable([], [])
+        if state_sector_year_df is not None and not state_sector_year_df.empty:
+            self.state_sector_years = _build_cells(
+                state_sector_year_df, ['state', 'sector'],
+                _compute_year_totals(state_sector_year_df), baseline_year
+            )
+        
+        us_baseline = self.us_years.get(baseline_year, {}).get('total_emissions', 0.0)
+        for cell in self.us_years.values():
+            cell['baseline_emissions'] = us_baseline
+            cell['trend_since_baseline'] = _percent_change(cell['total_emissions'], us_baseline)
+        
+        self.state_rankings = Rankings(state_year_df, 'state', self.us_years)
+        self.sector_rankings = Rankings(sector_year_df, 'sector', self.sector_year_totals)
+        
+        self.us_trend = _trend_records(
+            state_year_df.groupby('year').agg({'total_emissions': 'sum', 'facility_count': 'sum'}).reset_index()
+        )
+        self.trend_matrices = {
+            'state': TrendMatrix(state_year_df, 'state'),
+            'sector': TrendMatrix(sector_year_df, 'sector'),
+        }
+        
+        self.years = sorted(self.us_years)
+    
+    def us(self, year: int) -> Optional[Dict]:
+        """Get the US cell for a year (None if there is no data)."""
+        return self.us_years.get(year)
+    
+    def state(self, state: Hashable, year: int) -> Optional[Dict]:
+        """Get the cell for a state and year (None if there is no data)."""
+        return self.state_years.get((state, year))
+    
+    def sector(self, sector: Hashable, year: int) -> Optional[Dict]:
+        """Get the cell for a sector and year (None if there is no data)."""
+        return self.sector_years.get((sector, year))
+    
+    def state_sector(self, state: Hashable, sector: Hashable, year: int) -> Optional[Dict]:
+        """Get the cell for a state, sector and year (None if there is no data)."""
+        return self.state_sector_years.get((state, sector, year))
+    
+    def top_states(self, year: int, limit: int) -> Optional[List[Dict]]:
+        """Get the top states of a year by emissions (None if there is no data)."""
+        return self.state_rankings.top(year, limit)
+    
+    def top_sectors(self, year: int, limit: int) -> Optional[List[Dict]]:
+        """Get the top sectors of a year by emissions (None if there is no data)."""
+        return self.sector_rankings.top(year, limit)
+    
+    def state_trend(self, state: Hashable) -> Optional[List[Dict]]:
+        """Get the yearly trend of a state (None if there is no data)."""
+        return self.trend_matrices['state'].trend(state)
+    
+    def sector_trend(self, sector: Hashable) -> Optional[List[Dict]]:
+        """Get the yearly trend of a sector (None if there is no data)."""
+        return self.trend_matrices['sector'].trend(sector)
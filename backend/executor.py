@@ -0,0 +1,75 @@
+"""
+Bounded execution of heavy request handlers for the FastAPI backend.
+Handlers that scan or sort tables run in a small thread pool instead of on
+the event loop, and requests beyond the pool's capacity are rejected rather
+than queued without limit.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class ScanPoolFull(Exception):
+    """Raised when the scan pool has no free thread and its queue is full."""
+
+
+class ScanPool:
+    """
+    Thread pool with a cap on running plus waiting calls.
+    
+    At most max_workers calls run at once and at most max_queue more wait
+    for a thread; further calls fail immediately with ScanPoolFull. A slot is
+    only freed when its call has finished, so requests whose client went
+    away while the call was running still count until the thread is free.
+    Must be used from a single event loop.
+    """
+    
+    def __init__(self, max_workers: int = 4, max_queue: int = 32):
+        """
+        Initialize ScanPool.
+        
+        Args:
+            max_workers: Number of threads (0 runs calls inline on the event loop)
+            max_queue: Number of calls allowed to wait for a thread
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.active = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if max_workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan")
+    
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus waiting calls."""
+        return self.max_workers + self.max_queue
+    
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run func(*args) in the pool and wait for its result.
+        
+        Raises:
+            ScanPoolFull: If capacity calls are already running or waiting
+        """
+        if self._executor is None:
+            return func(*args)
+        if self.active >= self.capacity:
+            self.rejected += 1
+            raise ScanPoolFull()
+        
+        loop = asyncio.get_running_loop()
+        self.active += 1
+        future = self._executor.submit(functools.partial(func, *args))
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+    
+    def _release(self) -> None:
+        self.active -= 1
+    
+    def shutdown(self) -> None:
+        """Stop the threads, dropping calls that have not started."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
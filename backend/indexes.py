@@ -0,0 +1,406 @@
+"""
+Secondary indexes on the facility table for the FastAPI backend.
+Map filter values to row positions so filtered queries only touch matching rows.
+"""
+
+import numpy as np
+import pandas as pd
+from functools import reduce
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+
+# Facility partitions with precomputed rankings, as filter names in (state, year, sector) order
+RANKED_PARTITIONS = [('year',), ('state', 'year'), ('year', 'sector'), ('state', 'year', 'sector')]
+
+
+class KeyIndex:
+    """
+    Positions of many hashable keys (scalars, or tuples of equal length), held in arrays.
+    
+    Each key component is encoded through a small vocabulary of its distinct
+    values, and the codes are combined into one int64 per key, kept sorted
+    for binary search. Compared with a dictionary of keys, only the
+    vocabularies are Python objects, so the index pickles to a few arrays
+    that worker processes share instead of each rebuilding a dictionary.
+    """
+    
+    def __init__(self, keys: Sequence[Hashable]):
+        """
+        Build the index.
+        
+        Args:
+            keys: Distinct keys; a key's position is its position in this sequence
+        """
+        keys = list(keys)
+        self.scalar = not keys or not isinstance(keys[0], tuple)
+        components = list(zip(*keys)) if not self.scalar else [keys]
+        self.vocabularies: List[Dict[Hashable, int]] = [
+            {value: code for code, value in enumerate(dict.fromkeys(component))} for component in components
+        ]
+        codes = [np.fromiter((vocabulary[value] for value in component), dtype=np.int64, count=len(keys))
+                 for vocabulary, component in zip(self.vocabularies, components)]
+        
+        composite = self._combine(codes) if keys else np.empty(0, dtype=np.int64)
+        order = np.argsort(composite, kind='stable')
+        self.composite = composite[order]
+        self.positions = order.astype(np.int64)
+    
+    def _combine(self, codes: List):
+        """Combine per-component codes (ints or arrays) into composite codes."""
+        composite = codes[0]
+        for vocabulary, component_codes in zip(self.vocabularies[1:], codes[1:]):
+            composite = composite * len(vocabulary) + component_codes
+        return composite
+    
+    def __len__(self) -> int:
+        return len(self.composite)
+    
+    def find(self, key: Hashable) -> Optional[int]:
+        """Get the position of a key, or None if it is not indexed."""
+        values = (key,) if self.scalar else key
+        if not isinstance(values, tuple) or len(values) != len(self.vocabularies):
+            return None
+        codes = []
+        for vocabulary, value in zip(self.vocabularies, values):
+            try:
+                code = vocabulary.get(value)
+            except TypeError:  # Unhashable
+                return None
+            if code is None:
+                return None
+            codes.append(code)
+        
+        composite = self._combine(codes)
+        i = int(np.searchsorted(self.composite, composite))
+        if i < len(self.composite) and self.composite[i] == composite:
+            return int(self.positions[i])
+        return None
+
+
+class PackedGroups:
+    """
+    Arrays for many keys, packed into one array with the (start, stop) slice of each key.
+    
+    Behaves like a read-only dictionary of key -> array, but holds one large
+    array instead of one small array per key, and finds keys through a
+    KeyIndex: cheaper to build and to pickle, and shareable between
+    processes as a few buffers.
+    """
+    
+    def __init__(self, groups: Dict[Hashable, np.ndarray], dtype: str = 'int64'):
+        """
+        Pack the arrays.
+        
+        Args:
+            groups: Dictionary of key -> array
+            dtype: Dtype of the packed array
+        """
+        self.keys = KeyIndex(list(groups))
+        lengths = np.fromiter((len(values) for values in groups.values()), dtype=np.int64, count=len(groups))
+        self.stops = np.cumsum(lengths)
+        self.starts = self.stops - lengths
+        self.values = (np.concatenate(list(groups.values())).astype(dtype, copy=False)
+                       if groups else np.empty(0, dtype=dtype))
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return self.keys.find(key) is not None
+    
+    def get(self, key: Hashable, default: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """Get the array of a key (a view of the packed array)."""
+        position = self.keys.find(key)
+        if position is None:
+            return default
+        return self.values[self.starts[position]:self.stops[position]]
+
+
+def _positions_by(df: pd.DataFrame, keys: Union[str, List[str]]) -> PackedGroups:
+    """
+    Group row positions by key value.
+    
+    Args:
+        df: Table to index
+        keys: Column or columns to group by (rows with a missing key are skipped)
+    
+    Returns:
+        Key value (tuple for several columns) -> ascending positions
+    """
+    return PackedGroups(df.groupby(keys, sort=False, dropna=True).indices)
+
+
+def rank_positions(positions: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Order positions by value, largest first, with each value's percent of their total.
+    
+    Matches DataFrame.nlargest: missing values are dropped and ties keep
+    their original row order.
+    
+    Args:
+        positions: Ascending row positions
+        values: Column values for the whole table
+        
+    Returns:
+        (ranked positions, percent of the total of the ranked values)
+    """
+    subset = values[positions]
+    valid = ~np.isnan(subset)
+    positions, subset = positions[valid], subset[valid]
+    order = np.argsort(-subset, kind='stable')
+    
+    total = subset.sum()
+    percents = subset[order] / total * 100 if total > 0 else np.zeros(len(order))
+    return positions[order], percents
+
+
+class FacilityIndex:
+    """
+    Position indexes on the facility table by state, year and sector.
+    
+    Built once at load time. Single-column indexes are intersected for
+    partial filters; the composite (state, year, sector) index answers
+    fully specified filters with one lookup.
+    """
+    
+    def __init__(self,
+                 df: pd.DataFrame,
+                 state_col: str = 'state',
+                 year_col: str = 'reporting_year',
+                 sector_col: str = 'industry_type_sectors'):
+        """
+        Build the indexes.
+        
+        Args:
+            df: Facility table (row positions refer to it)
+            state_col: State column
+            year_col: Reporting year column
+            sector_col: Sector column
+        """
+        self.n_rows = len(df)
+        self.by_state = _positions_by(df, state_col)
+        self.by_year = _positions_by(df, year_col)
+        self.by_sector = _positions_by(df, sector_col)
+        self.by_state_year_sector = _positions_by(df, [state_col, year_col, sector_col])
+    
+    def lookup(self,
+               state: Optional[Hashable] = None,
+               year: Optional[int] = None,
+               sector: Optional[Hashable] = None) -> np.ndarray:
+        """
+        Find the rows matching all given filters.
+        
+        Args:
+            state: State value, or None for any state
+            year: Reporting year, or None for any year
+            sector: Sector value, or None for any sector
+        
+        Returns:
+            Ascending row positions
+        """
+        empty = np.empty(0, dtype=np.int64)
+        
+        if state is not None and year is not None and sector is not None:
+            return self.by_state_year_sector.get((state, year, sector), empty)
+        
+        candidates = []
+        if state is not None:
+            candidates.append(self.by_state.get(state, empty))
+        if year is not None:
+            candidates.append(self.by_year.get(year, empty))
+        if sector is not None:
+            candidates.append(self.by_sector.get(sector, empty))
+        
+        if not candidates:
+            return np.arange(self.n_rows, dtype=np.int64)
+        
+        # Intersect the shortest lists first
+        candidates.sort(key=len)
+        return reduce(lambda left, right: np.intersect1d(left, right, assume_unique=True), candidates)
+
+
+class FacilityRankings:
+    """
+    Facility rankings by emissions, precomputed for every year, (state, year),
+    (sector, year) and (state, year, sector) partition.
+    
+    Each partition holds its row positions sorted by emissions (largest first)
+    and each facility's percent of the partition total, so a top-N query for
+    any N is a slice. Both are packed per filter combination (PackedGroups).
+    """
+    
+    def __init__(self,
+                 df: pd.DataFrame,
+                 value_col: str = 'total_reported_direct_emissions',
+                 state_col: str = 'state',
+                 year_col: str = 'reporting_year',
+                 sector_col: str = 'industry_type_sectors'):
+        """
+        Build the rankings.
+        
+        Args:
+            df: Facility table (row positions refer to it)
+            value_col: Column to rank by
+            state_col: State column
+            year_col: Reporting year column
+            sector_col: Sector column
+        """
+        columns = {'state': state_col, 'year': year_col, 'sector': sector_col}
+        values = df[value_col].to_numpy(dtype='float64')
+        
+        # Rank the whole table once; grouping the ranked rows keeps the order in every partition
+        order, _ = rank_positions(np.arange(len(df), dtype=np.int64), values)
+        ranked_keys = df[list(columns.values())].take(order)
+        
+        # Per partition: (ranked positions, percents) of each key
+        self.partitions: Dict[Tuple[str, ...], Tuple[PackedGroups, PackedGroups]] = {}
+        for filters in RANKED_PARTITIONS:
+            keys = [columns[name] for name in filters]
+            groups = ranked_keys.groupby(keys if len(keys) > 1 else keys[0], sort=False, dropna=True).indices
+            
+            positions_by_key = {}
+            percents_by_key = {}
+            for key, idx in groups.items():
+                positions = order[idx]
+                partition_values = values[positions]
+                total = partition_values.sum()
+                positions_by_key[key] = positions
+                percents_by_key[key] = partition_values / total * 100 if total > 0 else np.zeros(len(positions))
+            self.partitions[filters] = (PackedGroups(positions_by_key), PackedGroups(percents_by_key, 'float64'))
+    
+    def lookup(self,
+               state: Optional[Hashable] = None,
+               year: Optional[int] = None,
+               sector: Optional[Hashable] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Get the ranking of the partition matching the given filters.
+        
+        Args:
+            state: State value, or None for any state
+            year: Reporting year, or None for any year
+            sector: Sector value, or None for any sector
+            
+        Returns:
+            (ranked positions, percent of partition total), or None if this
+            combination of filters has no precomputed rankings
+        """
+        given = [(name, value) for name, value in (('state', state), ('year', year), ('sector', sector))
+                 if value is not None]
+        partition = self.partitions.get(tuple(name for name, _ in given))
+        if partition is None:
+            return None
+        
+        key = tuple(value for _, value in given)
+        key = key if len(key) > 1 else key[0]
+        positions, percents = partition
+        if key not in positions:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype='float64')
+        return positions.get(key), percents.get(key)
+
+
+def normalize_features(X: np.ndarray) -> np.ndarray:
+    """
+    Standardize feature columns and scale each row to unit length.
+    
+    Same normalization as src.similarity.normalize_features (StandardScaler,
+    then unit rows), in NumPy since scikit-learn is not a backend dependency.
+    
+    Args:
+        X: Feature matrix (entities x features)
+    
+    Returns:
+        Normalized float64 matrix of the same shape (all-zero rows stay zero)
+    """
+    X = np.asarray(X, dtype='float64')
+    scale = X.std(axis=0)
+    scale[scale < 10 * np.finfo('float64').eps] = 1  # Constant columns are only centered
+    X_scaled = (X - X.mean(axis=0)) / scale
+    
+    norms = np.linalg.norm(X_scaled, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return X_scaled / norms
+
+
+class FacilitySimilarityIndex:
+    """
+    Nearest-neighbour index of facilities by emissions trajectory.
+    
+    Each facility is a vector of its total reported emissions per year (0 for
+    years it did not report), normalized like the state and sector features,
+    so the cosine similarity of two facilities is the dot product of their
+    vectors. The vectors are held as one float32 matrix: the k most similar
+    facilities to one facility are a matrix-vector product and a partial
+    sort, without ever building the facility x facility matrix.
+    """
+    
+    def __init__(self,
+                 df: pd.DataFrame,
+                 id_col: str = 'facility_id',
+                 year_col: str = 'reporting_year',
+                 value_col: str = 'total_reported_direct_emissions',
+                 sector_col: str = 'industry_type_sectors'):
+        """
+        Build the index.
+        
+        Args:
+            df: Facility table (one row per facility and year; row positions refer to it)
+            id_col: Facility id column
+            year_col: Reporting year column
+            value_col: Emissions column making up the vectors
+            sector_col: Sector column
+        """
+        # Key columns by row position, without rows missing a facility id or year
+        rows = pd.DataFrame({
+            id_col: df[id_col].to_numpy(),
+            year_col: df[year_col].to_numpy(),
+            value_col: df[value_col].fillna(0).to_numpy(),
+            'has_sector': df[sector_col].notna().to_numpy(),
+        }).dropna(subset=[id_col, year_col])
+        matrix = rows.groupby([id_col, year_col])[value_col].sum().unstack(fill_value=0)
+        
+        self.years = matrix.columns.to_numpy(dtype='int64')
+        self.facility_ids = matrix.index.to_numpy(dtype='int64')  # Ascending
+        self.vectors = normalize_features(matrix.to_numpy()).astype('float32')
+        
+        # Row position of each facility's latest report, for names and locations; reports
+        # naming a sector are preferred (many 2023 rows have none)
+        latest = rows.sort_values(['has_sector', year_col], kind='stable').drop_duplicates(id_col, keep='last')
+        self.latest_rows = latest.sort_values(id_col).index.to_numpy(dtype='int64')
+    
+    def __len__(self) -> int:
+        return len(self.facility_ids)
+    
+    def position(self, facility_id: int) -> Optional[int]:
+        """Get the index position of a facility, or None if it is not indexed."""
+        position = int(np.searchsorted(self.facility_ids, facility_id))
+        if position < len(self.facility_ids) and self.facility_ids[position] == facility_id:
+            return position
+        return None
+    
+    def most_similar(self, facility_id: int, k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the k facilities most similar to a facility (excluding itself).
+        
+        Args:
+            facility_id: Facility to compare against
+            k: Number of neighbours
+        
+        Returns:
+            (index positions, cosine similarities), most similar first with ties
+            in facility id order, or None if the facility is not indexed
+        """
+        position = self.position(facility_id)
+        if position is None:
+            return None
+        
+        scores = self.vectors @ self.vectors[position]
+        scores[position] = -np.inf
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype='float32')
+        
+        # Partial sort: keep every score tied with the k-th best, then order those
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        candidates = np.flatnonzero(scores >= threshold)
+        order = np.lexsort((candidates, -scores[candidates]))[:k]
+        return candidates[order], scores[candidates[order]]
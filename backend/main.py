@@ -3,18 +3,49 @@ FastAPI Backend for GHG Emissions Dashboard
 Provides REST API endpoints for the neon dashboard UI
 """
 
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Body, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import pandas as pd
+import numpy as np
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional, List
+import os
 import sys
 
 # Add parent directory to path for utils
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from backend.utils import DataManager
+from backend.serializers import ChunkedJSONResponse, column_to_arrow, column_to_list, to_records
+from backend.indexes import rank_positions
+from backend.similarity import TRAJECTORY_METRICS
+from backend.cache import ResponseCache, ResponseCacheMiddleware
+from backend.shared import SHARED_DATASET_ENV, SharedDatasetReader
+from backend.executor import ScanPool, ScanPoolFull
+from backend.batch import MAX_BATCH_QUERIES, run_batch
+from backend.encoding import (
+    ARROW_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, CompressionMiddleware, arrow_response, matrix_to_arrow,
+    msgpack_response, negotiate_format, response_variant
+)
+
+# Memory cap of the response cache (default 64 MB)
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Seconds between checks of data_processed for new pipeline output (0 disables hot reload)
+DATA_WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", 2.0))
+
+# data_processed directory to serve (default: ../data_processed)
+DATA_PROCESSED_DIR = os.environ.get("DATA_PROCESSED_DIR")
+
+# Set by backend/serve.py in worker processes: attach to the dataset the parent published
+SHARED_DATASET_DIR = os.environ.get(SHARED_DATASET_ENV)
+
+# Threads for endpoints that filter, sort or serialize tables (default: CPU count up to 4;
+# 0 runs them on the event loop)
+SCAN_POOL_THREADS = int(os.environ.get("SCAN_POOL_THREADS", min(4, os.cpu_count() or 1)))
+
+# Table requests allowed to wait for a thread before new ones get 429 Too Many Requests
+SCAN_POOL_QUEUE = int(os.environ.get("SCAN_POOL_QUEUE", 32))
 
 app = FastAPI(
     title="GHG Emissions Dashboard API",
@@ -22,6 +53,39 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Initialize data manager
+data_manager = DataManager(
+    data_dir=Path(DATA_PROCESSED_DIR) if DATA_PROCESSED_DIR else None,
+    shared=SharedDatasetReader(Path(SHARED_DATASET_DIR)) if SHARED_DATASET_DIR else None,
+)
+
+# Table work runs off the event loop, so lookups stay fast while facility
+# lists are being built
+scan_pool = ScanPool(max_workers=SCAN_POOL_THREADS, max_queue=SCAN_POOL_QUEUE)
+
+async def compress_off_loop(func, *args):
+    """Compress a large response body in the scan pool (inline if the pool is full)."""
+    try:
+        return await scan_pool.run(func, *args)
+    except ScanPoolFull:
+        return func(*args)
+
+# Compress responses with brotli or gzip (registered before the cache, so the
+# cache keeps compressed bodies and compresses each representation once)
+app.add_middleware(CompressionMiddleware, run_blocking=compress_off_loop)
+
+# Cache API responses per dataset version and negotiated representation
+# (registered before CORS, so CORS headers are added per request around cached responses)
+response_cache = ResponseCache(max_bytes=RESPONSE_CACHE_MAX_BYTES)
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    get_version=lambda: data_manager.dataset_version,
+    get_live_version=lambda: data_manager.live_version,
+    exclude_prefixes=("/api/admin/",),
+    get_variant=response_variant,
+)
+
 # CORS middleware for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -31,15 +95,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize data manager
-data_manager = DataManager()
-
 @app.on_event("startup")
 async def startup_event():
     """Load all CSV files into memory on startup."""
     print("Loading data files...")
     data_manager.load_all_data()
     print("✓ Data loaded successfully")
+    
+    # Pick up new pipeline output without a restart
+    if DATA_WATCH_INTERVAL > 0:
+        data_manager.start_watching(DATA_WATCH_INTERVAL)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop watching the data directory and the scan pool."""
+    data_manager.stop_watching()
+    scan_pool.shutdown()
+
+async def run_scan(func, *args):
+    """
+    Run an endpoint body that works on whole tables in the scan pool.
+    
+    The snapshot is passed in by the caller, so the body sees one dataset
+    version even if a reload happens while it waits for a thread.
+    
+    Raises:
+        HTTPException: 429 if the pool and its queue are full
+    """
+    try:
+        return await scan_pool.run(func, *args)
+    except ScanPoolFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Server busy, retry shortly",
+            headers={"Retry-After": "1"}
+        )
 
 @app.get("/")
 async def root():
@@ -49,11 +139,13 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "summary": "/api/summary/us, /api/summary/state, /api/summary/sector",
-            "charts": "/api/chart/us_trend, /api/chart/state_trend, /api/chart/sector_trend",
+            "charts": "/api/chart/us_trend, /api/chart/state_trend, /api/chart/sector_trend, /api/chart/trends",
             "rankings": "/api/states/top, /api/sectors/top",
-            "similarity": "/api/similarity/states, /api/similarity/sectors",
+            "similarity": "/api/similarity/states, /api/similarity/sectors, /api/similarity/trajectory, /api/similarity/facilities",
             "facilities": "/api/facility/list",
-            "analytics": "/api/states/low_emission, /api/states/reduction, /api/states/high_methane"
+            "analytics": "/api/states/low_emission, /api/states/reduction, /api/states/high_methane",
+            "batch": "POST /api/batch",
+            "admin": "/api/admin/snapshot"
         }
     }
 
@@ -65,39 +157,27 @@ async def root():
 async def get_us_summary(year: int = Query(2023, ge=2010, le=2023)):
     """Get US-wide summary for a given year."""
     try:
-        year_data = data_manager.state_year_df[data_manager.state_year_df['year'] == year]
-        
-        if year_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
+        snapshot = data_manager.snapshot
         
-        total = float(year_data['total_emissions'].sum())
-        co2 = float(year_data['co2'].sum())
-        ch4 = float(year_data['ch4'].sum())
-        n2o = float(year_data['n2o'].sum())
-        facilities = int(year_data['facility_count'].sum())
+        cell = snapshot.cube.us(year)
         
-        # Calculate change from 2010
-        baseline_data = data_manager.state_year_df[data_manager.state_year_df['year'] == 2010]
-        baseline_total = float(baseline_data['total_emissions'].sum())
-        pct_change = ((total - baseline_total) / baseline_total) * 100 if baseline_total > 0 else 0
-        
-        # Calculate shares
-        co2_share = (co2 / total) if total > 0 else 0
-        ch4_share = (ch4 / total) if total > 0 else 0
-        n2o_share = (n2o / total) if total > 0 else 0
+        if cell is None:
+            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
         
         return {
             "year": year,
-            "total_emissions": total,
-            "co2": co2,
-            "ch4": ch4,
-            "n2o": n2o,
-            "facilities_reporting": facilities,
-            "percent_change_from_2010": round(pct_change, 2),
-            "co2_share": round(co2_share, 3),
-            "ch4_share": round(ch4_share, 3),
-            "n2o_share": round(n2o_share, 3)
+            "total_emissions": cell['total_emissions'],
+            "co2": cell['co2'],
+            "ch4": cell['ch4'],
+            "n2o": cell['n2o'],
+            "facilities_reporting": cell['facility_count'],
+            "percent_change_from_2010": round(cell['trend_since_baseline'], 2),
+            "co2_share": round(cell['co2_share'], 3),
+            "ch4_share": round(cell['ch4_share'], 3),
+            "n2o_share": round(cell['n2o_share'], 3)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -108,45 +188,24 @@ async def get_state_summary(
 ):
     """Get state summary for a given year."""
     try:
-        state_data = data_manager.state_year_df[
-            (data_manager.state_year_df['state'] == state.upper()) &
-            (data_manager.state_year_df['year'] == year)
-        ]
-        
-        if state_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for state {state} in year {year}")
+        snapshot = data_manager.snapshot
         
-        row = state_data.iloc[0]
+        cell = snapshot.cube.state(state.upper(), year)
         
-        # Calculate trend since 2010
-        baseline = data_manager.state_year_df[
-            (data_manager.state_year_df['state'] == state.upper()) &
-            (data_manager.state_year_df['year'] == 2010)
-        ]
-        baseline_emissions = float(baseline['total_emissions'].sum()) if not baseline.empty else 0
-        current_emissions = float(row['total_emissions'])
-        trend = ((current_emissions - baseline_emissions) / baseline_emissions * 100) if baseline_emissions > 0 else 0
-        
-        # Calculate ranking for this year
-        year_rankings = data_manager.state_year_df[data_manager.state_year_df['year'] == year].copy()
-        year_rankings = year_rankings.sort_values('total_emissions', ascending=False).reset_index()
-        ranking = int(year_rankings[year_rankings['state'] == state.upper()].index[0]) + 1 if not year_rankings[year_rankings['state'] == state.upper()].empty else None
-        
-        # Calculate percent of US total
-        us_total = float(data_manager.state_year_df[data_manager.state_year_df['year'] == year]['total_emissions'].sum())
-        percent_of_us = (current_emissions / us_total * 100) if us_total > 0 else 0
+        if cell is None:
+            raise HTTPException(status_code=404, detail=f"No data found for state {state} in year {year}")
         
         return {
             "state": state.upper(),
             "year": year,
-            "total_emissions": current_emissions,
-            "co2": float(row['co2']),
-            "ch4": float(row['ch4']),
-            "n2o": float(row['n2o']),
-            "facility_count": int(row['facility_count']),
-            "trend_since_2010": round(trend, 2),
-            "ranking": ranking,
-            "percent_of_us_total": round(percent_of_us, 2)
+            "total_emissions": cell['total_emissions'],
+            "co2": cell['co2'],
+            "ch4": cell['ch4'],
+            "n2o": cell['n2o'],
+            "facility_count": cell['facility_count'],
+            "trend_since_2010": round(cell['trend_since_baseline'], 2),
+            "ranking": cell['rank'],
+            "percent_of_us_total": round(cell['percent_of_total'], 2)
         }
     except HTTPException:
         raise
@@ -160,39 +219,23 @@ async def get_sector_summary(
 ):
     """Get sector summary for a given year."""
     try:
-        sector_data = data_manager.sector_year_df[
-            (data_manager.sector_year_df['sector'] == sector) &
-            (data_manager.sector_year_df['year'] == year)
-        ]
-        
-        if sector_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for sector '{sector}' in year {year}")
+        snapshot = data_manager.snapshot
         
-        row = sector_data.iloc[0]
+        cell = snapshot.cube.sector(sector, year)
         
-        # Calculate trend since 2010
-        baseline = data_manager.sector_year_df[
-            (data_manager.sector_year_df['sector'] == sector) &
-            (data_manager.sector_year_df['year'] == 2010)
-        ]
-        baseline_emissions = float(baseline['total_emissions'].sum()) if not baseline.empty else 0
-        current_emissions = float(row['total_emissions'])
-        trend = ((current_emissions - baseline_emissions) / baseline_emissions * 100) if baseline_emissions > 0 else 0
-        
-        # Calculate percent of total
-        us_total = float(data_manager.sector_year_df[data_manager.sector_year_df['year'] == year]['total_emissions'].sum())
-        percent_of_total = (current_emissions / us_total * 100) if us_total > 0 else 0
+        if cell is None:
+            raise HTTPException(status_code=404, detail=f"No data found for sector '{sector}' in year {year}")
         
         return {
             "sector": sector,
             "year": year,
-            "total_emissions": current_emissions,
-            "co2": float(row['co2']),
-            "ch4": float(row['ch4']),
-            "n2o": float(row['n2o']),
-            "facility_count": int(row['facility_count']),
-            "percent_of_total": round(percent_of_total, 2),
-            "trend_since_2010": round(trend, 2)
+            "total_emissions": cell['total_emissions'],
+            "co2": cell['co2'],
+            "ch4": cell['ch4'],
+            "n2o": cell['n2o'],
+            "facility_count": cell['facility_count'],
+            "percent_of_total": round(cell['percent_of_total'], 2),
+            "trend_since_2010": round(cell['trend_since_baseline'], 2)
         }
     except HTTPException:
         raise
@@ -207,15 +250,9 @@ async def get_sector_summary(
 async def get_us_trend():
     """Get US emissions trend 2010-2023."""
     try:
-        trend = data_manager.state_year_df.groupby('year').agg({
-            'total_emissions': 'sum',
-            'facility_count': 'sum'
-        }).reset_index()
-        
-        trend['emissions'] = trend['total_emissions']
-        trend['facilities'] = trend['facility_count']
+        snapshot = data_manager.snapshot
         
-        return trend[['year', 'emissions', 'facilities']].to_dict('records')
+        return snapshot.cube.us_trend
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -223,17 +260,14 @@ async def get_us_trend():
 async def get_state_trend(state: str = Query(..., description="State abbreviation")):
     """Get state emissions trend 2010-2023."""
     try:
-        state_data = data_manager.state_year_df[
-            data_manager.state_year_df['state'] == state.upper()
-        ].sort_values('year')
+        snapshot = data_manager.snapshot
         
-        if state_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for state {state}")
+        trend = snapshot.cube.state_trend(state.upper())
         
-        result = state_data[['year', 'total_emissions', 'facility_count']].copy()
-        result.columns = ['year', 'emissions', 'facilities']
+        if not trend:
+            raise HTTPException(status_code=404, detail=f"No data found for state {state}")
         
-        return result.to_dict('records')
+        return trend
     except HTTPException:
         raise
     except Exception as e:
@@ -243,17 +277,58 @@ async def get_state_trend(state: str = Query(..., description="State abbreviatio
 async def get_sector_trend(sector: str = Query(..., description="Sector name")):
     """Get sector emissions trend 2010-2023."""
     try:
-        sector_data = data_manager.sector_year_df[
-            data_manager.sector_year_df['sector'] == sector
-        ].sort_values('year')
+        snapshot = data_manager.snapshot
         
-        if sector_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for sector '{sector}'")
+        trend = snapshot.cube.sector_trend(sector)
         
-        result = sector_data[['year', 'total_emissions', 'facility_count']].copy()
-        result.columns = ['year', 'emissions', 'facilities']
+        if not trend:
+            raise HTTPException(status_code=404, detail=f"No data found for sector '{sector}'")
         
-        return result.to_dict('records')
+        return trend
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/chart/trends")
+async def get_trends(
+    request: Request,
+    entity: str = Query("state", pattern="^(state|sector)$", description="'state' or 'sector'"),
+    name: Optional[List[str]] = Query(None, description="States or sectors to include (repeat for several; default: all)")
+):
+    """
+    Get the trends of many states or sectors as a year x entity matrix per metric.
+    
+    JSON by default; Arrow IPC (one fixed-size list per name and metric) or
+    MessagePack with an Accept header.
+    """
+    try:
+        snapshot = data_manager.snapshot
+        
+        matrix = snapshot.cube.trend_matrices[entity]
+        
+        names = None
+        if name:
+            names = [value.upper() for value in name] if entity == 'state' else name
+            missing = matrix.missing(names)
+            if missing:
+                raise HTTPException(status_code=404, detail=f"No data found for {entity} {', '.join(missing)}")
+        
+        media_type = negotiate_format(request.headers.get('accept'))
+        if media_type == ARROW_MEDIA_TYPE:
+            names, matrices = matrix.select(names)
+            return arrow_response(
+                {"name": names, **{
+                    metric: matrix_to_arrow(values, integer=(metric == 'facility_count'))
+                    for metric, values in matrices.items()
+                }},
+                metadata={"entity": entity, "years": matrix.years}
+            )
+        if media_type == MSGPACK_MEDIA_TYPE:
+            return msgpack_response(matrix.to_payload(names))
+        
+        # Rows are pre-rendered JSON, so only the selection is encoded here
+        return Response(content=matrix.to_json(names), media_type="application/json", headers={"Vary": "Accept"})
     except HTTPException:
         raise
     except Exception as e:
@@ -270,33 +345,17 @@ async def get_top_states(
 ):
     """Get top N states by emissions for a given year."""
     try:
-        year_data = data_manager.state_year_df[data_manager.state_year_df['year'] == year].copy()
-        
-        if year_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
-        
-        # Calculate total for percentage
-        total_emissions = float(year_data['total_emissions'].sum())
+        snapshot = data_manager.snapshot
         
-        # Sort and get top N
-        top_states = year_data.nlargest(limit, 'total_emissions').copy()
-        top_states['rank'] = range(1, len(top_states) + 1)
-        top_states['percent'] = (top_states['total_emissions'] / total_emissions * 100).round(2)
+        ranking = snapshot.cube.top_states(year, limit)
         
-        result = []
-        for _, row in top_states.iterrows():
-            result.append({
-                "state": row['state'],
-                "emissions": float(row['total_emissions']),
-                "rank": int(row['rank']),
-                "percent": float(row['percent']),
-                "facility_count": int(row['facility_count'])
-            })
+        if ranking is None:
+            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
         
         return {
             "year": year,
             "limit": limit,
-            "states": result
+            "states": ranking
         }
     except HTTPException:
         raise
@@ -310,33 +369,17 @@ async def get_top_sectors(
 ):
     """Get top N sectors by emissions for a given year."""
     try:
-        year_data = data_manager.sector_year_df[data_manager.sector_year_df['year'] == year].copy()
-        
-        if year_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
+        snapshot = data_manager.snapshot
         
-        # Calculate total for percentage
-        total_emissions = float(year_data['total_emissions'].sum())
+        ranking = snapshot.cube.top_sectors(year, limit)
         
-        # Sort and get top N
-        top_sectors = year_data.nlargest(limit, 'total_emissions').copy()
-        top_sectors['rank'] = range(1, len(top_sectors) + 1)
-        top_sectors['percent'] = (top_sectors['total_emissions'] / total_emissions * 100).round(2)
-        
-        result = []
-        for _, row in top_sectors.iterrows():
-            result.append({
-                "sector": row['sector'],
-                "emissions": float(row['total_emissions']),
-                "rank": int(row['rank']),
-                "percent": float(row['percent']),
-                "facility_count": int(row['facility_count'])
-            })
+        if ranking is None:
+            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
         
         return {
             "year": year,
             "limit": limit,
-            "sectors": result
+            "sectors": ranking
         }
     except HTTPException:
         raise
@@ -352,35 +395,27 @@ async def get_state_similarity(
     state: str = Query(..., description="State abbreviation"),
     limit: int = Query(5, ge=1, le=50)
 ):
-    """Get states most similar to the target state."""
+    """Get states most similar to the target state (precomputed lists, no sorting)."""
     try:
-        if state.upper() not in data_manager.similarity_states_df.columns:
+        lists = data_manager.snapshot.similarity_states if data_manager.snapshot is not None else None
+        if lists is None or state.upper() not in lists:
             raise HTTPException(status_code=404, detail=f"State {state} not found in similarity matrix")
         
-        # Get similarity scores for this state
-        similarities = data_manager.similarity_states_df[state.upper()].copy()
-        similarities = similarities[similarities.index != state.upper()]  # Remove self
-        similarities = similarities.sort_values(ascending=False)
-        
-        # Get top similar
-        top_similar = similarities.head(limit)
-        
         result = []
-        for target_state, score in top_similar.items():
+        for target_state, score in lists.most_similar(state.upper(), limit):
             similarity_level = "High" if score > 0.8 else "Medium" if score > 0.6 else "Low"
             result.append({
                 "state": target_state,
-                "score": round(float(score), 3),
+                "score": round(score, 3),
                 "similarity": similarity_level
             })
         
-        # Get least similar
-        least_similar = similarities.tail(3)
+        # Least similar, listed most similar first
         least_result = []
-        for target_state, score in least_similar.items():
+        for target_state, score in reversed(lists.least_similar(state.upper(), 3)):
             least_result.append({
                 "state": target_state,
-                "score": round(float(score), 3),
+                "score": round(score, 3),
                 "similarity": "Low"
             })
         
@@ -399,24 +434,17 @@ async def get_sector_similarity(
     sector: str = Query(..., description="Sector name"),
     limit: int = Query(5, ge=1, le=50)
 ):
-    """Get sectors most similar to the target sector."""
+    """Get sectors most similar to the target sector (precomputed lists, no sorting)."""
     try:
-        if sector not in data_manager.similarity_sectors_df.columns:
+        lists = data_manager.snapshot.similarity_sectors if data_manager.snapshot is not None else None
+        if lists is None or sector not in lists:
             raise HTTPException(status_code=404, detail=f"Sector '{sector}' not found in similarity matrix")
         
-        # Get similarity scores
-        similarities = data_manager.similarity_sectors_df[sector].copy()
-        similarities = similarities[similarities.index != sector]  # Remove self
-        similarities = similarities.sort_values(ascending=False)
-        
-        # Get top similar
-        top_similar = similarities.head(limit)
-        
         result = []
-        for target_sector, score in top_similar.items():
+        for target_sector, score in lists.most_similar(sector, limit):
             result.append({
                 "sector": target_sector,
-                "score": round(float(score), 3)
+                "score": round(score, 3)
             })
         
         return {
@@ -428,66 +456,200 @@ async def get_sector_similarity(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _trajectory_similarity(snapshot, entity, name, method, metrics, limit):
+    """Body of get_trajectory_similarity, run in the scan pool."""
+    lists, years = snapshot.trajectory_similarity.lists(entity, method, metrics)
+    if name not in lists:
+        raise HTTPException(status_code=404, detail=f"{entity.capitalize()} '{name}' not found")
+    
+    def record(target, score):
+        item = {entity: target, "score": round(score, 3)}
+        if method == 'dtw':
+            item["distance"] = round(1 / score - 1, 3)
+        return item
+    
+    return {
+        "target": name,
+        "entity": entity,
+        "method": method,
+        "metrics": list(metrics),
+        "years": years.tolist(),
+        "most_similar": [record(target, score) for target, score in lists.most_similar(name, limit)],
+        "least_similar": [record(target, score) for target, score in lists.least_similar(name, 3)]
+    }
+
+@app.get("/api/similarity/trajectory")
+async def get_trajectory_similarity(
+    entity: str = Query(..., pattern="^(state|sector)$", description="Entity type"),
+    name: str = Query(..., description="State abbreviation or sector name"),
+    method: str = Query("cosine", pattern="^(cosine|dtw)$", description="Trajectory comparison"),
+    metric: Optional[List[str]] = Query(None, description="Per-year metrics to compare (default: all)"),
+    limit: int = Query(5, ge=1, le=50)
+):
+    """
+    Get states or sectors whose emissions changed most similarly over the years.
+    
+    Each per-year metric series is z-scored, then compared by cosine similarity
+    of the flattened series or by DTW (score 1 / (1 + distance)). Each
+    configuration is computed once per dataset version.
+    """
+    try:
+        metrics = tuple(metric) if metric else TRAJECTORY_METRICS
+        unknown = [item for item in metrics if item not in TRAJECTORY_METRICS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown metric(s) {unknown}, "
+                                                        f"expected {list(TRAJECTORY_METRICS)}")
+        metrics = tuple(item for item in TRAJECTORY_METRICS if item in metrics)
+        
+        snapshot = data_manager.snapshot
+        if snapshot is None or snapshot.trajectory_similarity is None:
+            raise HTTPException(status_code=503, detail="Data not loaded")
+        if entity == 'state':
+            name = name.upper()
+        return await run_scan(_trajectory_similarity, snapshot, entity, name, method, metrics, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _facility_records(snapshot, positions):
+    """Name, location and sector of indexed facilities, from their latest report."""
+    df = snapshot.facility_df.take(snapshot.facility_similarity.latest_rows[positions])
+    return to_records({
+        "facility_id": column_to_list(df['facility_id'], 'int'),
+        "facility_name": column_to_list(df['facility_name'], 'str', fill="Unknown"),
+        "city": column_to_list(df['city'], 'str'),
+        "state": column_to_list(df['state'], 'str'),
+        "industry_type_sectors": column_to_list(df['industry_type_sectors'], 'str'),
+    })
+
+@app.get("/api/similarity/facilities")
+async def get_facility_similarity(
+    facility_id: int = Query(..., description="Facility ID"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """
+    Get facilities whose yearly emissions are most similar to the target facility.
+    
+    Facilities are compared by cosine similarity of their standardized
+    emissions per reporting year, through the snapshot's nearest-neighbour
+    index (a lookup, no table scan).
+    """
+    try:
+        snapshot = data_manager.snapshot
+        index = snapshot.facility_similarity if snapshot is not None else None
+        if index is None:
+            raise HTTPException(status_code=404, detail="Facility data not available")
+        
+        neighbours = index.most_similar(facility_id, limit)
+        if neighbours is None:
+            raise HTTPException(status_code=404, detail=f"Facility {facility_id} not found")
+        
+        positions, scores = neighbours
+        result = _facility_records(snapshot, positions)
+        for record, score in zip(result, scores.tolist()):
+            record["score"] = round(score, 3)
+        
+        return {
+            "target": _facility_records(snapshot, [index.position(facility_id)])[0],
+            "years": index.years.tolist(),
+            "most_similar": result
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============================================================================
 # FACILITY ENDPOINTS
 # ============================================================================
 
+def _facility_list(snapshot, state, year, sector, limit, media_type):
+    """Body of get_facility_list, run in the scan pool."""
+    state_key = state.upper() if state else None
+    year_key = year if year else None
+    sector_key = sector if sector else None
+    filters = {
+        "state": state,
+        "year": year,
+        "sector": sector
+    }
+    
+    # Rankings are precomputed for year, state-year, sector-year and state-year-sector filters
+    ranked = None
+    if snapshot.facility_rankings is not None:
+        ranked = snapshot.facility_rankings.lookup(state=state_key, year=year_key, sector=sector_key)
+    
+    # Otherwise rank the rows found through the facility index (no scan or copy of the table)
+    if ranked is None and snapshot.facility_index is not None:
+        positions = snapshot.facility_index.lookup(state=state_key, year=year_key, sector=sector_key)
+        ranked = rank_positions(positions, snapshot.facility_df['total_reported_direct_emissions'].to_numpy())
+    
+    if ranked is None:
+        ranked = (np.array([], dtype=np.int64), np.array([], dtype=np.float64))
+    
+    # Top N by emissions
+    positions, percents = ranked[0][:limit], ranked[1][:limit]
+    df = snapshot.facility_df.take(positions)
+    
+    if media_type == ARROW_MEDIA_TYPE:
+        return arrow_response({
+            "facility_id": column_to_arrow(df['facility_id'], 'int'),
+            "facility_name": column_to_arrow(df['facility_name'], 'str', fill="Unknown"),
+            "city": column_to_arrow(df['city'], 'str'),
+            "state": column_to_arrow(df['state'], 'str'),
+            "total_emissions": column_to_arrow(df['total_reported_direct_emissions'], fill=0),
+            "co2": column_to_arrow(df['co2_emissions_non_biogenic'], fill=0),
+            "ch4": column_to_arrow(df['ch4_emissions'], fill=0),
+            "n2o": column_to_arrow(df['n2o_emissions'], fill=0),
+            "industry_type_sectors": column_to_arrow(df['industry_type_sectors'], 'str'),
+            "percent_of_total": np.round(percents, 2)
+        }, metadata={"total_count": len(df), "filters": filters})
+    
+    columns = {
+        "facility_id": column_to_list(df['facility_id'], 'int'),
+        "facility_name": column_to_list(df['facility_name'], 'str', fill="Unknown"),
+        "city": column_to_list(df['city'], 'str'),
+        "state": column_to_list(df['state'], 'str'),
+        "total_emissions": column_to_list(df['total_reported_direct_emissions'], fill=0),
+        "co2": column_to_list(df['co2_emissions_non_biogenic'], fill=0),
+        "ch4": column_to_list(df['ch4_emissions'], fill=0),
+        "n2o": column_to_list(df['n2o_emissions'], fill=0),
+        "industry_type_sectors": column_to_list(df['industry_type_sectors'], 'str'),
+        "percent_of_total": np.round(percents, 2).tolist()
+    }
+    
+    # MessagePack keeps the columns; JSON has one record per facility
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack_response({"facilities": columns, "total_count": len(df), "filters": filters})
+    
+    # The payload is already JSON-ready, so skip FastAPI's recursive encoder; encode
+    # it in chunks so the event loop is not blocked while this thread renders it
+    return ChunkedJSONResponse({
+        "facilities": to_records(columns),
+        "total_count": len(df),
+        "filters": filters
+    }, headers={"Vary": "Accept"})
+
 @app.get("/api/facility/list")
 async def get_facility_list(
+    request: Request,
     state: Optional[str] = Query(None, description="Filter by state"),
     year: Optional[int] = Query(None, ge=2010, le=2023, description="Filter by year"),
     sector: Optional[str] = Query(None, description="Filter by sector"),
     limit: int = Query(10, ge=1, le=10000)
 ):
-    """Get facility-level details with optional filters."""
+    """
+    Get facility-level details with optional filters.
+    
+    JSON by default; columnar Arrow IPC or MessagePack with an Accept header
+    of application/vnd.apache.arrow.stream or application/msgpack.
+    """
     try:
-        df = data_manager.facility_df.copy()
-        
-        # Apply filters
-        if state:
-            df = df[df['state'] == state.upper()]
-        if year:
-            df = df[df['reporting_year'] == year]
-        if sector:
-            df = df[df['industry_type_sectors'] == sector]
-        
-        if df.empty:
-            return {
-                "facilities": [],
-                "total_count": 0,
-                "filters": {
-                    "state": state,
-                    "year": year,
-                    "sector": sector
-                }
-            }
-        
-        # Sort by emissions and get top N
-        df = df.nlargest(limit, 'total_reported_direct_emissions')
-        
-        facilities = []
-        for _, row in df.iterrows():
-            facilities.append({
-                "facility_id": int(row['facility_id']) if pd.notna(row['facility_id']) else None,
-                "facility_name": str(row['facility_name']) if pd.notna(row['facility_name']) else "Unknown",
-                "city": str(row['city']) if pd.notna(row['city']) else None,
-                "state": str(row['state']) if pd.notna(row['state']) else None,
-                "total_emissions": float(row['total_reported_direct_emissions']) if pd.notna(row['total_reported_direct_emissions']) else 0,
-                "co2": float(row['co2_emissions_non_biogenic']) if pd.notna(row['co2_emissions_non_biogenic']) else 0,
-                "ch4": float(row['ch4_emissions']) if pd.notna(row['ch4_emissions']) else 0,
-                "n2o": float(row['n2o_emissions']) if pd.notna(row['n2o_emissions']) else 0,
-                "industry_type_sectors": str(row['industry_type_sectors']) if pd.notna(row['industry_type_sectors']) else None
-            })
-        
-        return {
-            "facilities": facilities,
-            "total_count": len(df),
-            "filters": {
-                "state": state,
-                "year": year,
-                "sector": sector
-            }
-        }
+        media_type = negotiate_format(request.headers.get('accept'))
+        return await run_scan(_facility_list, data_manager.snapshot, state, year, sector, limit, media_type)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -495,6 +657,35 @@ async def get_facility_list(
 # ANALYTICS ENDPOINTS
 # ============================================================================
 
+def _low_emission_states(snapshot, year, percentile):
+    """Body of get_low_emission_states, run in the scan pool."""
+    year_data = snapshot.state_year_df[snapshot.state_year_df['year'] == year].copy()
+    
+    if year_data.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for year {year}")
+    
+    # Calculate threshold
+    threshold = float(year_data['total_emissions'].quantile(percentile / 100))
+    
+    # Get low emission states
+    low_emission = year_data[year_data['total_emissions'] <= threshold].copy()
+    low_emission = low_emission.sort_values('total_emissions').reset_index()
+    low_emission['rank'] = range(1, len(low_emission) + 1)
+    
+    result = to_records({
+        "state": column_to_list(low_emission['state'], 'str'),
+        "emissions": column_to_list(low_emission['total_emissions']),
+        "rank": column_to_list(low_emission['rank'], 'int')
+    })
+    
+    return {
+        "year": year,
+        "percentile": percentile,
+        "threshold": threshold,
+        "states": result,
+        "count": len(result)
+    }
+
 @app.get("/api/states/low_emission")
 async def get_low_emission_states(
     year: int = Query(2023, ge=2010, le=2023),
@@ -502,39 +693,54 @@ async def get_low_emission_states(
 ):
     """Get states with emissions below a given percentile."""
     try:
-        year_data = data_manager.state_year_df[data_manager.state_year_df['year'] == year].copy()
-        
-        if year_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
-        
-        # Calculate threshold
-        threshold = float(year_data['total_emissions'].quantile(percentile / 100))
-        
-        # Get low emission states
-        low_emission = year_data[year_data['total_emissions'] <= threshold].copy()
-        low_emission = low_emission.sort_values('total_emissions').reset_index()
-        low_emission['rank'] = range(1, len(low_emission) + 1)
-        
-        result = []
-        for _, row in low_emission.iterrows():
-            result.append({
-                "state": row['state'],
-                "emissions": float(row['total_emissions']),
-                "rank": int(row['rank'])
-            })
-        
-        return {
-            "year": year,
-            "percentile": percentile,
-            "threshold": threshold,
-            "states": result,
-            "count": len(result)
-        }
+        return await run_scan(_low_emission_states, data_manager.snapshot, year, percentile)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _states_reduction(snapshot, threshold, baseline_year):
+    """Body of get_states_reduction, run in the scan pool."""
+    baseline_data = snapshot.state_year_df[snapshot.state_year_df['year'] == baseline_year].copy()
+    latest_year = int(snapshot.state_year_df['year'].max())
+    latest_data = snapshot.state_year_df[snapshot.state_year_df['year'] == latest_year].copy()
+    
+    # Merge to compare
+    comparison = baseline_data[['state', 'total_emissions']].merge(
+        latest_data[['state', 'total_emissions']],
+        on='state',
+        suffixes=('_baseline', '_current')
+    )
+    
+    # Calculate reduction
+    comparison['reduction_percent'] = (
+        (comparison['total_emissions_current'] - comparison['total_emissions_baseline']) /
+        comparison['total_emissions_baseline'] * 100
+    )
+    comparison['reduction_absolute'] = (
+        comparison['total_emissions_current'] - comparison['total_emissions_baseline']
+    )
+    
+    # Filter by threshold (negative = reduction)
+    reduced_states = comparison[comparison['reduction_percent'] <= -threshold].copy()
+    reduced_states = reduced_states.sort_values('reduction_percent')
+    
+    result = to_records({
+        "state": column_to_list(reduced_states['state'], 'str'),
+        "emissions_baseline": column_to_list(reduced_states['total_emissions_baseline']),
+        "emissions_current": column_to_list(reduced_states['total_emissions_current']),
+        "reduction_percent": column_to_list(reduced_states['reduction_percent'], decimals=2),
+        "reduction_absolute": column_to_list(reduced_states['reduction_absolute'])
+    })
+    
+    return {
+        "baseline_year": baseline_year,
+        "current_year": latest_year,
+        "threshold_percent": threshold,
+        "states": result,
+        "count": len(result)
+    }
+
 @app.get("/api/states/reduction")
 async def get_states_reduction(
     threshold: float = Query(20.0, ge=0, description="Minimum reduction percentage"),
@@ -542,50 +748,40 @@ async def get_states_reduction(
 ):
     """Get states with emissions reduction above threshold since baseline year."""
     try:
-        baseline_data = data_manager.state_year_df[data_manager.state_year_df['year'] == baseline_year].copy()
-        latest_year = int(data_manager.state_year_df['year'].max())
-        latest_data = data_manager.state_year_df[data_manager.state_year_df['year'] == latest_year].copy()
-        
-        # Merge to compare
-        comparison = baseline_data[['state', 'total_emissions']].merge(
-            latest_data[['state', 'total_emissions']],
-            on='state',
-            suffixes=('_baseline', '_current')
-        )
-        
-        # Calculate reduction
-        comparison['reduction_percent'] = (
-            (comparison['total_emissions_current'] - comparison['total_emissions_baseline']) /
-            comparison['total_emissions_baseline'] * 100
-        )
-        comparison['reduction_absolute'] = (
-            comparison['total_emissions_current'] - comparison['total_emissions_baseline']
-        )
-        
-        # Filter by threshold (negative = reduction)
-        reduced_states = comparison[comparison['reduction_percent'] <= -threshold].copy()
-        reduced_states = reduced_states.sort_values('reduction_percent')
-        
-        result = []
-        for _, row in reduced_states.iterrows():
-            result.append({
-                "state": row['state'],
-                "emissions_baseline": float(row['total_emissions_baseline']),
-                "emissions_current": float(row['total_emissions_current']),
-                "reduction_percent": round(float(row['reduction_percent']), 2),
-                "reduction_absolute": float(row['reduction_absolute'])
-            })
-        
-        return {
-            "baseline_year": baseline_year,
-            "current_year": latest_year,
-            "threshold_percent": threshold,
-            "states": result,
-            "count": len(result)
-        }
+        return await run_scan(_states_reduction, data_manager.snapshot, threshold, baseline_year)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _high_methane_states(snapshot, year, threshold):
+    """Body of get_high_methane_states, run in the scan pool."""
+    year_data = snapshot.state_year_df[snapshot.state_year_df['year'] == year].copy()
+    
+    if year_data.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for year {year}")
+    
+    # Calculate CH4 percentage
+    year_data['ch4_percent'] = (year_data['ch4'] / year_data['total_emissions'] * 100).fillna(0)
+    
+    # Filter by threshold
+    high_methane = year_data[year_data['ch4_percent'] >= threshold].copy()
+    high_methane = high_methane.sort_values('ch4_percent', ascending=False)
+    
+    result = to_records({
+        "state": column_to_list(high_methane['state'], 'str'),
+        "total_emissions": column_to_list(high_methane['total_emissions']),
+        "ch4_emissions": column_to_list(high_methane['ch4']),
+        "ch4_percent": column_to_list(high_methane['ch4_percent'], decimals=2)
+    })
+    
+    return {
+        "year": year,
+        "threshold_percent": threshold,
+        "states": result,
+        "count": len(result)
+    }
+
 @app.get("/api/states/high_methane")
 async def get_high_methane_states(
     year: int = Query(2023, ge=2010, le=2023),
@@ -593,33 +789,7 @@ async def get_high_methane_states(
 ):
     """Get states where CH4 emissions exceed threshold percentage of total."""
     try:
-        year_data = data_manager.state_year_df[data_manager.state_year_df['year'] == year].copy()
-        
-        if year_data.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for year {year}")
-        
-        # Calculate CH4 percentage
-        year_data['ch4_percent'] = (year_data['ch4'] / year_data['total_emissions'] * 100).fillna(0)
-        
-        # Filter by threshold
-        high_methane = year_data[year_data['ch4_percent'] >= threshold].copy()
-        high_methane = high_methane.sort_values('ch4_percent', ascending=False)
-        
-        result = []
-        for _, row in high_methane.iterrows():
-            result.append({
-                "state": row['state'],
-                "total_emissions": float(row['total_emissions']),
-                "ch4_emissions": float(row['ch4']),
-                "ch4_percent": round(float(row['ch4_percent']), 2)
-            })
-        
-        return {
-            "year": year,
-            "threshold_percent": threshold,
-            "states": result,
-            "count": len(result)
-        }
+        return await run_scan(_high_methane_states, data_manager.snapshot, year, threshold)
     except HTTPException:
         raise
     except Exception as e:
@@ -629,86 +799,146 @@ async def get_high_methane_states(
 # DATASET STATISTICS ENDPOINTS
 # ============================================================================
 
+def _dataset_stats(snapshot):
+    """Body of get_dataset_stats, run in the scan pool."""
+    # Count total records (facility-year combinations)
+    total_records = len(snapshot.facility_df) if snapshot.facility_df is not None and not snapshot.facility_df.empty else 0
+    
+    # Count unique years
+    if snapshot.facility_df is not None and not snapshot.facility_df.empty and 'reporting_year' in snapshot.facility_df.columns:
+        unique_years = snapshot.facility_df['reporting_year'].nunique()
+        years_list = sorted(snapshot.facility_df['reporting_year'].unique().tolist())
+    else:
+        unique_years = 14  # Default
+        years_list = list(range(2010, 2024))
+    
+    # Count unique states (including DC)
+    if snapshot.facility_df is not None and not snapshot.facility_df.empty and 'state' in snapshot.facility_df.columns:
+        unique_states = snapshot.facility_df['state'].nunique()
+    elif snapshot.state_year_df is not None and not snapshot.state_year_df.empty:
+        unique_states = snapshot.state_year_df['state'].nunique()
+    else:
+        unique_states = 51  # Default (50 states + DC)
+    
+    # Count columns
+    if snapshot.facility_df is not None and not snapshot.facility_df.empty:
+        column_count = len(snapshot.facility_df.columns)
+    else:
+        column_count = 14  # Default
+    
+    return {
+        "total_records": total_records,
+        "years_covered": unique_years,
+        "years_list": years_list,
+        "states_count": unique_states,
+        "column_count": column_count
+    }
+
 @app.get("/api/dataset/stats")
 async def get_dataset_stats():
     """Get overall dataset statistics."""
     try:
-        # Count total records (facility-year combinations)
-        total_records = len(data_manager.facility_df) if data_manager.facility_df is not None and not data_manager.facility_df.empty else 0
-        
-        # Count unique years
-        if data_manager.facility_df is not None and not data_manager.facility_df.empty and 'reporting_year' in data_manager.facility_df.columns:
-            unique_years = data_manager.facility_df['reporting_year'].nunique()
-            years_list = sorted(data_manager.facility_df['reporting_year'].unique().tolist())
-        else:
-            unique_years = 14  # Default
-            years_list = list(range(2010, 2024))
-        
-        # Count unique states (including DC)
-        if data_manager.facility_df is not None and not data_manager.facility_df.empty and 'state' in data_manager.facility_df.columns:
-            unique_states = data_manager.facility_df['state'].nunique()
-        elif data_manager.state_year_df is not None and not data_manager.state_year_df.empty:
-            unique_states = data_manager.state_year_df['state'].nunique()
-        else:
-            unique_states = 51  # Default (50 states + DC)
-        
-        # Count columns
-        if data_manager.facility_df is not None and not data_manager.facility_df.empty:
-            column_count = len(data_manager.facility_df.columns)
-        else:
-            column_count = 14  # Default
-        
-        return {
-            "total_records": total_records,
-            "years_covered": unique_years,
-            "years_list": years_list,
-            "states_count": unique_states,
-            "column_count": column_count
-        }
+        return await run_scan(_dataset_stats, data_manager.snapshot)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _dataset_sample(snapshot, limit):
+    """Body of get_dataset_sample, run in the scan pool."""
+    if snapshot.facility_df is None or snapshot.facility_df.empty:
+        raise HTTPException(status_code=404, detail="Facility data not available")
+    
+    # Get sample rows (first N with valid data)
+    sample_df = snapshot.facility_df[
+        (snapshot.facility_df['total_reported_direct_emissions'].notna()) &
+        (snapshot.facility_df['total_reported_direct_emissions'] > 0)
+    ].head(limit).copy()
+    
+    if sample_df.empty:
+        raise HTTPException(status_code=404, detail="No sample data available")
+    
+    # Emissions are converted to millions
+    result = to_records({
+        "facility_id": column_to_list(sample_df['facility_id'], 'int'),
+        "facility_name": column_to_list(sample_df['facility_name'], 'str', fill="Unknown"),
+        "state": column_to_list(sample_df['state'], 'str'),
+        "sector": column_to_list(sample_df['industry_type_sectors'], 'str', fill="Other"),
+        "year": column_to_list(sample_df['reporting_year'], 'int'),
+        "total_emissions": column_to_list(sample_df['total_reported_direct_emissions'] / 1e6, fill=0),
+        "co2": column_to_list(sample_df['co2_emissions_non_biogenic'] / 1e6, fill=0),
+        "ch4": column_to_list(sample_df['ch4_emissions'] / 1e6, fill=0),
+        "n2o": column_to_list(sample_df['n2o_emissions'] / 1e6, fill=0),
+    })
+    
+    return {
+        "sample": result,
+        "count": len(result)
+    }
+
 @app.get("/api/dataset/sample")
 async def get_dataset_sample(
     limit: int = Query(5, ge=1, le=10)
 ):
     """Get sample facility data for display."""
     try:
-        if data_manager.facility_df is None or data_manager.facility_df.empty:
-            raise HTTPException(status_code=404, detail="Facility data not available")
-        
-        # Get sample rows (first N with valid data)
-        sample_df = data_manager.facility_df[
-            (data_manager.facility_df['total_reported_direct_emissions'].notna()) &
-            (data_manager.facility_df['total_reported_direct_emissions'] > 0)
-        ].head(limit).copy()
-        
-        if sample_df.empty:
-            raise HTTPException(status_code=404, detail="No sample data available")
-        
-        result = []
-        for _, row in sample_df.iterrows():
-            result.append({
-                "facility_id": int(row['facility_id']) if pd.notna(row['facility_id']) else None,
-                "facility_name": str(row['facility_name']) if pd.notna(row['facility_name']) else "Unknown",
-                "state": str(row['state']) if pd.notna(row['state']) else None,
-                "sector": str(row['industry_type_sectors']) if pd.notna(row['industry_type_sectors']) else "Other",
-                "year": int(row['reporting_year']) if pd.notna(row['reporting_year']) else None,
-                "total_emissions": float(row['total_reported_direct_emissions']) / 1e6 if pd.notna(row['total_reported_direct_emissions']) else 0,  # Convert to millions
-                "co2": float(row['co2_emissions_non_biogenic']) / 1e6 if pd.notna(row['co2_emissions_non_biogenic']) else 0,
-                "ch4": float(row['ch4_emissions']) / 1e6 if pd.notna(row['ch4_emissions']) else 0,
-                "n2o": float(row['n2o_emissions']) / 1e6 if pd.notna(row['n2o_emissions']) else 0,
-            })
-        
-        return {
-            "sample": result,
-            "count": len(result)
-        }
+        return await run_scan(_dataset_sample, data_manager.snapshot, limit)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============================================================================
+# BATCH ENDPOINTS
+# ============================================================================
+
+@app.post("/api/batch")
+async def run_batch_queries(
+    queries: List[str] = Body(..., embed=True, description="GET URLs relative to /api, e.g. '/summary/us?year=2023'")
+):
+    """Answer several GET queries against one data snapshot in one round trip."""
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    
+    snapshot = data_manager.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Data not loaded")
+    
+    # Sub-queries run through the whole app (validation, response cache) with
+    # this snapshot pinned, so a reload cannot split the batch across versions
+    with data_manager.pinned(snapshot):
+        body = await run_batch(app, queries, snapshot.dataset_version)
+    return Response(content=body, media_type="application/json")
+
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+@app.get("/api/admin/snapshot")
+async def get_snapshot_info():
+    """Get the version and build time of the data snapshot being served."""
+    snapshot = data_manager.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Data not loaded")
+    
+    return {
+        "version": snapshot.dataset_version,
+        "built_at": datetime.fromtimestamp(snapshot.built_at, tz=timezone.utc).isoformat(),
+        "build_seconds": round(snapshot.build_seconds, 3),
+        "data_dir": str(snapshot.data_dir),
+        "source": snapshot.source,
+        "shared_dataset": str(data_manager.shared.directory) if data_manager.shared else None,
+        "watching": data_manager.watching,
+        "reload_count": data_manager.reload_count,
+        "last_reload_error": data_manager.last_reload_error,
+        "scan_pool": {
+            "threads": scan_pool.max_workers,
+            "queue": scan_pool.max_queue,
+            "active": scan_pool.active,
+            "rejected": scan_pool.rejected
+        }
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,164 @@
+"""
+Columnar JSON serialization helpers for the FastAPI backend.
+Convert DataFrame columns to JSON-ready Python lists in bulk instead of
+building responses row by row with iterrows.
+"""
+
+import json
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+from typing import Any, Dict, List, Optional
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are not offered (see backend/encoding.py)
+    pa = None
+
+
+def _text_values(series: pd.Series) -> np.ndarray:
+    """
+    Convert a column to an object array of strings.
+    
+    Categorical columns (text columns of the shared dataset) are converted
+    by taking their rows' categories: converting every category would cost
+    one string per distinct value, however few rows are selected. Missing
+    entries are left to the caller (they are not 'nan' here).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categorical = series.array
+        if categorical.categories.inferred_type == 'string':
+            return categorical.categories.to_numpy().take(categorical.codes, mode='clip')
+        series = series.astype(object)
+    return series.astype(str).to_numpy(dtype=object)
+
+
+def column_to_list(series: pd.Series,
+                   kind: str = 'float',
+                   fill: Any = None,
+                   decimals: Optional[int] = None) -> List:
+    """
+    Convert a column to a list of native Python values.
+    
+    Missing values are replaced by fill in one step (None serializes as null).
+    
+    Args:
+        series: Column to convert
+        kind: 'float', 'int' or 'str'
+        fill: Value used for missing entries
+        decimals: Round floats to this many decimals (Python round semantics)
+    
+    Returns:
+        List of float/int/str values, with fill for missing entries
+    """
+    missing = series.isna().to_numpy()
+    
+    if kind == 'float':
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+    elif kind == 'int':
+        values = series.fillna(0).to_numpy(dtype='int64')
+    elif kind == 'str':
+        values = _text_values(series)
+    else:
+        raise ValueError(f"Unknown column kind '{kind}', expected 'float', 'int' or 'str'")
+    
+    values = values.astype(object)
+    if missing.any():
+        values[missing] = fill
+    values = values.tolist()
+    
+    if decimals is not None:
+        values = [round(value, decimals) if isinstance(value, float) else value for value in values]
+    
+    return values
+
+
+def column_to_arrow(series: pd.Series,
+                    kind: str = 'float',
+                    fill: Any = None,
+                    decimals: Optional[int] = None) -> "pa.Array":
+    """
+    Convert a column to an Arrow array with the values column_to_list gives.
+    
+    Missing values become fill, or nulls if fill is None. Requires pyarrow.
+    
+    Args:
+        series: Column to convert
+        kind: 'float', 'int' or 'str'
+        fill: Value used for missing entries
+        decimals: Round floats to this many decimals
+    
+    Returns:
+        float64, int64 or string array
+    """
+    missing = series.isna().to_numpy()
+    
+    if kind == 'float':
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        if decimals is not None:
+            values = np.round(values, decimals)
+    elif kind == 'int':
+        values = series.fillna(0).to_numpy(dtype='int64')
+    elif kind == 'str':
+        values = _text_values(series)
+    else:
+        raise ValueError(f"Unknown column kind '{kind}', expected 'float', 'int' or 'str'")
+    
+    if not missing.any():
+        return pa.array(values)
+    if fill is not None:
+        values = values.copy()
+        values[missing] = fill
+        return pa.array(values)
+    return pa.array(values, mask=missing)
+
+
+def to_records(columns: Dict[str, List]) -> List[Dict]:
+    """
+    Zip equally long columns into a list of record dictionaries.
+    
+    Args:
+        columns: Output key -> list of values (see column_to_list)
+    
+    Returns:
+        List of {key: value} dictionaries, one per row
+    """
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
+def dumps_compact(content: Any) -> str:
+    """Encode JSON exactly like FastAPI's JSONResponse (compact, UTF-8 text, no NaN)."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+
+
+def dumps_chunked(content: Any, chunk_size: int = 500) -> str:
+    """
+    Encode JSON exactly like JSONResponse, at most chunk_size list items per call.
+    
+    The C encoder holds the GIL for a whole call; encoding a 10,000-row list
+    in one call stalls the event loop while a pool thread renders it.
+    
+    Args:
+        content: JSON-ready value (see to_records)
+        chunk_size: Maximum number of list items encoded per call
+    
+    Returns:
+        JSON text
+    """
+    if isinstance(content, dict) and all(isinstance(key, str) for key in content):
+        return "{" + ",".join(
+            dumps_compact(key) + ":" + dumps_chunked(value, chunk_size) for key, value in content.items()
+        ) + "}"
+    if isinstance(content, list) and len(content) > chunk_size:
+        return "[" + ",".join(
+            dumps_compact(content[start:start + chunk_size])[1:-1] for start in range(0, len(content), chunk_size)
+        ) + "]"
+    return dumps_compact(content)
+
+
+class ChunkedJSONResponse(JSONResponse):
+    """JSONResponse that encodes long lists in chunks (see dumps_chunked)."""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps_chunked(content).encode("utf-8")
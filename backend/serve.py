@@ -0,0 +1,68 @@
+"""
+Run the backend with several worker processes sharing one copy of the dataset.
+
+The parent process loads data_processed once, publishes it in shared memory
+and starts uvicorn workers that attach to it (see backend/shared.py). It also
+watches data_processed and publishes a new snapshot when the pipeline writes
+new output; workers switch to it on their next poll.
+
+Usage:
+    python backend/serve.py --workers 4
+"""
+
+import argparse
+import os
+import signal
+import sys
+from pathlib import Path
+
+import uvicorn
+
+# Add parent directory to path for utils
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.utils import DataManager
+from backend.shared import SHARED_DATASET_ENV, SharedDatasetPublisher
+
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Run the backend API with workers sharing one dataset.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="data_processed directory to serve (default: the project's)")
+    parser.add_argument("--watch-interval", type=float,
+                        default=float(os.environ.get("DATA_WATCH_INTERVAL", 2.0)),
+                        help="Seconds between checks for new pipeline output (0 disables hot reload)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    
+    # uvicorn re-raises SIGTERM once it has shut down; exit normally so the
+    # shared files are removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    publisher = SharedDatasetPublisher()
+    data_manager = DataManager(args.data_dir, publisher=publisher)
+    try:
+        data_manager.load_all_data()
+        if args.watch_interval > 0:
+            data_manager.start_watching(args.watch_interval)
+        
+        # Workers inherit the environment: they attach instead of loading, and
+        # follow the snapshots published here instead of watching data_processed
+        os.environ[SHARED_DATASET_ENV] = str(publisher.directory)
+        os.environ["DATA_WATCH_INTERVAL"] = str(args.watch_interval)
+        uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        data_manager.stop_watching()
+        publisher.close()
+
+
+if __name__ == "__main__":
+    main()
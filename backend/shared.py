@@ -0,0 +1,218 @@
+"""
+Shared-memory dataset for running the backend with several worker processes.
+The parent process loads the data once and writes the snapshot to a file in
+shared memory (/dev/shm); workers memory-map it and use read-only views of
+its arrays instead of loading their own copy.
+"""
+
+import copy
+import mmap
+import pickle
+import shutil
+import struct
+import tempfile
+import pandas as pd
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from backend.utils import DataSnapshot
+
+
+# Environment variable telling worker processes where the shared dataset is published
+SHARED_DATASET_ENV = "GHG_SHARED_DATASET"
+
+MAGIC = b"GHGSHM02"
+HEADER = struct.Struct("<8sQQ")  # magic, payload length, number of buffers
+SPAN = struct.Struct("<QQ")      # buffer offset, buffer length
+ALIGNMENT = 64
+CURRENT_FILENAME = "current"
+
+
+def get_default_shared_dir() -> Path:
+    """Get the directory for shared datasets (/dev/shm if available)."""
+    shm = Path("/dev/shm")
+    return shm if shm.is_dir() else Path(tempfile.gettempdir())
+
+
+def _encode_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store the text columns of a frame as categoricals.
+    
+    Categorical codes are a numeric array that can be shared like the other
+    columns; only the distinct values are copied into each worker. Readers
+    of the frames handle categorical columns, so they stay categorical.
+    """
+    object_columns = [column for column in df.columns if df[column].dtype == object]
+    if not object_columns:
+        return df
+    encoded = df.copy(deep=False)
+    for column in object_columns:
+        encoded[column] = df[column].astype('category')
+    return encoded
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_shared_snapshot(snapshot: "DataSnapshot", path: Path) -> int:
+    """
+    Write a snapshot to a file that workers can memory-map.
+    
+    The snapshot is pickled with protocol 5, so every numpy array (DataFrame
+    blocks, index positions, cube cells and rankings, trend row JSON) and
+    Arrow buffer (all_years, if not yet converted) is written out of band as
+    raw bytes. Text columns of DataFrames are stored as categorical codes.
+    
+    Args:
+        snapshot: Loaded snapshot
+        path: Output file
+    
+    Returns:
+        Size of the written file in bytes
+    """
+    state = copy.copy(snapshot)
+    
+    encoded_frames: Dict[int, pd.DataFrame] = {}
+    for name, value in list(vars(state).items()):
+        if isinstance(value, pd.DataFrame):
+            # facility_df may be the all_years frame itself; encode it once
+            if id(value) not in encoded_frames:
+                encoded_frames[id(value)] = _encode_frame(value)
+            setattr(state, name, encoded_frames[id(value)])
+    
+    buffers = []
+    payload = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    
+    spans = []
+    offset = _align(HEADER.size + SPAN.size * len(raws) + len(payload))
+    for raw in raws:
+        spans.append((offset, raw.nbytes))
+        offset = _align(offset + raw.nbytes)
+    
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(payload), len(raws)))
+        for span in spans:
+            f.write(SPAN.pack(*span))
+        f.write(payload)
+        for (start, _), raw in zip(spans, raws):
+            f.seek(start)
+            f.write(raw)
+        f.truncate(offset)
+    return offset
+
+
+def read_shared_snapshot(path: Path) -> "DataSnapshot":
+    """
+    Map a snapshot written by write_shared_snapshot.
+    
+    Arrays are read-only views of the mapping, which stays open as long as
+    any of them is referenced. Text columns of DataFrames stay categorical
+    (only their distinct values are private to the worker).
+    
+    Args:
+        path: Snapshot file
+    
+    Returns:
+        DataSnapshot backed by the shared mapping
+    """
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    
+    magic, payload_length, n_buffers = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"Not a shared snapshot: {path}")
+    spans = [SPAN.unpack_from(view, HEADER.size + SPAN.size * i) for i in range(n_buffers)]
+    payload_start = HEADER.size + SPAN.size * n_buffers
+    
+    return pickle.loads(
+        view[payload_start:payload_start + payload_length],
+        buffers=[view[start:start + length] for start, length in spans]
+    )
+
+
+class SharedDatasetPublisher:
+    """
+    Publishes snapshots for worker processes (used by the parent process).
+    
+    Each snapshot goes to a new file; a small 'current' file names the latest
+    one and is replaced atomically. The previous file is removed once a new
+    one is published: workers that still map it keep their pages until they
+    switch over.
+    """
+    
+    def __init__(self, base_dir: Optional[Path] = None):
+        """
+        Initialize SharedDatasetPublisher.
+        
+        Args:
+            base_dir: Directory to publish in (default: /dev/shm, else the temp directory)
+        """
+        self.directory = Path(tempfile.mkdtemp(prefix="ghg-dataset-", dir=base_dir or get_default_shared_dir()))
+        self.generation = 0
+        self._current: Optional[Path] = None
+    
+    def publish(self, snapshot: "DataSnapshot") -> Path:
+        """Write a snapshot and make it the current one."""
+        self.generation += 1
+        path = self.directory / f"snapshot-{self.generation}.bin"
+        size = write_shared_snapshot(snapshot, path)
+        
+        tmp_path = self.directory / f"{CURRENT_FILENAME}.tmp"
+        tmp_path.write_text(path.name)
+        tmp_path.replace(self.directory / CURRENT_FILENAME)
+        
+        previous, self._current = self._current, path
+        if previous is not None:
+            previous.unlink(missing_ok=True)
+        print(f"✓ Published shared snapshot {snapshot.dataset_version[:12]} "
+              f"({size / 1024 ** 2:.1f} MB) to {path}")
+        return path
+    
+    def close(self) -> None:
+        """Remove all published files."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class SharedDatasetReader:
+    """Attaches to the snapshots published by a SharedDatasetPublisher (used by workers)."""
+    
+    def __init__(self, directory: Path):
+        """
+        Initialize SharedDatasetReader.
+        
+        Args:
+            directory: Publisher directory (SharedDatasetPublisher.directory)
+        """
+        self.directory = directory
+    
+    def current(self) -> Optional[str]:
+        """Get the file name of the current snapshot, or None if none is published."""
+        try:
+            return (self.directory / CURRENT_FILENAME).read_text()
+        except FileNotFoundError:
+            return None
+    
+    def attach(self, retries: int = 3) -> "DataSnapshot":
+        """
+        Map the current snapshot.
+        
+        Args:
+            retries: Attempts if the file is replaced between reading its name and opening it
+        
+        Returns:
+            DataSnapshot backed by shared memory
+        """
+        for attempt in range(retries):
+            name = self.current()
+            if name is None:
+                raise FileNotFoundError(f"No shared snapshot published in {self.directory}")
+            try:
+                return read_shared_snapshot(self.directory / name)
+            except FileNotFoundError:
+                if attempt == retries - 1:
+                    raise
+        raise FileNotFoundError(f"No shared snapshot published in {self.directory}")
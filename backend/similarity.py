@@ -0,0 +1,252 @@
+"""
+Precomputed similarity lists for the FastAPI backend.
+Each entity's most and least similar entities are looked up, never sorted
+per request. Trajectory similarity (how emissions change over the years)
+is computed per configuration on first use and cached with the snapshot.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Lists kept when building from a dense matrix (as the pipeline's top-k files)
+SIMILARITY_TOP_K = 50
+SIMILARITY_BOTTOM_K = 10
+
+# Per-year metrics a trajectory can be built from, and the ways trajectories are compared
+TRAJECTORY_METRICS = ('total_emissions', 'co2', 'ch4', 'n2o')
+TRAJECTORY_METHODS = ('cosine', 'dtw')
+
+
+class SimilarityLists:
+    """
+    Most and least similar entities of every entity, with their scores.
+    
+    Loaded from the pipeline's top-k file (src.similarity.save_similarity_topk),
+    or built from a dense similarity matrix for older pipeline output. Holds
+    O(N*k) arrays instead of the N x N matrix.
+    """
+    
+    def __init__(self,
+                 entities: np.ndarray,
+                 nearest: np.ndarray,
+                 nearest_scores: np.ndarray,
+                 farthest: np.ndarray,
+                 farthest_scores: np.ndarray):
+        """
+        Initialize SimilarityLists.
+        
+        Args:
+            entities: Entity names
+            nearest: Positions of each entity's most similar entities, most similar first
+            nearest_scores: Their similarity scores
+            farthest: Positions of each entity's least similar entities, least similar first
+            farthest_scores: Their similarity scores
+        """
+        self.entities = entities
+        self.nearest = nearest
+        self.nearest_scores = nearest_scores
+        self.farthest = farthest
+        self.farthest_scores = farthest_scores
+        self.positions = {name: position for position, name in enumerate(entities.tolist())}
+    
+    @classmethod
+    def from_file(cls, path: Path) -> "SimilarityLists":
+        """Load a top-k similarity file (.npz) written by the pipeline."""
+        with np.load(path, allow_pickle=False) as archive:
+            return cls(archive['entities'], archive['nearest'], archive['nearest_scores'],
+                       archive['farthest'], archive['farthest_scores'])
+    
+    @classmethod
+    def from_matrix(cls,
+                    similarity_df: pd.DataFrame,
+                    k: int = SIMILARITY_TOP_K,
+                    k_farthest: int = SIMILARITY_BOTTOM_K) -> "SimilarityLists":
+        """
+        Build the lists from a dense similarity matrix, as the pipeline does.
+        
+        Each entity is excluded from its own lists; ties are broken by entity position.
+        
+        Args:
+            similarity_df: Similarity matrix (entities x entities, same order)
+            k: Most similar entities kept per entity
+            k_farthest: Least similar entities kept per entity
+        """
+        scores = similarity_df.to_numpy(dtype='float64')
+        n = len(scores)
+        
+        lists = []
+        for sign, count in ((1, k), (-1, k_farthest)):
+            keyed = -sign * scores
+            keyed[np.arange(n), np.arange(n)] = np.inf  # Self last
+            positions = np.argsort(keyed, axis=1, kind='stable')[:, :min(count, n - 1)].astype(np.int32)
+            lists += [positions, np.take_along_axis(scores, positions, axis=1)]
+        return cls(np.asarray(similarity_df.columns.astype(str), dtype=str), *lists)
+    
+    def __len__(self) -> int:
+        return len(self.entities)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.positions
+    
+    def most_similar(self, name: str, limit: int) -> List[Tuple[str, float]]:
+        """Get up to limit (name, score) pairs of the most similar entities, most similar first."""
+        position = self.positions[name]
+        return list(zip(self.entities[self.nearest[position, :limit]].tolist(),
+                        self.nearest_scores[position, :limit].tolist()))
+    
+    def least_similar(self, name: str, limit: int) -> List[Tuple[str, float]]:
+        """Get up to limit (name, score) pairs of the least similar entities, least similar first."""
+        position = self.positions[name]
+        return list(zip(self.entities[self.farthest[position, :limit]].tolist(),
+                        self.farthest_scores[position, :limit].tolist()))
+
+
+def trajectory_tensor(df_year: pd.DataFrame,
+                      entity_col: str,
+                      metrics: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build per-entity year x metric series from state-year or sector-year aggregates.
+    
+    Args:
+        df_year: Year aggregates (entity_col, year and the metric columns)
+        entity_col: Entity column ('state' or 'sector')
+        metrics: Metric columns, one series each
+    
+    Returns:
+        (entity names, years, values as entities x years x metrics), with 0
+        for years an entity has no row
+    """
+    grouped = df_year.groupby([entity_col, 'year'], observed=True)[list(metrics)].sum()
+    values = grouped.unstack('year', fill_value=0)
+    years = values.columns.get_level_values('year').unique().sort_values()
+    values = values.reindex(columns=pd.MultiIndex.from_product([list(metrics), years]), fill_value=0)
+    tensor = values.to_numpy(dtype='float64').reshape(len(values), len(metrics), len(years))
+    return (np.asarray(values.index.astype(str), dtype=str), years.to_numpy(dtype='int64'),
+            tensor.transpose(0, 2, 1))
+
+
+def zscore_series(tensor: np.ndarray) -> np.ndarray:
+    """
+    Z-score every entity's series of every metric over the years.
+    
+    Compares the shape of trajectories rather than their size; a constant
+    series becomes all zeros.
+    """
+    std = tensor.std(axis=1, keepdims=True)
+    std[std == 0] = 1
+    return (tensor - tensor.mean(axis=1, keepdims=True)) / std
+
+
+def cosine_trajectory_similarity(series: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of flattened series for all pairs of entities.
+    
+    Args:
+        series: Normalized series (entities x years x metrics)
+    
+    Returns:
+        Similarity matrix (entities x entities)
+    """
+    flat = series.reshape(len(series), -1)
+    norms = np.linalg.norm(flat, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    flat = flat / norms
+    return flat @ flat.T
+
+
+def dtw_distances(series: np.ndarray, window: Optional[int] = None) -> np.ndarray:
+    """
+    Dynamic time warping distance for all pairs of entities.
+    
+    The recurrence runs once over the years x years grid, with every step
+    vectorized across all entity pairs (an entities x entities array), so
+    the cost is O(years^2 * entities^2) array work and no Python loop over pairs.
+    Steps are Euclidean distances between the entities' metric vectors.
+    
+    Args:
+        series: Normalized series (entities x years x metrics)
+        window: Largest allowed shift in years (Sakoe-Chiba band), or None for any
+    
+    Returns:
+        Symmetric distance matrix (entities x entities), 0 on the diagonal
+    """
+    n, n_years, _ = series.shape
+    if window is None:
+        window = n_years
+    
+    # previous[b] / current[b]: cumulative cost of aligning up to year a-1 / a with year b
+    previous = [np.full((n, n), np.inf) for _ in range(n_years + 1)]
+    previous[0] = np.zeros((n, n))
+    for a in range(1, n_years + 1):
+        current = [np.full((n, n), np.inf) for _ in range(n_years + 1)]
+        for b in range(max(1, a - window), min(n_years, a + window) + 1):
+            diff = series[:, None, a - 1, :] - series[None, :, b - 1, :]
+            cost = np.sqrt((diff ** 2).sum(axis=-1))
+            current[b] = cost + np.minimum(np.minimum(previous[b], previous[b - 1]), current[b - 1])
+        previous = current
+        previous[0] = np.full((n, n), np.inf)
+    return previous[n_years]
+
+
+class TrajectorySimilarity:
+    """
+    Trajectory similarity of states and sectors, per configuration.
+    
+    Each entity's per-year metrics are z-scored per series and compared by
+    cosine similarity of the flattened series ('cosine') or by DTW distance,
+    reported as the similarity 1 / (1 + distance) ('dtw'). The lists for each
+    (entity, method, metrics) configuration are computed on first request
+    and kept for the life of the snapshot.
+    """
+    
+    def __init__(self, year_aggregates: Dict[str, pd.DataFrame]):
+        """
+        Initialize TrajectorySimilarity.
+        
+        Args:
+            year_aggregates: Entity column ('state', 'sector') -> its year aggregates
+        """
+        self.year_aggregates = year_aggregates
+        self._cache: Dict[Tuple, Tuple[SimilarityLists, np.ndarray]] = {}
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        # The cache and lock stay in each process (shared snapshots are pickled)
+        return {'year_aggregates': self.year_aggregates}
+    
+    def __setstate__(self, state):
+        self.__init__(state['year_aggregates'])
+    
+    def lists(self, entity: str, method: str, metrics: Sequence[str]) -> Tuple[SimilarityLists, np.ndarray]:
+        """
+        Get the similarity lists of one configuration, computing them on first use.
+        
+        Args:
+            entity: 'state' or 'sector'
+            method: 'cosine' or 'dtw'
+            metrics: Metrics making up each trajectory (a subset of TRAJECTORY_METRICS)
+        
+        Returns:
+            (similarity lists, years of the trajectories)
+        """
+        key = (entity, method, tuple(metrics))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        
+        entities, years, tensor = trajectory_tensor(self.year_aggregates[entity], entity, metrics)
+        series = zscore_series(tensor)
+        if method == 'cosine':
+            similarity = cosine_trajectory_similarity(series)
+        elif method == 'dtw':
+            similarity = 1 / (1 + dtw_distances(series))
+        else:
+            raise ValueError(f"Unknown trajectory method '{method}', expected one of {TRAJECTORY_METHODS}")
+        
+        lists = SimilarityLists.from_matrix(pd.DataFrame(similarity, index=entities, columns=entities))
+        with self._lock:
+            return self._cache.setdefault(key, (lists, years))
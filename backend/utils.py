@@ -1,106 +1,529 @@
 """
 Data management utilities for the FastAPI backend.
-Handles loading and caching of CSV files.
+Handles loading and caching of the processed data files, from the pipeline's
+binary serving snapshot when it is up to date and from CSV otherwise.
 """
 
+import hashlib
+import json
+import threading
+import time
+import numpy as np
 import pandas as pd
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple, Union
+from backend.cube import EmissionsCube
+from backend.indexes import FacilityIndex, FacilityRankings, FacilitySimilarityIndex
+from backend.similarity import SimilarityLists, TrajectorySimilarity
+from backend.shared import SharedDatasetPublisher, SharedDatasetReader, read_shared_snapshot
 
+try:
+    import pyarrow as pa
+except ImportError:  # Serve from CSV only
+    pa = None
 
-class DataManager:
-    """Manages loading and caching of all data files."""
+
+# CSV files in data_processed that make up the served dataset
+CSV_FILES = [
+    "ghg_state_year.csv",
+    "ghg_sector_year.csv",
+    "ghg_state_sector_year.csv",
+    "similarity_states.csv",
+    "similarity_sectors.csv",
+    "ghg_facility_clean.csv",
+    "ghg_all_years_clean.csv",
+]
+
+# Top-k similarity lists written by the pipeline (see src/similarity.py), by entity
+SIMILARITY_FILES = {
+    'state': "similarity_states_topk.npz",
+    'sector': "similarity_sectors_topk.npz",
+}
+
+# Serving snapshot written by the pipeline (see src/snapshot.py)
+SERVING_SNAPSHOT_DIR = "serving_snapshot"
+SERVING_SNAPSHOT_MANIFEST = f"{SERVING_SNAPSHOT_DIR}/manifest.json"
+SERVING_SNAPSHOT_VERSION = 1
+
+# Files in data_processed that make up the served dataset
+DATASET_FILES = CSV_FILES + list(SIMILARITY_FILES.values()) + [SERVING_SNAPSHOT_MANIFEST]
+
+
+# Data attributes of DataSnapshot that DataManager resolves against the current snapshot
+SNAPSHOT_ATTRIBUTES = frozenset([
+    'state_year_df', 'sector_year_df', 'state_sector_year_df',
+    'similarity_states', 'similarity_sectors', 'trajectory_similarity', 'facility_df', 'all_years_df',
+    'cube', 'facility_index', 'facility_rankings', 'facility_similarity', 'dataset_version', 'source',
+])
+
+
+def get_data_signature(data_dir: Path) -> Tuple:
+    """
+    Get a cheap signature (name, size, mtime) of the dataset files.
+    
+    Args:
+        data_dir: Path to data_processed directory
+        
+    Returns:
+        Tuple that changes when any dataset file is written, added or removed
+    """
+    signature = []
+    for name in DATASET_FILES:
+        try:
+            stat = (data_dir / name).stat()
+        except FileNotFoundError:
+            continue
+        signature.append((name, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def compute_dataset_version(data_dir: Path) -> str:
+    """
+    Hash the names and contents of the dataset files in a directory.
+    
+    Args:
+        data_dir: Path to data_processed directory
+        
+    Returns:
+        Hex digest that changes whenever any dataset file changes
+    """
+    digest = hashlib.sha256()
+    for name in DATASET_FILES:
+        path = data_dir / name
+        if not path.exists():
+            continue
+        digest.update(name.encode() + b"\0")
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_serving_manifest(data_dir: Path) -> Optional[Dict]:
+    """
+    Load the serving snapshot manifest if the snapshot can be used.
+    
+    The snapshot is only used if every CSV and top-k similarity file present
+    in data_dir still has the size and mtime recorded when the snapshot was
+    written.
+    
+    Args:
+        data_dir: Path to data_processed directory
+        
+    Returns:
+        Manifest dictionary, or None if pyarrow is not installed or the
+        snapshot is missing, unreadable or out of date
+    """
+    manifest_path = data_dir / SERVING_SNAPSHOT_MANIFEST
+    if pa is None or not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != SERVING_SNAPSHOT_VERSION:
+        return None
+    
+    sources = {**manifest.get('tables', {}), **manifest.get('files', {})}
+    for name in CSV_FILES + list(SIMILARITY_FILES.values()):
+        path = data_dir / name
+        if not path.exists():
+            continue
+        stat = path.stat()
+        entry = sources.get(name)
+        if entry is None or (entry['source_size'], entry['source_mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            print(f"⚠ Serving snapshot is older than {name}, loading CSV files")
+            return None
+    return manifest
+
+
+def map_arrow_table(path: Path) -> "pa.Table":
+    """
+    Memory-map an Arrow IPC file.
+    
+    No data is read: pages are loaded on access and shared with every other
+    process mapping the same file through the OS page cache.
+    """
+    return pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+
+
+def arrow_to_frame(table: "pa.Table") -> pd.DataFrame:
+    """
+    Convert a mapped Arrow table to the DataFrame pd.read_csv gives for its CSV.
+    
+    Numeric columns stay read-only views of the mapped file; text columns are
+    converted to Python strings.
+    """
+    df = table.to_pandas(split_blocks=True)
+    for column in df.columns[df.dtypes == object]:
+        # Arrow nulls come back as None where read_csv gives NaN
+        if df[column].isna().any():
+            df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+class DataSnapshot:
+    """
+    A complete, immutable set of loaded data files and the structures built from them.
     
-    def __init__(self, data_dir: Optional[Path] = None):
+    Snapshots are built in full before being published by DataManager and are
+    never modified afterwards, so a request can keep using the snapshot it
+    started with while a newer one is swapped in.
+    """
+    
+    def __init__(self, data_dir: Path):
         """
-        Initialize DataManager.
+        Initialize DataSnapshot.
         
         Args:
-            data_dir: Path to data_processed directory (default: ../data_processed)
+            data_dir: Path to data_processed directory
         """
-        if data_dir is None:
-            data_dir = Path(__file__).parent.parent / "data_processed"
-        
         self.data_dir = data_dir
         self.state_year_df: Optional[pd.DataFrame] = None
         self.sector_year_df: Optional[pd.DataFrame] = None
-        self.similarity_states_df: Optional[pd.DataFrame] = None
-        self.similarity_sectors_df: Optional[pd.DataFrame] = None
+        self.state_sector_year_df: Optional[pd.DataFrame] = None
+        self.similarity_states: Optional[SimilarityLists] = None
+        self.similarity_sectors: Optional[SimilarityLists] = None
+        self.trajectory_similarity: Optional[TrajectorySimilarity] = None
         self.facility_df: Optional[pd.DataFrame] = None
-        self.all_years_df: Optional[pd.DataFrame] = None
+        self.cube: Optional[EmissionsCube] = None
+        self.facility_index: Optional[FacilityIndex] = None
+        self.facility_rankings: Optional[FacilityRankings] = None
+        self.facility_similarity: Optional[FacilitySimilarityIndex] = None
+        self.dataset_version: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.source: Optional[str] = None
+        self._serving_manifest: Optional[Dict] = None
+        self._all_years: Union["pa.Table", pd.DataFrame, None] = None
+    
+    @property
+    def all_years_df(self) -> Optional[pd.DataFrame]:
+        """All cleaned rows; from the serving snapshot, converted on first access."""
+        if pa is not None and isinstance(self._all_years, pa.Table):
+            self._all_years = arrow_to_frame(self._all_years)
+            print(f"✓ Loaded all-years data: {len(self._all_years)} rows")
+        return self._all_years
+    
+    def _has_table(self, name: str) -> bool:
+        """Check whether a data file is available from the snapshot or as CSV."""
+        if self._serving_manifest is not None and name in self._serving_manifest['tables']:
+            return True
+        return (self.data_dir / name).exists()
+    
+    def _read_table(self, name: str, convert: bool = True) -> Union["pa.Table", pd.DataFrame]:
+        """
+        Read a data file, memory-mapping its serving snapshot table if there is one.
         
-    def load_all_data(self) -> None:
-        """Load all CSV files into memory."""
+        Args:
+            name: CSV file name in data_processed
+            convert: Convert a mapped Arrow table to a DataFrame
+        
+        Returns:
+            DataFrame with the same columns and dtypes as pd.read_csv gives,
+            or the mapped Arrow table if convert is False
+        """
+        if self._serving_manifest is not None and name in self._serving_manifest['tables']:
+            table_file = self._serving_manifest['tables'][name]['file']
+            table = map_arrow_table(self.data_dir / SERVING_SNAPSHOT_DIR / table_file)
+            return arrow_to_frame(table) if convert else table
+        return pd.read_csv(self.data_dir / name)
+    
+    def _load_similarity(self, entity: str, matrix_name: str) -> Optional[SimilarityLists]:
+        """
+        Load an entity's similarity lists from its top-k file, else from its dense matrix CSV.
+        
+        Returns:
+            SimilarityLists, or None if neither file exists
+        """
+        topk_path = self.data_dir / SIMILARITY_FILES[entity]
+        if topk_path.exists():
+            lists = SimilarityLists.from_file(topk_path)
+            print(f"✓ Loaded {entity} similarity lists: {len(lists)} {entity}s")
+            return lists
+        
+        if self._has_table(matrix_name):
+            sim_df = self._read_table(matrix_name)
+            # Set first column as index if it's the entity column
+            sim_df = sim_df.set_index(entity if entity in sim_df.columns else sim_df.columns[0])
+            lists = SimilarityLists.from_matrix(sim_df)
+            print(f"✓ Built {entity} similarity lists from matrix: {sim_df.shape}")
+            return lists
+        
+        print(f"⚠ {entity.capitalize()} similarity data not found")
+        return None
+    
+    def load(self) -> "DataSnapshot":
+        """Load all data files into memory and build the derived structures."""
         try:
             print(f"Loading data from: {self.data_dir}")
+            start = time.perf_counter()
+            
+            # Version the dataset for response caching (ETags); the snapshot was versioned when written
+            self._serving_manifest = load_serving_manifest(self.data_dir)
+            if self._serving_manifest is not None:
+                self.source = "serving snapshot"
+                self.dataset_version = self._serving_manifest['dataset_version']
+            else:
+                self.source = "csv"
+                self.dataset_version = compute_dataset_version(self.data_dir)
+            print(f"✓ Reading {self.source}")
             
             # Load state-year aggregates
             state_year_path = self.data_dir / "ghg_state_year.csv"
-            if state_year_path.exists():
-                self.state_year_df = pd.read_csv(state_year_path)
+            if self._has_table("ghg_state_year.csv"):
+                self.state_year_df = self._read_table("ghg_state_year.csv")
                 print(f"✓ Loaded state-year data: {len(self.state_year_df)} rows")
             else:
                 raise FileNotFoundError(f"State-year data not found: {state_year_path}")
             
             # Load sector-year aggregates
             sector_year_path = self.data_dir / "ghg_sector_year.csv"
-            if sector_year_path.exists():
-                self.sector_year_df = pd.read_csv(sector_year_path)
+            if self._has_table("ghg_sector_year.csv"):
+                self.sector_year_df = self._read_table("ghg_sector_year.csv")
                 print(f"✓ Loaded sector-year data: {len(self.sector_year_df)} rows")
             else:
                 raise FileNotFoundError(f"Sector-year data not found: {sector_year_path}")
             
-            # Load similarity matrices
-            similarity_states_path = self.data_dir / "similarity_states.csv"
-            if similarity_states_path.exists():
-                sim_df = pd.read_csv(similarity_states_path)
-                # Set first column as index if it's the state column
-                if 'state' in sim_df.columns:
-                    self.similarity_states_df = sim_df.set_index('state')
-                else:
-                    self.similarity_states_df = sim_df.set_index(sim_df.columns[0])
-                print(f"✓ Loaded state similarity matrix: {self.similarity_states_df.shape}")
+            # Load state-sector-year aggregates (optional, written by newer pipeline runs)
+            state_sector_year_path = self.data_dir / "ghg_state_sector_year.csv"
+            if self._has_table("ghg_state_sector_year.csv"):
+                self.state_sector_year_df = self._read_table("ghg_state_sector_year.csv")
+                print(f"✓ Loaded state-sector-year data: {len(self.state_sector_year_df)} rows")
             else:
-                print("⚠ State similarity matrix not found")
-                self.similarity_states_df = pd.DataFrame()
+                self.state_sector_year_df = pd.DataFrame()
             
-            similarity_sectors_path = self.data_dir / "similarity_sectors.csv"
-            if similarity_sectors_path.exists():
-                sim_df = pd.read_csv(similarity_sectors_path)
-                # Set first column as index if it's the sector column
-                if 'sector' in sim_df.columns:
-                    self.similarity_sectors_df = sim_df.set_index('sector')
-                else:
-                    self.similarity_sectors_df = sim_df.set_index(sim_df.columns[0])
-                print(f"✓ Loaded sector similarity matrix: {self.similarity_sectors_df.shape}")
-            else:
-                print("⚠ Sector similarity matrix not found")
-                self.similarity_sectors_df = pd.DataFrame()
+            # Load similarity lists, precomputed by the pipeline or built from the dense matrices
+            self.similarity_states = self._load_similarity('state', "similarity_states.csv")
+            self.similarity_sectors = self._load_similarity('sector', "similarity_sectors.csv")
+            
+            # Trajectory similarity is computed from the year aggregates per configuration, when requested
+            self.trajectory_similarity = TrajectorySimilarity({'state': self.state_year_df,
+                                                               'sector': self.sector_year_df})
+            
+            # Load all years data (optional, for detailed queries). From the snapshot it
+            # is only mapped here, and converted when first used.
+            if self._has_table("ghg_all_years_clean.csv"):
+                self._all_years = self._read_table("ghg_all_years_clean.csv", convert=False)
+                if isinstance(self._all_years, pd.DataFrame):
+                    print(f"✓ Loaded all-years data: {len(self._all_years)} rows")
             
             # Load facility data
-            facility_path = self.data_dir / "ghg_facility_clean.csv"
-            if facility_path.exists():
-                self.facility_df = pd.read_csv(facility_path)
+            if self._has_table("ghg_facility_clean.csv"):
+                self.facility_df = self._read_table("ghg_facility_clean.csv")
                 print(f"✓ Loaded facility data: {len(self.facility_df)} rows")
+            elif self._all_years is not None:
+                # Fallback to all_years_clean (same frame, not read a second time)
+                self.facility_df = self.all_years_df
+                print(f"✓ Loaded facility data from all_years: {len(self.facility_df)} rows")
             else:
-                # Fallback to all_years_clean
-                all_years_path = self.data_dir / "ghg_all_years_clean.csv"
-                if all_years_path.exists():
-                    self.facility_df = pd.read_csv(all_years_path)
-                    print(f"✓ Loaded facility data from all_years: {len(self.facility_df)} rows")
-                else:
-                    print("⚠ Facility data not found")
-                    self.facility_df = pd.DataFrame()
+                print("⚠ Facility data not found")
+                self.facility_df = pd.DataFrame()
             
-            # Load all years data (optional, for detailed queries)
-            all_years_path = self.data_dir / "ghg_all_years_clean.csv"
-            if all_years_path.exists():
-                self.all_years_df = pd.read_csv(all_years_path)
-                print(f"✓ Loaded all-years data: {len(self.all_years_df)} rows")
+            # Index facility rows by state, year and sector
+            if not self.facility_df.empty:
+                self.facility_index = FacilityIndex(self.facility_df)
+                print(f"✓ Indexed facility data: {len(self.facility_index.by_state)} states, "
+                      f"{len(self.facility_index.by_year)} years, "
+                      f"{len(self.facility_index.by_sector)} sectors")
+                
+                self.facility_rankings = FacilityRankings(self.facility_df)
+                print(f"✓ Ranked facilities in "
+                      f"{sum(len(positions) for positions, _ in self.facility_rankings.partitions.values())} partitions")
+                
+                self.facility_similarity = FacilitySimilarityIndex(self.facility_df)
+                print(f"✓ Built facility similarity index: {len(self.facility_similarity)} facilities x "
+                      f"{len(self.facility_similarity.years)} years")
             
-            print("✓ All data loaded successfully")
+            # Precompute the summary cube
+            self.cube = EmissionsCube(self.state_year_df, self.sector_year_df, self.state_sector_year_df)
+            print(f"✓ Built emissions cube: {len(self.cube.state_years)} state-year, "
+                  f"{len(self.cube.sector_years)} sector-year, "
+                  f"{len(self.cube.state_sector_years)} state-sector-year cells")
+            
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - start
+            print(f"✓ Built snapshot {self.dataset_version[:12]} in {self.build_seconds:.2f}s")
             
         except Exception as e:
             print(f"✗ Error loading data: {e}")
             raise
+        
+        return self
 
+
+class DataManager:
+    """
+    Manages loading and caching of all data files.
+    
+    The loaded data lives in an immutable DataSnapshot. Reloading builds a new
+    snapshot and swaps the reference in one assignment, so requests never see
+    a partially loaded dataset. Data attributes (state_year_df, cube, ...)
+    resolve against the current snapshot; endpoints should read
+    data_manager.snapshot once per request to stay on one snapshot. Code
+    that spans several requests (/api/batch) pins one snapshot for them
+    with pinned().
+    
+    In a multi-worker deployment (backend/serve.py) the parent's manager
+    publishes every snapshot it builds in shared memory, and each worker's
+    manager attaches to the published snapshots instead of loading
+    data_processed itself.
+    """
+    
+    def __init__(self,
+                 data_dir: Optional[Path] = None,
+                 shared: Optional[SharedDatasetReader] = None,
+                 publisher: Optional[SharedDatasetPublisher] = None):
+        """
+        Initialize DataManager.
+        
+        Args:
+            data_dir: Path to data_processed directory (default: ../data_processed)
+            shared: Attach to the snapshots published by a parent process
+            publisher: Publish every new snapshot for worker processes (and keep
+                only the published copy)
+        """
+        if data_dir is None:
+            data_dir = Path(__file__).parent.parent / "data_processed"
+        
+        self.data_dir = data_dir
+        self.shared = shared
+        self.publisher = publisher
+        self._snapshot: Optional[DataSnapshot] = None
+        self._pinned: ContextVar[Optional[DataSnapshot]] = ContextVar("pinned_snapshot", default=None)
+        self.reload_count = 0
+        self.last_reload_error: Optional[str] = None
+        self._loaded_signature: Optional[Tuple] = None
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+    
+    def __getattr__(self, name: str):
+        # Only called for attributes not found on the manager: delegate data
+        # attributes to the current snapshot
+        if name in SNAPSHOT_ATTRIBUTES:
+            snapshot = self.snapshot
+            return getattr(snapshot, name) if snapshot is not None else None
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+    
+    @property
+    def snapshot(self) -> Optional[DataSnapshot]:
+        """The snapshot pinned in the current context, else the current one."""
+        pinned = self._pinned.get()
+        return pinned if pinned is not None else self._snapshot
+    
+    @property
+    def live_version(self) -> Optional[str]:
+        """Dataset version of the current snapshot, ignoring any pinned one."""
+        snapshot = self._snapshot
+        return snapshot.dataset_version if snapshot is not None else None
+    
+    @contextmanager
+    def pinned(self, snapshot: DataSnapshot):
+        """
+        Serve one snapshot to everything running in this context (task), even if
+        a reload swaps in a new one meanwhile.
+        """
+        token = self._pinned.set(snapshot)
+        try:
+            yield snapshot
+        finally:
+            self._pinned.reset(token)
+    
+    def _get_signature(self) -> Tuple:
+        """Get the signature that changes when a new snapshot should be loaded."""
+        if self.shared is not None:
+            return (self.shared.current(),)
+        return get_data_signature(self.data_dir)
+    
+    def load_all_data(self) -> None:
+        """Load all data files (or attach the shared dataset) into a new snapshot and make it current."""
+        with self._reload_lock:
+            signature = self._get_signature()
+            if self.shared is not None:
+                snapshot = self.shared.attach()
+                print(f"✓ Attached shared snapshot {snapshot.dataset_version[:12]}")
+            else:
+                snapshot = DataSnapshot(self.data_dir).load()
+            
+            if self.publisher is not None:
+                snapshot = read_shared_snapshot(self.publisher.publish(snapshot))
+            
+            # Atomic swap: in-flight requests keep the snapshot they already hold
+            self._snapshot = snapshot
+            self._loaded_signature = signature
+            print("✓ All data loaded successfully")
+    
+    def reload(self) -> bool:
+        """
+        Rebuild the snapshot from data_processed, keeping the current one on failure.
+        
+        Returns:
+            True if a new snapshot was swapped in
+        """
+        try:
+            self.load_all_data()
+        except Exception as e:
+            self.last_reload_error = str(e)
+            print(f"✗ Reload failed, keeping snapshot "
+                  f"{self.snapshot.dataset_version[:12] if self.snapshot else None}: {e}")
+            return False
+        
+        self.reload_count += 1
+        self.last_reload_error = None
+        return True
+    
+    def start_watching(self, interval: float = 2.0) -> None:
+        """
+        Watch data_processed in a background thread and reload when it changes.
+        
+        A change is picked up once the files have stopped changing for one
+        polling interval, so a pipeline run still writing files is not loaded
+        halfway. With a shared dataset reader, newly published snapshots are
+        watched for instead.
+        
+        Args:
+            interval: Polling interval in seconds
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,),
+                                         name="data-watcher", daemon=True)
+        self._watcher.start()
+        print(f"✓ Watching {self.shared.directory if self.shared else self.data_dir} "
+              f"for changes (every {interval}s)")
+    
+    def stop_watching(self) -> None:
+        """Stop the background watcher."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+    
+    @property
+    def watching(self) -> bool:
+        """Whether the background watcher is running."""
+        return self._watcher is not None and self._watcher.is_alive()
+    
+    def _watch(self, interval: float) -> None:
+        """Poll the data file signature and reload once a change has settled."""
+        pending = None
+        failed = None
+        while not self._stop_watching.wait(interval):
+            signature = self._get_signature()
+            if signature in (self._loaded_signature, failed):
+                # Up to date, or a build of these files already failed
+                pending = None
+                continue
+            if signature != pending:
+                # Changed since the last poll, wait for the writes to settle
+                pending = signature
+                continue
+            print("Data files changed, rebuilding snapshot...")
+            failed = None if self.reload() else signature
+            pending = None
@@ -0,0 +1,136 @@
+"""
+Event-loop benchmark: cheap-endpoint latency while heavy requests are running.
+Starts the API once with table endpoints run on the event loop
+(SCAN_POOL_THREADS=0) and once with the scan pool, keeps several clients
+requesting large facility lists, and measures the latency of a cheap summary
+request alongside them. The response cache is disabled so every request does
+its work.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+HEAVY_URL = "/api/facility/list?limit=10000"
+CHEAP_URL = "/api/summary/us?year=2023"
+
+
+def start_server(port: int, data_dir: Path, env_overrides: dict, timeout: float = 120) -> subprocess.Popen:
+    """Start a single-worker API server and wait until it accepts requests."""
+    env = dict(os.environ, DATA_PROCESSED_DIR=str(data_dir), DATA_WATCH_INTERVAL="0",
+               RESPONSE_CACHE_MAX_BYTES="0", **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port)],
+        cwd=PROJECT_ROOT, env=env, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    )
+    listening = threading.Event()
+    
+    def read_output():
+        for line in process.stdout:
+            if "Uvicorn running on" in line:
+                listening.set()
+    
+    threading.Thread(target=read_output, daemon=True).start()
+    if not listening.wait(timeout=timeout):
+        process.terminate()
+        raise RuntimeError("Server did not start")
+    return process
+
+
+def run_load(port: int, heavy_clients: int, duration: float) -> dict:
+    """
+    Run heavy clients and a cheap-request probe against a server.
+    
+    Args:
+        port: Server port
+        heavy_clients: Number of clients requesting large facility lists back to back
+        duration: Seconds to run
+    
+    Returns:
+        Probe latencies (ms) and heavy request counts
+    """
+    stop = threading.Event()
+    counts = {"heavy_ok": 0, "heavy_429": 0}
+    lock = threading.Lock()
+    
+    def heavy():
+        while not stop.is_set():
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{HEAVY_URL}").read()
+                key = "heavy_ok"
+            except urllib.error.HTTPError as e:
+                if e.code != 429:
+                    raise
+                key = "heavy_429"
+                time.sleep(0.01)
+            with lock:
+                counts[key] += 1
+    
+    threads = [threading.Thread(target=heavy, daemon=True) for _ in range(heavy_clients)]
+    for thread in threads:
+        thread.start()
+    
+    latencies = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        urllib.request.urlopen(f"http://127.0.0.1:{port}{CHEAP_URL}").read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+    
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    latencies = np.array(latencies)
+    return {
+        "p50": float(np.percentile(latencies, 50)),
+        "p99": float(np.percentile(latencies, 99)),
+        "max": float(latencies.max()),
+        **counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--heavy-clients", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Scan pool threads in pool mode (default: the server's, CPU count up to 4)")
+    parser.add_argument("--queue", type=int, default=32, help="Scan pool queue in pool mode")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--data-dir", type=Path, default=PROJECT_ROOT / "data_processed",
+                        help="data_processed directory to serve (default: the project's)")
+    args = parser.parse_args()
+    
+    modes = [
+        ("idle", {}, 0),
+        ("event loop", {"SCAN_POOL_THREADS": "0"}, args.heavy_clients),
+        ("scan pool", {"SCAN_POOL_THREADS": str(args.threads), "SCAN_POOL_QUEUE": str(args.queue)},
+         args.heavy_clients),
+    ]
+    
+    print(f"{'mode':>12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'heavy/s':>8} {'429s':>6}")
+    for name, env_overrides, heavy_clients in modes:
+        process = start_server(args.port, args.data_dir, env_overrides)
+        try:
+            result = run_load(args.port, heavy_clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:>12} {result['p50']:>8.1f} {result['p99']:>8.1f} {result['max']:>8.1f} "
+              f"{result['heavy_ok'] / args.duration:>8.1f} {result['heavy_429']:>6}")
+
+
+if __name__ == "__main__":
+    main()
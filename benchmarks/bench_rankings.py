@@ -0,0 +1,106 @@
+"""
+Load benchmark for the ranking endpoints.
+Sends concurrent requests for /api/states/top, /api/sectors/top and ranked
+/api/facility/list queries through the ASGI app in-process (no network) and
+reports p50/p99 latency and throughput per endpoint.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.main import app, data_manager
+
+
+def make_urls(endpoint: str, n_requests: int, seed: int = 0) -> list:
+    """
+    Build request URLs with random years, keys and limits for an endpoint.
+    
+    Args:
+        endpoint: 'states', 'sectors', 'facility_year' or 'facility_state_year'
+        n_requests: Number of URLs
+        seed: Random seed
+    
+    Returns:
+        List of URLs
+    """
+    rng = random.Random(seed)
+    years = list(range(2010, 2024))
+    states = sorted(data_manager.state_year_df['state'].unique())
+    
+    urls = []
+    for _ in range(n_requests):
+        year = rng.choice(years)
+        if endpoint in ('states', 'sectors'):
+            urls.append(f"/api/{endpoint}/top?year={year}&limit={rng.randint(1, 50)}")
+        elif endpoint == 'facility_year':
+            urls.append(f"/api/facility/list?year={year}&limit={rng.choice([10, 100, 1000])}")
+        else:
+            urls.append(f"/api/facility/list?state={rng.choice(states)}&year={year}&limit=10")
+    return urls
+
+
+async def run_load(urls: list, concurrency: int):
+    """
+    Send the requests with a fixed number of concurrent clients.
+    
+    Returns:
+        (per-request latencies in seconds, total wall time in seconds)
+    """
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    queue = iter(urls)
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for url in queue:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    
+    return np.array(latencies), wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--data-dir", type=Path, default=None,
+                        help="data_processed directory to load (default: the project's)")
+    args = parser.parse_args()
+    
+    if args.data_dir is not None:
+        data_manager.data_dir = args.data_dir
+    data_manager.load_all_data()
+    
+    endpoints = ['states', 'sectors']
+    if data_manager.facility_df is not None and not data_manager.facility_df.empty:
+        endpoints += ['facility_year', 'facility_state_year']
+    
+    print(f"\nconcurrency: {args.concurrency}")
+    print(f"{'endpoint':>20} {'p50 (ms)':>10} {'p99 (ms)':>10} {'req/s':>10}")
+    for endpoint in endpoints:
+        urls = make_urls(endpoint, args.requests)
+        asyncio.run(run_load(urls[:100], args.concurrency))  # warm up
+        latencies, wall = asyncio.run(run_load(urls, args.concurrency))
+        p50, p99 = np.percentile(latencies * 1000, [50, 99])
+        print(f"{endpoint:>20} {p50:>10.2f} {p99:>10.2f} {len(urls) / wall:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
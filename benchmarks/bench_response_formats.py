@@ -0,0 +1,66 @@
+"""
+Response format benchmark for /api/facility/list?year=...&limit=N.
+Builds the facility list in every available format (JSON, Arrow IPC,
+MessagePack) and compresses it with every available coding, reporting the
+bytes on the wire and the server time to encode and compress. Codecs that
+are not installed (pyarrow, msgpack, brotli) are skipped.
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def best_time(func, repeat: int):
+    """Run func repeat times and return (last result, fastest time in ms)."""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--year", type=int, default=2023,
+                        help="Year filter (its ranking is precomputed, so timings are mostly encoding)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--data-dir", type=Path, default=PROJECT_ROOT / "data_processed",
+                        help="data_processed directory to serve (default: the project's)")
+    args = parser.parse_args()
+    
+    os.environ["DATA_PROCESSED_DIR"] = str(args.data_dir)
+    os.environ["DATA_WATCH_INTERVAL"] = "0"
+    from backend import main as api
+    from backend.encoding import available_encodings, available_formats, compress
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        api.data_manager.load_all_data()
+    snapshot = api.data_manager.snapshot
+    
+    print(f"/api/facility/list?year={args.year}&limit=N")
+    print(f"{'limit':>6} {'format':<38} {'coding':<9} {'bytes':>10} {'encode ms':>10} {'compress ms':>12}")
+    for limit in args.limits:
+        for media_type in available_formats():
+            response, encode_ms = best_time(
+                lambda: api._facility_list(snapshot, None, args.year, None, limit, media_type), args.repeat
+            )
+            body = response.body
+            print(f"{limit:>6} {media_type:<38} {'identity':<9} {len(body):>10,} {encode_ms:>10.1f} {'':>12}")
+            for encoding in available_encodings():
+                compressed, compress_ms = best_time(lambda: compress(body, encoding), args.repeat)
+                print(f"{limit:>6} {media_type:<38} {encoding:<9} {len(compressed):>10,} "
+                      f"{encode_ms:>10.1f} {compress_ms:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: iterrows vs columnar serialization of facility responses.
+Builds the /api/facility/list payload for synthetic facility rows both ways and
+reports rows per second, including JSON encoding of the response body.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.serializers import column_to_list, to_records
+
+
+def make_facilities(n_rows: int, missing_rate: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a synthetic facility table with the columns of ghg_facility_clean.csv.
+    
+    Args:
+        n_rows: Number of rows
+        missing_rate: Fraction of missing values in the nullable columns
+        seed: Random seed
+    
+    Returns:
+        DataFrame of facilities
+    """
+    rng = np.random.default_rng(seed)
+    
+    def with_missing(values):
+        values = pd.Series(values)
+        return values.mask(rng.random(n_rows) < missing_rate)
+    
+    return pd.DataFrame({
+        'facility_id': np.arange(1_000_000, 1_000_000 + n_rows),
+        'facility_name': with_missing([f"Facility {i}" for i in range(n_rows)]),
+        'city': with_missing(rng.choice(['HOUSTON', 'DENVER', 'TULSA', 'FRESNO'], n_rows)),
+        'state': with_missing(rng.choice(['TX', 'CO', 'OK', 'CA'], n_rows)),
+        'total_reported_direct_emissions': with_missing(rng.lognormal(11, 2, n_rows)),
+        'co2_emissions_non_biogenic': with_missing(rng.lognormal(11, 2, n_rows)),
+        'ch4_emissions': with_missing(rng.lognormal(8, 2, n_rows)),
+        'n2o_emissions': with_missing(rng.lognormal(5, 2, n_rows)),
+        'industry_type_sectors': with_missing(rng.choice(['Power Plants', 'Waste', 'Minerals'], n_rows)),
+    })
+
+
+def serialize_iterrows(df: pd.DataFrame) -> list:
+    """Row-by-row serialization (the previous /api/facility/list implementation)."""
+    facilities = []
+    for _, row in df.iterrows():
+        facilities.append({
+            "facility_id": int(row['facility_id']) if pd.notna(row['facility_id']) else None,
+            "facility_name": str(row['facility_name']) if pd.notna(row['facility_name']) else "Unknown",
+            "city": str(row['city']) if pd.notna(row['city']) else None,
+            "state": str(row['state']) if pd.notna(row['state']) else None,
+            "total_emissions": float(row['total_reported_direct_emissions']) if pd.notna(row['total_reported_direct_emissions']) else 0,
+            "co2": float(row['co2_emissions_non_biogenic']) if pd.notna(row['co2_emissions_non_biogenic']) else 0,
+            "ch4": float(row['ch4_emissions']) if pd.notna(row['ch4_emissions']) else 0,
+            "n2o": float(row['n2o_emissions']) if pd.notna(row['n2o_emissions']) else 0,
+            "industry_type_sectors": str(row['industry_type_sectors']) if pd.notna(row['industry_type_sectors']) else None
+        })
+    return facilities
+
+
+def serialize_columnar(df: pd.DataFrame) -> list:
+    """Columnar serialization (the current /api/facility/list implementation)."""
+    return to_records({
+        "facility_id": column_to_list(df['facility_id'], 'int'),
+        "facility_name": column_to_list(df['facility_name'], 'str', fill="Unknown"),
+        "city": column_to_list(df['city'], 'str'),
+        "state": column_to_list(df['state'], 'str'),
+        "total_emissions": column_to_list(df['total_reported_direct_emissions'], fill=0),
+        "co2": column_to_list(df['co2_emissions_non_biogenic'], fill=0),
+        "ch4": column_to_list(df['ch4_emissions'], fill=0),
+        "n2o": column_to_list(df['n2o_emissions'], fill=0),
+        "industry_type_sectors": column_to_list(df['industry_type_sectors'], 'str')
+    })
+
+
+def time_call(func, repeats: int) -> float:
+    """Return the best wall time of func() over several runs."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>8} {'iterrows+encoder (s)':>21} {'columnar+dumps (s)':>19} "
+          f"{'rows/s before':>14} {'rows/s after':>13} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = make_facilities(n_rows)
+        
+        if serialize_columnar(df) != serialize_iterrows(df):
+            raise AssertionError("Columnar output differs from the iterrows output")
+        
+        # Previous path: row dicts passed through FastAPI's encoder; current path: json.dumps only
+        t_before = time_call(lambda: json.dumps(jsonable_encoder(serialize_iterrows(df))), args.repeats)
+        t_after = time_call(lambda: json.dumps(serialize_columnar(df)), args.repeats)
+        print(f"{n_rows:>8,} {t_before:>21.4f} {t_after:>19.4f} "
+              f"{n_rows / t_before:>14,.0f} {n_rows / t_after:>13,.0f} {t_before / t_after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
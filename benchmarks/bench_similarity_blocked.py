@@ -0,0 +1,109 @@
+"""
+Similarity benchmark: dense vs blocked computation, time and peak RSS by N.
+Runs each computation in a fresh child process on a synthetic feature matrix
+(N entities x 14 emissions-like features) and reports wall time and the
+child's peak resident set size (plus its pool workers' peak, if any):
+
+- dense:  compute_cosine_similarity_matrix (float64 N x N DataFrame)
+- memmap: compute_similarity_memmap (float32 rows streamed to a .npy file)
+- topk:   compute_similarity_topk (blocks reduced to top-50/bottom-10 lists)
+
+The 'baseline' row is the child's RSS after imports and building the features.
+A topk block peaks at about 8 * block size * N bytes of scores and sort keys
+(see DEFAULT_BLOCK_SIZE in src/similarity.py).
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def make_features(n: int, n_features: int = 14, seed: int = 0):
+    """Build a synthetic feature matrix with skewed, emissions-like columns."""
+    import numpy as np
+    import pandas as pd
+    
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=10, sigma=2, size=(n, n_features))
+    df = pd.DataFrame(values, columns=[f"year_{i}" for i in range(n_features)])
+    df.insert(0, 'entity', [f"E{i}" for i in range(n)])
+    return df
+
+
+def peak_rss_mb(who: int) -> float:
+    """Peak RSS in MB (ru_maxrss is kilobytes on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_child(mode: str, n: int, block_size: int, workers: int) -> dict:
+    """Run one computation in this process and report time and peak RSS."""
+    from src.similarity import compute_cosine_similarity_matrix, compute_similarity_memmap, compute_similarity_topk
+    
+    features = make_features(n)
+    start = time.perf_counter()
+    if mode == "dense":
+        compute_cosine_similarity_matrix(features, 'entity')
+    elif mode == "memmap":
+        with tempfile.TemporaryDirectory() as tmp:
+            _, matrix = compute_similarity_memmap(features, os.path.join(tmp, "similarity.npy"), 'entity',
+                                                  block_size=block_size, workers=workers)
+            del matrix
+    elif mode == "topk":
+        compute_similarity_topk(features, 'entity', block_size=block_size, workers=workers)
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "seconds": elapsed if mode != "baseline" else 0.0,
+        "rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "workers_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 5000, 10000, 20000, 40000])
+    parser.add_argument("--modes", nargs="+", default=["baseline", "dense", "memmap", "topk"])
+    parser.add_argument("--max-dense", type=int, default=20000,
+                        help="Largest N run in dense mode (it needs about 16 * N^2 bytes)")
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for memmap and topk")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        result = run_child(args.child[0], int(args.child[1]), args.block_size, args.workers)
+        print(json.dumps(result))
+        return
+    
+    print(f"block size {args.block_size}, {args.workers} worker(s)")
+    print(f"{'N':>7} {'mode':<9} {'seconds':>8} {'peak RSS MB':>12} {'workers MB':>11}")
+    for n in args.sizes:
+        for mode in args.modes:
+            if mode == "dense" and n > args.max_dense:
+                print(f"{n:>7} {mode:<9} {'skipped':>8}")
+                continue
+            completed = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(n),
+                 "--block-size", str(args.block_size), "--workers", str(args.workers)],
+                capture_output=True, text=True
+            )
+            if completed.returncode != 0:
+                print(f"{n:>7} {mode:<9} {'failed':>8} (exit {completed.returncode})")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            workers_rss = f"{result['workers_rss_mb']:.0f}" if result['workers_rss_mb'] else ""
+            print(f"{n:>7} {mode:<9} {result['seconds']:>8.2f} {result['rss_mb']:>12.0f} {workers_rss:>11}")
+
+
+if __name__ == "__main__":
+    main()
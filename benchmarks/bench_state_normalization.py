@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: per-row vs vectorized state normalization.
+Compares Series.apply(standardize_state_abbreviation) with
+standardize_state_abbreviations on synthetic state columns.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.clean import (
+    US_STATE_ABBREVIATIONS,
+    standardize_state_abbreviation,
+    standardize_state_abbreviations
+)
+
+
+def make_states(n_rows: int, seed: int = 0) -> pd.Series:
+    """
+    Build a synthetic state column mixing codes, full names and missing values.
+    
+    Args:
+        n_rows: Number of rows
+        seed: Random seed
+        
+    Returns:
+        Object Series of raw state values
+    """
+    names = list(US_STATE_ABBREVIATIONS.keys())
+    codes = list(US_STATE_ABBREVIATIONS.values())
+    pool = (
+        codes
+        + [code.lower() for code in codes]
+        + [name.title() for name in names]
+        + [f" {name.lower()} " for name in names]
+        + ['Puerto Rico', 'GU', 'VI', None, np.nan]
+    )
+    rng = np.random.default_rng(seed)
+    values = np.array(pool, dtype=object)[rng.integers(0, len(pool), n_rows)]
+    return pd.Series(values, dtype=object, name='state')
+
+
+def time_call(func, repeats: int) -> float:
+    """Return the best wall time of func() over several runs."""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 3_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>12} {'apply (s)':>12} {'vectorized (s)':>16} {'speedup':>9}")
+    for n_rows in args.rows:
+        states = make_states(n_rows)
+        
+        expected = states.apply(standardize_state_abbreviation)
+        actual = standardize_state_abbreviations(states)
+        if not actual.equals(expected):
+            raise AssertionError("Vectorized output differs from standardize_state_abbreviation")
+        
+        t_apply = time_call(lambda: states.apply(standardize_state_abbreviation), args.repeats)
+        t_vector = time_call(lambda: standardize_state_abbreviations(states), args.repeats)
+        print(f"{n_rows:>12,} {t_apply:>12.3f} {t_vector:>16.3f} {t_apply / t_vector:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Latency benchmark for the summary endpoints.
+Sends concurrent requests through the ASGI app in-process (no network) and
+reports p50/p99 latency and throughput per endpoint, plus the p99 of the
+endpoint function alone (without HTTP client and routing overhead).
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from backend.main import (
+    app,
+    data_manager,
+    get_us_summary,
+    get_state_summary,
+    get_sector_summary
+)
+
+HANDLERS = {
+    'us': get_us_summary,
+    'state': get_state_summary,
+    'sector': get_sector_summary,
+}
+
+
+def make_urls(endpoint: str, n_requests: int, seed: int = 0) -> list:
+    """
+    Build request URLs with random keys for an endpoint.
+    
+    Args:
+        endpoint: 'us', 'state' or 'sector'
+        n_requests: Number of URLs
+        seed: Random seed
+    
+    Returns:
+        List of URLs
+    """
+    rng = random.Random(seed)
+    years = list(range(2010, 2024))
+    states = sorted(data_manager.state_year_df['state'].unique())
+    sectors = sorted(data_manager.sector_year_df['sector'].unique())
+    
+    urls = []
+    for _ in range(n_requests):
+        year = rng.choice(years)
+        if endpoint == 'us':
+            urls.append(f"/api/summary/us?year={year}")
+        elif endpoint == 'state':
+            urls.append(f"/api/summary/state?state={rng.choice(states)}&year={year}")
+        else:
+            urls.append(f"/api/summary/sector?sector={rng.choice(sectors)}&year={year}")
+    return urls
+
+
+async def run_load(urls: list, concurrency: int):
+    """
+    Send the requests with a fixed number of concurrent clients.
+    
+    Returns:
+        (per-request latencies in seconds, total wall time in seconds)
+    """
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    queue = iter(urls)
+    
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for url in queue:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code not in (200, 404):
+                    raise RuntimeError(f"{url} returned {response.status_code}")
+        
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+    
+    return np.array(latencies), wall
+
+
+async def time_handler(endpoint: str, urls: list) -> np.ndarray:
+    """Call the endpoint function directly for each URL and return latencies in seconds."""
+    handler = HANDLERS[endpoint]
+    calls = [dict(httpx.URL(url).params) for url in urls]
+    latencies = []
+    for params in calls:
+        if 'year' in params:
+            params['year'] = int(params['year'])
+        start = time.perf_counter()
+        try:
+            await handler(**params)
+        except Exception:
+            pass  # 404 for keys without data
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Concurrent clients (latency includes queueing when > 1)")
+    args = parser.parse_args()
+    
+    data_manager.load_all_data()
+    
+    print(f"\n{'endpoint':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'req/s':>10} {'handler p99 (ms)':>17}")
+    for endpoint in ['us', 'state', 'sector']:
+        urls = make_urls(endpoint, args.requests)
+        asyncio.run(run_load(urls[:200], args.concurrency))  # warm up
+        latencies, wall = asyncio.run(run_load(urls, args.concurrency))
+        p50, p99 = np.percentile(latencies * 1000, [50, 99])
+        handler_p99 = np.percentile(asyncio.run(time_handler(endpoint, urls)) * 1000, 99)
+        print(f"{endpoint:>10} {p50:>10.3f} {p99:>10.3f} {len(urls) / wall:>10,.0f} {handler_p99:>17.4f}")
+
+
+if __name__ == "__main__":
+    main()
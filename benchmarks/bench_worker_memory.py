@@ -0,0 +1,154 @@
+"""
+Memory benchmark: private per-worker datasets vs the shared-memory dataset.
+Starts the API with N uvicorn workers that each load data_processed
+(`uvicorn backend.main:app --workers N`) and with backend/serve.py, where
+workers attach to one shared copy, then reports the total proportional set
+size (PSS) of each process tree after a warm-up, with the memory each extra
+worker adds. For comparison, it also reports the private memory of one
+interpreter that imports the API without loading any data: the floor every
+worker pays in either mode. Linux only (reads /proc).
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+WARMUP_URLS = [
+    "/api/summary/us?year=2023",
+    "/api/states/top?year=2023&limit=10",
+    "/api/facility/list?year=2023&limit=1000",
+    "/api/facility/list?state=TX&limit=100",
+    "/api/similarity/states?state=TX",
+]
+
+
+def descendants(pid: int) -> list:
+    """Get a process and all its descendants from /proc."""
+    children = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            fields = (entry / "stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry.name))
+    
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        stack.extend(children.get(current, []))
+    return pids
+
+
+def pss_mb(pid: int) -> float:
+    """Sum the proportional set size of a process tree in MB."""
+    total_kb = 0
+    for process in descendants(pid):
+        try:
+            for line in Path(f"/proc/{process}/smaps_rollup").read_text().splitlines():
+                if line.startswith("Pss:"):
+                    total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return total_kb / 1024
+
+
+def baseline_mb() -> float:
+    """Get the private (anonymous) memory in MB of an interpreter that imports the API but loads no data."""
+    code = ("import backend.main, pathlib; print(next(line for line in "
+            "pathlib.Path('/proc/self/smaps_rollup').read_text().splitlines() if line.startswith('Anonymous:')))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                            check=True).stdout
+    return int(output.split()[-2]) / 1024
+
+
+def run_server(mode: str, workers: int, port: int, data_dir: Path, timeout: float = 120) -> float:
+    """
+    Start the API, wait for every worker, warm it up and measure its memory.
+    
+    Args:
+        mode: 'private' (every worker loads the data) or 'shared' (backend/serve.py)
+        workers: Number of worker processes
+        port: Port to listen on
+        data_dir: data_processed directory
+        timeout: Seconds to wait for the workers to start
+    
+    Returns:
+        Total PSS of the server's process tree in MB
+    """
+    env = dict(os.environ, DATA_PROCESSED_DIR=str(data_dir), DATA_WATCH_INTERVAL="0")
+    if mode == "private":
+        command = [sys.executable, "-m", "uvicorn", "backend.main:app",
+                   "--port", str(port), "--workers", str(workers)]
+    else:
+        command = [sys.executable, "backend/serve.py", "--port", str(port),
+                   "--workers", str(workers), "--data-dir", str(data_dir), "--watch-interval", "0"]
+    
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, text=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    started = threading.Semaphore(0)
+    listening = threading.Event()
+    
+    def read_output():
+        for line in process.stdout:
+            if "Application startup complete" in line:
+                started.release()
+            elif "Uvicorn running on" in line:
+                listening.set()
+    
+    threading.Thread(target=read_output, daemon=True).start()
+    try:
+        deadline = time.monotonic() + timeout
+        for _ in range(workers):
+            if not started.acquire(timeout=max(deadline - time.monotonic(), 0)):
+                raise RuntimeError(f"{mode} server with {workers} workers did not start")
+        if not listening.wait(timeout=max(deadline - time.monotonic(), 0)):
+            raise RuntimeError(f"{mode} server with {workers} workers is not listening")
+        
+        # Spread enough requests to reach every worker
+        for _ in range(20 * workers):
+            for url in WARMUP_URLS:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{url}").read()
+        return pss_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--data-dir", type=Path, default=PROJECT_ROOT / "data_processed",
+                        help="data_processed directory to serve (default: the project's)")
+    args = parser.parse_args()
+    
+    print(f"{'workers':>8} {'private PSS (MB)':>17} {'shared PSS (MB)':>16} "
+          f"{'private/worker':>15} {'shared/worker':>14}")
+    previous = None
+    for workers in args.workers:
+        private = run_server("private", workers, args.port, args.data_dir)
+        shared = run_server("shared", workers, args.port, args.data_dir)
+        
+        # Memory added per extra worker since the previous row
+        per_worker = ["", ""]
+        if previous is not None and workers > previous[0]:
+            added = workers - previous[0]
+            per_worker = [f"{(private - previous[1]) / added:.0f}", f"{(shared - previous[2]) / added:.0f}"]
+        previous = (workers, private, shared)
+        print(f"{workers:>8} {private:>17.0f} {shared:>16.0f} {per_worker[0]:>15} {per_worker[1]:>14}")
+    
+    print(f"Interpreter baseline (API imported, no data): {baseline_mb():.0f} MB private per worker")
+
+
+if __name__ == "__main__":
+    main()
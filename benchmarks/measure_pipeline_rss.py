@@ -0,0 +1,38 @@
+"""
+Measure peak RSS and wall time of run_pipeline.py.
+Runs the pipeline in a child process and reports the child's peak resident
+set size. Extra arguments are passed through to run_pipeline.py, e.g.:
+
+    python benchmarks/measure_pipeline_rss.py --workers 1
+"""
+
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def main():
+    pipeline = Path(__file__).parent.parent / "run_pipeline.py"
+    args = [sys.executable, str(pipeline)] + sys.argv[1:]
+    
+    start = time.perf_counter()
+    completed = subprocess.run(args, stdout=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    
+    if completed.returncode != 0:
+        print(f"✗ run_pipeline.py exited with status {completed.returncode}")
+        sys.exit(completed.returncode)
+    
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    
+    print(f"Peak RSS: {peak / 1024:.1f} MB")
+    print(f"Wall time: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
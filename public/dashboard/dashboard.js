@@ -11,6 +11,7 @@ class Dashboard {
         this.currentFilter = null;
         this.compareMode = 'baseline'; // 'baseline' or 'previous'
         this.apiBaseUrl = 'http://localhost:8001/api'; // Backend API URL
+        this.prefetched = new Map(); // endpoint -> batch result, see prefetch()
         
         this.charts = {
             hero: null,
@@ -43,6 +44,15 @@ class Dashboard {
     
     // API helper methods
     async fetchAPI(endpoint) {
+        // Answered by the last batch prefetch (copied, callers may modify it)
+        const prefetched = this.prefetched.get(endpoint);
+        if (prefetched) {
+            if (prefetched.status !== 200) {
+                throw new Error(`API error: ${prefetched.status}`);
+            }
+            return structuredClone(prefetched.body);
+        }
+        
         try {
             const url = `${this.apiBaseUrl}${endpoint}`;
             console.log(`Fetching: ${url}`);
@@ -76,6 +86,43 @@ class Dashboard {
         }
     }
     
+    // Run several GET endpoints in one round trip against one data snapshot;
+    // returns [{status, body}] in the order of the endpoints
+    async fetchBatch(endpoints) {
+        const url = `${this.apiBaseUrl}/batch`;
+        console.log(`Fetching batch of ${endpoints.length}: ${url}`);
+        
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Accept': 'application/json',
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ queries: endpoints })
+        });
+        
+        if (!response.ok) {
+            const errorText = await response.text();
+            console.error(`API error ${response.status}:`, errorText);
+            throw new Error(`API error: ${response.status} ${response.statusText}`);
+        }
+        
+        const data = await response.json();
+        return data.results;
+    }
+    
+    // Fetch endpoints in one batch so the fetchAPI calls that follow are answered
+    // locally; on failure they fall back to individual requests
+    async prefetch(endpoints) {
+        this.prefetched = new Map();
+        try {
+            const results = await this.fetchBatch(endpoints);
+            endpoints.forEach((endpoint, i) => this.prefetched.set(endpoint, results[i]));
+        } catch (error) {
+            console.error('✗ Batch prefetch failed, fetching individually:', error);
+        }
+    }
+    
     async checkBackendConnection() {
         try {
             console.log('Checking backend connection...');
@@ -247,6 +294,15 @@ class Dashboard {
     async updateDashboard() {
         console.log('updateDashboard() called');
         try {
+            // Everything the overview needs in one request
+            await this.prefetch([
+                `/summary/us?year=${this.currentYear}`,
+                `/summary/sector?sector=Power Plants&year=${this.currentYear}`,
+                `/states/low_emission?year=${this.currentYear}&percentile=25`,
+                '/chart/us_trend',
+                `/states/top?year=${this.currentYear}&limit=5`
+            ]);
+            
             await Promise.all([
                 this.updateKPIs(),
                 this.updateHeroChart(),
@@ -259,6 +315,8 @@ class Dashboard {
         } catch (error) {
             console.error('✗ Error updating dashboard:', error);
             this.showConnectionError();
+        } finally {
+            this.prefetched.clear();
         }
     }
 
@@ -863,6 +921,12 @@ class Dashboard {
             switch(filterName) {
                 case 'power-sector':
                     console.log('Filtering to Power Sector...');
+                    await this.prefetch([
+                        `/summary/sector?sector=Power Plants&year=${this.currentYear}`,
+                        `/chart/sector_trend?sector=Power Plants`,
+                        `/sectors/top?year=${this.currentYear}&limit=5`
+                    ]);
+                    
                     // Filter to power sector only
                     const powerData = await this.fetchAPI(`/summary/sector?sector=Power Plants&year=${this.currentYear}`);
                     const powerTrend = await this.fetchAPI(`/chart/sector_trend?sector=Power Plants`);
@@ -994,27 +1058,28 @@ class Dashboard {
             // On error, reset to all data
             this.currentFilter = null;
             await this.updateDashboard();
+        } finally {
+            this.prefetched.clear();
         }
     }
     
     async updateHeroChartWithTopStates(stateList) {
-        // Fetch trends for states and combine
-        const promises = stateList.map(state => this.fetchAPI(`/chart/state_trend?state=${state}`));
-        const stateTrends = await Promise.all(promises);
+        // Fetch the trends of all states in one request (one row per state,
+        // one column per year, null where a state has no data)
+        const names = stateList.map(state => `name=${encodeURIComponent(state)}`).join('&');
+        const trends = await this.fetchAPI(`/chart/trends?entity=state&${names}`);
         
-        // Combine all state trends by year
-        const combinedTrend = {};
-        stateTrends.forEach(trend => {
-            trend.forEach(point => {
-                if (!combinedTrend[point.year]) {
-                    combinedTrend[point.year] = { year: point.year, emissions: 0 };
-                }
-                combinedTrend[point.year].emissions += point.emissions;
-            });
+        // Combine the states by year
+        const trendArray = [];
+        trends.years.forEach((year, column) => {
+            const values = trends.values.total_emissions
+                .map(row => row[column])
+                .filter(value => value !== null);
+            if (values.length > 0) {
+                trendArray.push({ year: year, emissions: values.reduce((sum, value) => sum + value, 0) });
+            }
         });
         
-        const trendArray = Object.values(combinedTrend).sort((a, b) => a.year - b.year);
-        
         // Create label based on filter context
         let label = stateList.length <= 5 ? `${stateList.length} States Combined` : `${stateList.length} States`;
         await this.updateHeroChartWithData(trendArray, label);
@@ -3,67 +3,297 @@ Main pipeline script to run all GHGRP data processing steps.
 This script orchestrates ingestion, cleaning, transformation, and similarity computation.
 """
 
+import argparse
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.ingest import load_all_ghgp_files
+from src.ingest import load_ghgp_files, iter_ghgp_chunks
 from src.clean import clean_ghgp_data
-from src.transform import create_all_transformations
+from src.transform import (
+    aggregate_base_grain,
+    rollup,
+    prepare_facility_export,
+    create_all_transformations,
+    create_feature_matrix_from_year_aggregates
+)
 from src.similarity import (
     compute_state_similarity,
     compute_sector_similarity,
-    save_similarity_matrix
+    save_similarity_matrix,
+    save_similarity_topk
+)
+from src.incremental import (
+    load_manifest,
+    save_manifest,
+    build_manifest,
+    describe_files,
+    find_changed_years,
+    replace_year_partitions,
+    read_output_csv,
+    hash_frame
 )
-from src.utils import get_data_processed_path, ensure_directory_exists
+from src.streaming import stream_clean_transform
+from src.snapshot import write_serving_snapshot, SNAPSHOT_DIRNAME
+from src.utils import (
+    get_data_raw_path,
+    get_data_processed_path,
+    ensure_directory_exists,
+    find_excel_files
+)
+
+
+def compute_feature_hashes(state_year, sector_year):
+    """
+    Hash the state and sector feature matrices derived from the year aggregates.
+    
+    Args:
+        state_year: State-year aggregates
+        sector_year: Sector-year aggregates
+        
+    Returns:
+        Dictionary of entity type -> feature matrix hash
+    """
+    return {
+        'state': hash_frame(create_feature_matrix_from_year_aggregates(state_year, 'state')),
+        'sector': hash_frame(create_feature_matrix_from_year_aggregates(sector_year, 'sector')),
+    }
 
 
-def main():
-    """Run the complete data processing pipeline."""
+def run_incremental(output_dir, workers=None, use_cache=True, compact=False):
+    """
+    Reprocess only the years whose raw workbook changed since the last run.
+    
+    Rows of the affected years are replaced in the cleaned, state-sector-year,
+    state-year, sector-year and facility outputs. Similarity matrices are recomputed only
+    when the feature aggregates changed.
+    
+    Args:
+        output_dir: Path to data_processed directory
+        workers: Number of processes used to parse Excel files (default: CPU count)
+        use_cache: Reuse cached years whose workbook has not changed
+        compact: Clean into memory-lean dtypes (categoricals, float32, int16)
+        
+    Returns:
+        False if there is no previous run to build on (a full run is needed)
+    """
+    clean_file = output_dir / "ghg_all_years_clean.csv"
+    state_sector_year_file = output_dir / "ghg_state_sector_year.csv"
+    state_year_file = output_dir / "ghg_state_year.csv"
+    sector_year_file = output_dir / "ghg_sector_year.csv"
+    facility_file = output_dir / "ghg_facility_clean.csv"
+    
+    manifest = load_manifest(output_dir)
+    if manifest is None or not all(f.exists() for f in [clean_file, state_sector_year_file, state_year_file,
+                                              sector_year_file, facility_file]):
+        print("\n⚠ No previous run found, running the full pipeline")
+        return False
     
+    excel_files = find_excel_files(get_data_raw_path())
+    files = describe_files(excel_files)
+    changed_years = sorted(find_changed_years(manifest, files))
+    
+    if not changed_years:
+        print("\n✓ No raw workbooks changed since the last run")
+        return True
+    
+    print(f"\nChanged years: {', '.join(str(year) for year in changed_years)}")
+    
+    # Step 1: Ingest changed years only
+    print("\n" + "=" * 60)
+    print("STEP 1: Data Ingestion (changed years)")
     print("=" * 60)
-    print("GHGRP United States Emissions Analytics Pipeline")
+    year_files = [f for f in excel_files if files[f.name]['year'] in changed_years]
+    dfs = load_ghgp_files(year_files, workers=workers, use_cache=use_cache)
+    
+    # Step 2: Clean changed years
+    print("\n" + "=" * 60)
+    print("STEP 2: Data Cleaning (changed years)")
     print("=" * 60)
+    if dfs:
+        df_clean = clean_ghgp_data(dfs, compact=compact)
+        del dfs
+    else:
+        # Every workbook of the changed years was removed
+        df_clean = read_output_csv(clean_file, nrows=0)
     
-    # Ensure output directory exists
-    output_dir = get_data_processed_path()
-    ensure_directory_exists(output_dir)
-    print(f"\nOutput directory: {output_dir}")
+    df_all = replace_year_partitions(
+        read_output_csv(clean_file), df_clean, changed_years, 'reporting_year'
+    )
+    df_all.to_csv(clean_file, index=False)
+    print(f"✓ Updated cleaned dataset: {clean_file}")
     
-    # Step 1: Ingestion
+    # Step 3: Transform changed years and replace their partitions
     print("\n" + "=" * 60)
-    print("STEP 1: Data Ingestion")
+    print("STEP 3: Data Transformation (changed years)")
     print("=" * 60)
-    dfs = load_all_ghgp_files()
+    df_base = aggregate_base_grain(df_clean)
     
-    if not dfs:
-        print("ERROR: No data files loaded. Exiting.")
-        return
+    state_sector_year = replace_year_partitions(
+        read_output_csv(state_sector_year_file), rollup(df_base, 'state_sector_year'),
+        changed_years, 'year', sort_cols=['state', 'sector', 'year']
+    )
+    state_sector_year.to_csv(state_sector_year_file, index=False)
+    print(f"✓ Updated state-sector-year aggregates: {state_sector_year_file}")
     
-    print(f"\n✓ Successfully loaded {len(dfs)} files")
+    state_year = replace_year_partitions(
+        read_output_csv(state_year_file), rollup(df_base, 'state_year'),
+        changed_years, 'year', sort_cols=['state', 'year']
+    )
+    state_year.to_csv(state_year_file, index=False)
+    print(f"✓ Updated state-year aggregates: {state_year_file}")
     
-    # Step 2: Cleaning
+    sector_year = replace_year_partitions(
+        read_output_csv(sector_year_file), rollup(df_base, 'sector_year'),
+        changed_years, 'year', sort_cols=['sector', 'year']
+    )
+    sector_year.to_csv(sector_year_file, index=False)
+    print(f"✓ Updated sector-year aggregates: {sector_year_file}")
+    
+    facility = replace_year_partitions(
+        read_output_csv(facility_file), prepare_facility_export(df_clean),
+        changed_years, 'reporting_year'
+    )
+    facility.to_csv(facility_file, index=False)
+    print(f"✓ Updated facility-level data: {facility_file}")
+    
+    # Step 4: Similarity, only if the feature aggregates changed
     print("\n" + "=" * 60)
-    print("STEP 2: Data Cleaning")
+    print("STEP 4: Cosine Similarity Computation")
     print("=" * 60)
-    df_clean = clean_ghgp_data(dfs)
+    feature_hashes = compute_feature_hashes(state_year, sector_year)
+    previous_hashes = manifest.get('feature_hashes', {})
     
-    # Save cleaned dataset
-    output_file = output_dir / "ghg_all_years_clean.csv"
-    df_clean.to_csv(output_file, index=False)
-    print(f"✓ Saved cleaned dataset to {output_file}")
+    state_sim_file = output_dir / "similarity_states.csv"
+    state_topk_file = output_dir / "similarity_states_topk.npz"
+    if (feature_hashes['state'] != previous_hashes.get('state')
+            or not state_sim_file.exists() or not state_topk_file.exists()):
+        print("\nComputing state similarity matrix...")
+        state_sim = compute_state_similarity(create_feature_matrix_from_year_aggregates(state_year, 'state'))
+        save_similarity_matrix(state_sim, str(state_sim_file), entity_name='state')
+        save_similarity_topk(state_sim, str(state_topk_file))
+    else:
+        print("\n✓ State features unchanged, keeping similarity_states.csv")
+    
+    sector_sim_file = output_dir / "similarity_sectors.csv"
+    sector_topk_file = output_dir / "similarity_sectors_topk.npz"
+    if (feature_hashes['sector'] != previous_hashes.get('sector')
+            or not sector_sim_file.exists() or not sector_topk_file.exists()):
+        print("\nComputing sector similarity matrix...")
+        sector_sim = compute_sector_similarity(create_feature_matrix_from_year_aggregates(sector_year, 'sector'))
+        save_similarity_matrix(sector_sim, str(sector_sim_file), entity_name='sector')
+        save_similarity_topk(sector_sim, str(sector_topk_file))
+    else:
+        print("\n✓ Sector features unchanged, keeping similarity_sectors.csv")
+    
+    save_manifest(output_dir, build_manifest(files, feature_hashes))
     
-    # Step 3: Transformation
+    # Step 5: Binary snapshot for the backend
     print("\n" + "=" * 60)
-    print("STEP 3: Data Transformation")
+    print("STEP 5: Serving Snapshot")
     print("=" * 60)
-    transformations = create_all_transformations(df_clean)
+    write_serving_snapshot(output_dir)
+    
+    print("\n" + "=" * 60)
+    print("INCREMENTAL UPDATE COMPLETE")
+    print("=" * 60)
+    print(f"\nReprocessed {len(changed_years)} year(s); output files saved to: {output_dir}")
+    
+    return True
+
+
+def main(workers=None, use_cache=True, incremental=False, compact=False, streaming=False, chunk_rows=None):
+    """
+    Run the complete data processing pipeline.
+    
+    Args:
+        workers: Number of processes used to parse Excel files (default: CPU count)
+        use_cache: Reuse cached years whose workbook has not changed
+        incremental: Only reprocess years whose raw workbook changed since the last run
+        compact: Clean into memory-lean dtypes (categoricals, float32, int16)
+        streaming: Clean and aggregate one year (or chunk of rows) at a time
+            instead of loading every year into memory
+        chunk_rows: Largest number of rows per chunk in streaming mode (default: one year)
+    """
+    
+    print("=" * 60)
+    print("GHGRP United States Emissions Analytics Pipeline")
+    print("=" * 60)
+    
+    # Ensure output directory exists
+    output_dir = get_data_processed_path()
+    ensure_directory_exists(output_dir)
+    print(f"\nOutput directory: {output_dir}")
+    
+    if incremental and run_incremental(output_dir, workers=workers, use_cache=use_cache, compact=compact):
+        return
+    
+    excel_files = find_excel_files(get_data_raw_path())
+    files = describe_files(excel_files)
+    
+    output_file = output_dir / "ghg_all_years_clean.csv"
+    facility_file = output_dir / "ghg_facility_clean.csv"
+    
+    if streaming:
+        # Steps 1-3 interleaved: each chunk is ingested, cleaned, exported and aggregated in turn
+        print("\n" + "=" * 60)
+        print("STEPS 1-3: Streaming Ingestion, Cleaning and Transformation")
+        print("=" * 60)
+        if not excel_files:
+            print("ERROR: No data files loaded. Exiting.")
+            return
+        chunks = iter_ghgp_chunks(excel_files, chunk_rows=chunk_rows, use_cache=use_cache)
+        transformations, row_counts = stream_clean_transform(chunks, output_file, facility_file, compact=compact)
+        print(f"✓ Saved cleaned dataset to {output_file}")
+        print(f"✓ Saved facility-level data to {facility_file}")
+    else:
+        # Step 1: Ingestion
+        print("\n" + "=" * 60)
+        print("STEP 1: Data Ingestion")
+        print("=" * 60)
+        dfs = load_ghgp_files(excel_files, workers=workers, use_cache=use_cache)
+        
+        if not dfs:
+            print("ERROR: No data files loaded. Exiting.")
+            return
+        
+        print(f"\n✓ Successfully loaded {len(dfs)} files")
+        
+        # Step 2: Cleaning
+        print("\n" + "=" * 60)
+        print("STEP 2: Data Cleaning")
+        print("=" * 60)
+        df_clean = clean_ghgp_data(dfs, compact=compact)
+        
+        # The raw per-year frames are no longer needed
+        del dfs
+        
+        # Save cleaned dataset
+        df_clean.to_csv(output_file, index=False)
+        print(f"✓ Saved cleaned dataset to {output_file}")
+        
+        # Step 3: Transformation
+        print("\n" + "=" * 60)
+        print("STEP 3: Data Transformation")
+        print("=" * 60)
+        transformations = create_all_transformations(df_clean)
+        
+        # Facility-level export
+        transformations.pop('facility').to_csv(facility_file, index=False)
+        print(f"✓ Saved facility-level data to {facility_file}")
+        row_counts = {'clean': len(df_clean), 'facility': len(df_clean)}
+        del df_clean
     
     # Save transformed datasets
     print("\nSaving transformed datasets...")
     
+    # State-sector-year aggregates (the base grain of all other aggregates)
+    state_sector_year_file = output_dir / "ghg_state_sector_year.csv"
+    transformations['state_sector_year'].to_csv(state_sector_year_file, index=False)
+    print(f"✓ Saved state-sector-year aggregates to {state_sector_year_file}")
+    
     # State-year aggregates
     state_year_file = output_dir / "ghg_state_year.csv"
     transformations['state_year'].to_csv(state_year_file, index=False)
@@ -74,11 +304,6 @@ def main():
     transformations['sector_year'].to_csv(sector_year_file, index=False)
     print(f"✓ Saved sector-year aggregates to {sector_year_file}")
     
-    # Facility-level export
-    facility_file = output_dir / "ghg_facility_clean.csv"
-    transformations['facility'].to_csv(facility_file, index=False)
-    print(f"✓ Saved facility-level data to {facility_file}")
-    
     # Step 4: Similarity Computation
     print("\n" + "=" * 60)
     print("STEP 4: Cosine Similarity Computation")
@@ -89,12 +314,25 @@ def main():
     state_sim = compute_state_similarity(transformations['state_features'])
     state_sim_file = output_dir / "similarity_states.csv"
     save_similarity_matrix(state_sim, str(state_sim_file), entity_name='state')
+    save_similarity_topk(state_sim, str(output_dir / "similarity_states_topk.npz"))
     
     # Sector similarity
     print("\nComputing sector similarity matrix...")
     sector_sim = compute_sector_similarity(transformations['sector_features'])
     sector_sim_file = output_dir / "similarity_sectors.csv"
     save_similarity_matrix(sector_sim, str(sector_sim_file), entity_name='sector')
+    save_similarity_topk(sector_sim, str(output_dir / "similarity_sectors_topk.npz"))
+    
+    # Record what was processed for the next --incremental run
+    save_manifest(output_dir, build_manifest(
+        files, compute_feature_hashes(transformations['state_year'], transformations['sector_year'])
+    ))
+    
+    # Step 5: Binary snapshot for the backend
+    print("\n" + "=" * 60)
+    print("STEP 5: Serving Snapshot")
+    print("=" * 60)
+    snapshot_dir = write_serving_snapshot(output_dir)
     
     # Summary
     print("\n" + "=" * 60)
@@ -102,15 +340,51 @@ def main():
     print("=" * 60)
     print(f"\nOutput files saved to: {output_dir}")
     print("\nGenerated files:")
-    print(f"  - ghg_all_years_clean.csv ({len(df_clean):,} rows)")
+    print(f"  - ghg_all_years_clean.csv ({row_counts['clean']:,} rows)")
+    print(f"  - ghg_state_sector_year.csv ({len(transformations['state_sector_year']):,} rows)")
     print(f"  - ghg_state_year.csv ({len(transformations['state_year']):,} rows)")
     print(f"  - ghg_sector_year.csv ({len(transformations['sector_year']):,} rows)")
-    print(f"  - ghg_facility_clean.csv ({len(transformations['facility']):,} rows)")
+    print(f"  - ghg_facility_clean.csv ({row_counts['facility']:,} rows)")
     print(f"  - similarity_states.csv ({state_sim.shape[0]} x {state_sim.shape[1]})")
     print(f"  - similarity_sectors.csv ({sector_sim.shape[0]} x {sector_sim.shape[1]})")
+    print("  - similarity_states_topk.npz, similarity_sectors_topk.npz (top-k lists for the backend)")
+    if snapshot_dir is not None:
+        print(f"  - {SNAPSHOT_DIRNAME}/ (Arrow tables for the backend)")
     print("\n✓ All processing steps completed successfully!")
 
 
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Run the GHGRP data processing pipeline.")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Number of processes used to parse Excel files (default: CPU count)"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Parse every Excel file, ignoring the ingestion cache in data_cache/"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only reprocess years whose raw workbook changed since the last run"
+    )
+    parser.add_argument(
+        "--compact", action="store_true",
+        help="Keep the cleaned data in memory-lean dtypes (categoricals, float32 emissions, int16 year)"
+    )
+    parser.add_argument(
+        "--streaming", action="store_true",
+        help="Clean and aggregate one year at a time, so memory is bounded by the largest chunk"
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, default=None,
+        help="With --streaming, split years into chunks of at most this many rows"
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(workers=args.workers, use_cache=not args.no_cache, incremental=args.incremental,
+         compact=args.compact, streaming=args.streaming, chunk_rows=args.chunk_rows)
 
@@ -3,6 +3,7 @@ Data cleaning module for GHGRP data.
 Standardizes column names, handles missing values, and filters invalid data.
 """
 
+import numpy as np
 import pandas as pd
 import re
 from typing import Dict, List
@@ -38,6 +39,37 @@ COLUMN_MAPPING = {
 }
 
 
+# US state names -> 2-letter codes
+US_STATE_ABBREVIATIONS = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR',
+    'CALIFORNIA': 'CA', 'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE',
+    'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID',
+    'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
+    'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD',
+    'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
+    'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
+    'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
+    'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
+    'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC',
+    'SOUTH DAKOTA': 'SD', 'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT',
+    'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV',
+    'WISCONSIN': 'WI', 'WYOMING': 'WY', 'DISTRICT OF COLUMBIA': 'DC'
+}
+
+
+# Compact-dtype mode: string columns that are always stored as categoricals
+CATEGORICAL_COLUMNS = [
+    'state', 'industry_type_sectors', 'industry_type_subparts', 'city', 'facility_name'
+]
+
+# Other string columns become categoricals when they have at most this many
+# distinct values per row
+MAX_CATEGORICAL_RATIO = 0.5
+
+# Identifier-like float columns that need full float64 precision
+FLOAT64_COLUMNS = ['frs_id', 'primary_naics_code']
+
+
 def to_snake_case(name: str) -> str:
     """Convert string to snake_case."""
     # Replace spaces and special chars with underscores
@@ -46,29 +78,34 @@ def to_snake_case(name: str) -> str:
     return name.lower()
 
 
-def standardize_column_names(df: pd.DataFrame) -> pd.DataFrame:
+def standardize_column_names(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """
     Standardize column names to snake_case.
     
     Args:
         df: Input DataFrame
+        inplace: Rename the columns of df itself instead of returning a renamed copy
         
     Returns:
         DataFrame with standardized column names
     """
-    df = df.copy()
-    
     # First, try exact mapping
     rename_dict = {}
     for old_name, new_name in COLUMN_MAPPING.items():
         if old_name in df.columns:
             rename_dict[old_name] = new_name
     
-    df = df.rename(columns=rename_dict)
-    
     # For any remaining columns, convert to snake_case
-    remaining_cols = {col: to_snake_case(col) for col in df.columns if col not in rename_dict.values()}
-    df = df.rename(columns=remaining_cols)
+    mapped_names = set(rename_dict.values())
+    new_columns = []
+    for col in df.columns:
+        col = rename_dict.get(col, col)
+        new_columns.append(col if col in mapped_names else to_snake_case(col))
+    
+    if not inplace:
+        df = df.set_axis(new_columns, axis=1)
+    else:
+        df.columns = new_columns
     
     return df
 
@@ -88,33 +125,42 @@ def standardize_state_abbreviation(state: str) -> str:
     
     state_str = str(state).strip().upper()
     
-    # US state abbreviations
-    us_states = {
-        'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR',
-        'CALIFORNIA': 'CA', 'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE',
-        'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID',
-        'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
-        'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD',
-        'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS',
-        'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
-        'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
-        'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
-        'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC',
-        'SOUTH DAKOTA': 'SD', 'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT',
-        'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV',
-        'WISCONSIN': 'WI', 'WYOMING': 'WY', 'DISTRICT OF COLUMBIA': 'DC'
-    }
-    
     # If already 2 letters, return as is
     if len(state_str) == 2:
         return state_str
     
-    # Try to match full state name
-    if state_str in us_states:
-        return us_states[state_str]
+    # Try to match full state name, return original if no match
+    return US_STATE_ABBREVIATIONS.get(state_str, state_str)
+
+
+def standardize_state_abbreviations(states: pd.Series) -> pd.Series:
+    """
+    Vectorized version of standardize_state_abbreviation for a whole column.
+    
+    The column is converted to a categorical, so each distinct value is
+    normalized once and the result is broadcast back through the codes.
     
-    # Return original if no match
-    return state_str
+    Args:
+        states: Series of state names or abbreviations
+        
+    Returns:
+        Series of standardized state codes (None where the input is missing)
+    """
+    categorical = states.astype('category')
+    
+    # Normalize the distinct values with .str ops
+    normalized = pd.Series(categorical.cat.categories, dtype=object).astype(str).str.strip().str.upper()
+    
+    # Map full state names; 2-letter codes and unknown values are kept as is
+    mapped = normalized.map(US_STATE_ABBREVIATIONS)
+    normalized = mapped.where(mapped.notna(), normalized).to_numpy(dtype=object)
+    
+    codes = categorical.cat.codes.to_numpy()
+    result = np.full(len(codes), None, dtype=object)
+    present = codes >= 0
+    result[present] = normalized[codes[present]]
+    
+    return pd.Series(result, index=states.index, name=states.name, dtype=object)
 
 
 def clean_emissions_column(df: pd.DataFrame, col_name: str) -> pd.Series:
@@ -129,43 +175,65 @@ def clean_emissions_column(df: pd.DataFrame, col_name: str) -> pd.Series:
         Cleaned Series
     """
     if col_name not in df.columns:
-        return pd.Series(0, index=df.index)
-    
-    series = df[col_name].copy()
+        return pd.Series(0.0, index=df.index)
     
     # Convert to numeric, coercing errors to NaN
-    series = pd.to_numeric(series, errors='coerce')
-    
-    # Replace NaN with 0
-    series = series.fillna(0)
+    series = pd.to_numeric(df[col_name], errors='coerce')
     
-    # Replace negative values with 0
-    series = series.clip(lower=0)
+    # Replace NaN and negative values with 0 in a single pass
+    series = series.where(series > 0, 0)
     
     return series
 
 
-def clean_ghgp_data(df_list: List[pd.DataFrame]) -> pd.DataFrame:
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Clean and combine multiple GHGRP DataFrames.
+    Convert columns to memory-lean dtypes, in place.
+    
+    - String columns listed in CATEGORICAL_COLUMNS, and other string columns
+      with few distinct values, become categoricals
+    - Float columns become float32, except identifiers in FLOAT64_COLUMNS
+    - reporting_year becomes int16
     
     Args:
-        df_list: List of DataFrames from different years
+        df: Cleaned DataFrame
         
     Returns:
-        Single cleaned DataFrame
+        The same DataFrame, with compact dtypes
     """
-    if not df_list:
-        raise ValueError("No DataFrames provided")
+    for col in df.columns:
+        series = df[col]
+        if col == 'reporting_year' and pd.api.types.is_integer_dtype(series):
+            df[col] = series.astype('int16')
+        elif series.dtype == object:
+            if col in CATEGORICAL_COLUMNS or series.nunique() <= MAX_CATEGORICAL_RATIO * len(series):
+                df[col] = series.astype('category')
+        elif series.dtype == 'float64' and col not in FLOAT64_COLUMNS:
+            df[col] = series.astype('float32')
     
-    # Combine all DataFrames
-    df_combined = pd.concat(df_list, ignore_index=True, sort=False)
+    return df
+
+
+def clean_ghgp_frame(df: pd.DataFrame, compact: bool = False, verbose: bool = True) -> pd.DataFrame:
+    """
+    Clean one raw GHGRP DataFrame (a year, or a chunk of rows of one).
     
-    print(f"Combined {len(df_list)} files: {len(df_combined)} total rows")
+    Every step works row by row, so cleaning chunks separately gives the same
+    rows as cleaning their concatenation. df is modified in place.
     
-    # Standardize column names
-    df_combined = standardize_column_names(df_combined)
-    print("✓ Standardized column names")
+    Args:
+        df: Raw DataFrame, owned by the caller and not used afterwards
+        compact: Convert the result to memory-lean dtypes (see compact_dtypes)
+        verbose: Print a line per cleaning step
+        
+    Returns:
+        Cleaned DataFrame
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    
+    # Standardize column names (df is our own frame, rename in place)
+    standardize_column_names(df, inplace=True)
+    log("✓ Standardized column names")
     
     # Select required columns (keep all that exist)
     required_cols = [
@@ -176,45 +244,81 @@ def clean_ghgp_data(df_list: List[pd.DataFrame]) -> pd.DataFrame:
     ]
     
     # Keep only columns that exist
-    available_cols = [col for col in required_cols if col in df_combined.columns]
-    df_combined = df_combined[available_cols + [col for col in df_combined.columns if col not in required_cols and col not in available_cols]]
-    
-    # Remove rows with missing facility_id
-    initial_rows = len(df_combined)
-    df_combined = df_combined.dropna(subset=['facility_id'])
-    removed = initial_rows - len(df_combined)
+    available_cols = [col for col in required_cols if col in df.columns]
+    if df.columns.is_unique:
+        # Move required columns to the front in place, without copying the frame
+        for position, col in enumerate(available_cols):
+            df.insert(position, col, df.pop(col))
+    else:
+        df = df[available_cols + [col for col in df.columns if col not in required_cols and col not in available_cols]]
+    
+    # Remove rows with missing facility_id (only copies if there are any)
+    initial_rows = len(df)
+    if df['facility_id'].isna().any():
+        df = df.dropna(subset=['facility_id'])
+    removed = initial_rows - len(df)
     if removed > 0:
-        print(f"✓ Removed {removed} rows with missing facility_id")
+        log(f"✓ Removed {removed} rows with missing facility_id")
     
-    # Clean emissions columns
+    # Clean emissions columns (a frame without one gets zeros, as it would after a concat)
     emissions_cols = [
         'total_reported_direct_emissions', 'co2_emissions_non_biogenic',
         'ch4_emissions', 'n2o_emissions'
     ]
     
     for col in emissions_cols:
-        if col in df_combined.columns:
-            df_combined[col] = clean_emissions_column(df_combined, col)
+        df[col] = clean_emissions_column(df, col)
     
-    print("✓ Cleaned emissions columns")
+    log("✓ Cleaned emissions columns")
     
     # Standardize state abbreviations
-    if 'state' in df_combined.columns:
-        df_combined['state'] = df_combined['state'].apply(standardize_state_abbreviation)
-        print("✓ Standardized state abbreviations")
+    if 'state' in df.columns:
+        df['state'] = standardize_state_abbreviations(df['state'])
+        log("✓ Standardized state abbreviations")
     
-    # Convert numeric columns
+    # Convert numeric columns (always float, whether or not this frame has missing values)
     numeric_cols = ['latitude', 'longitude', 'primary_naics_code']
     for col in numeric_cols:
-        if col in df_combined.columns:
-            df_combined[col] = pd.to_numeric(df_combined[col], errors='coerce')
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
     
     # Remove rows with negative emissions (already handled in clean_emissions_column, but double-check)
     for col in emissions_cols:
-        if col in df_combined.columns:
-            negative_count = (df_combined[col] < 0).sum()
+        if col in df.columns:
+            negative_count = (df[col] < 0).sum()
             if negative_count > 0:
-                df_combined.loc[df_combined[col] < 0, col] = 0
+                df.loc[df[col] < 0, col] = 0
+    
+    if compact:
+        memory_before = df.memory_usage(deep=True).sum()
+        df = compact_dtypes(df)
+        memory_after = df.memory_usage(deep=True).sum()
+        log(f"✓ Compacted dtypes: {memory_before / 1024**2:.1f} MB -> {memory_after / 1024**2:.1f} MB "
+            f"({memory_before / max(memory_after, 1):.1f}x smaller)")
+    
+    return df
+
+
+def clean_ghgp_data(df_list: List[pd.DataFrame], compact: bool = False) -> pd.DataFrame:
+    """
+    Clean and combine multiple GHGRP DataFrames.
+    
+    Args:
+        df_list: List of DataFrames from different years
+        compact: Convert the result to memory-lean dtypes (see compact_dtypes)
+        
+    Returns:
+        Single cleaned DataFrame
+    """
+    if not df_list:
+        raise ValueError("No DataFrames provided")
+    
+    # Combine all DataFrames
+    df_combined = pd.concat(df_list, ignore_index=True, sort=False)
+    
+    print(f"Combined {len(df_list)} files: {len(df_combined)} total rows")
+    
+    df_combined = clean_ghgp_frame(df_combined, compact=compact)
     
     print(f"✓ Final cleaned dataset: {len(df_combined)} rows, {len(df_combined.columns)} columns")
     
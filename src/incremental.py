@@ -0,0 +1,184 @@
+"""
+Incremental processing support for the GHGRP pipeline.
+Tracks which raw workbooks have been processed and replaces per-year partitions
+of the processed outputs when a workbook changes.
+"""
+
+import hashlib
+import json
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from .ingest import compute_file_hash, PARSER_VERSION
+from .utils import extract_year_from_filename
+
+
+MANIFEST_FILENAME = "pipeline_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def get_manifest_path(output_dir: Path) -> Path:
+    """Get path to the pipeline manifest inside the output directory."""
+    return output_dir / MANIFEST_FILENAME
+
+
+def load_manifest(output_dir: Path) -> Optional[Dict]:
+    """
+    Load the manifest written by the previous pipeline run.
+    
+    Args:
+        output_dir: Path to data_processed directory
+    
+    Returns:
+        Manifest dictionary, or None if missing, unreadable or outdated
+    """
+    manifest_path = get_manifest_path(output_dir)
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(output_dir: Path, manifest: Dict) -> None:
+    """
+    Save the manifest for the next pipeline run.
+    
+    Args:
+        output_dir: Path to data_processed directory
+        manifest: Manifest dictionary (see build_manifest)
+    """
+    manifest_path = get_manifest_path(output_dir)
+    tmp_path = manifest_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(manifest_path)
+
+
+def describe_files(excel_files: Iterable[Path]) -> Dict[str, Dict]:
+    """
+    Describe raw workbooks by year and content hash.
+    
+    Args:
+        excel_files: Paths to Excel files
+    
+    Returns:
+        Dictionary of file name -> {'year', 'sha256', 'parser_version'}
+    """
+    return {
+        excel_file.name: {
+            'year': extract_year_from_filename(excel_file.name),
+            'sha256': compute_file_hash(excel_file),
+            'parser_version': PARSER_VERSION,
+        }
+        for excel_file in excel_files
+    }
+
+
+def build_manifest(files: Dict[str, Dict], feature_hashes: Dict[str, str]) -> Dict:
+    """
+    Build a manifest dictionary.
+    
+    Args:
+        files: Output of describe_files for the processed workbooks
+        feature_hashes: Entity type -> hash of its feature matrix
+    
+    Returns:
+        Manifest dictionary
+    """
+    return {
+        'version': MANIFEST_VERSION,
+        'files': files,
+        'feature_hashes': feature_hashes,
+    }
+
+
+def find_changed_years(manifest: Dict, files: Dict[str, Dict]) -> Set[int]:
+    """
+    Find years whose raw workbooks were added, changed or removed.
+    
+    Args:
+        manifest: Manifest from the previous run
+        files: Output of describe_files for the current workbooks
+    
+    Returns:
+        Set of affected reporting years
+    """
+    previous = manifest.get('files', {})
+    changed = set()
+    
+    for name, entry in files.items():
+        if previous.get(name) != entry and entry['year'] is not None:
+            changed.add(entry['year'])
+    
+    for name, entry in previous.items():
+        if name not in files and entry.get('year') is not None:
+            changed.add(entry['year'])
+    
+    return changed
+
+
+def read_output_csv(path: Path, **kwargs) -> pd.DataFrame:
+    """
+    Read a previously written pipeline output.
+    
+    Floats are parsed with round-trip precision, so rewriting unchanged
+    partitions reproduces the original file exactly.
+    
+    Args:
+        path: Path to CSV file
+        **kwargs: Extra arguments for pd.read_csv
+        
+    Returns:
+        DataFrame
+    """
+    return pd.read_csv(path, low_memory=False, float_precision='round_trip', **kwargs)
+
+
+def replace_year_partitions(existing: pd.DataFrame,
+                            updated: pd.DataFrame,
+                            years: Iterable[int],
+                            year_col: str,
+                            sort_cols: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Replace the rows of the given years with freshly computed rows.
+    
+    Args:
+        existing: Previously saved output
+        updated: Newly computed rows for the affected years
+        years: Years to replace (rows of these years are dropped from existing)
+        year_col: Name of the year column
+        sort_cols: Columns to sort the result by (default: stable sort by year)
+    
+    Returns:
+        Combined DataFrame
+    """
+    kept = existing[~existing[year_col].isin(list(years))]
+    combined = pd.concat([kept, updated], ignore_index=True, sort=False)
+    
+    if sort_cols is None:
+        sort_cols = [year_col]
+    combined = combined.sort_values(sort_cols, kind='mergesort').reset_index(drop=True)
+    
+    return combined
+
+
+def hash_frame(df: pd.DataFrame) -> str:
+    """
+    Hash a DataFrame's column names and values.
+    
+    Args:
+        df: DataFrame to hash
+    
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()
@@ -3,11 +3,130 @@ Data ingestion module for GHGRP Excel files.
 Loads all Excel files from data_raw directory and combines them.
 """
 
+import hashlib
+import json
+import os
+import time
+import openpyxl
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
-from .utils import get_data_raw_path, find_excel_files, extract_year_from_filename
+from typing import Dict, Iterator, List, Optional, Tuple
+from .utils import (
+    get_data_raw_path,
+    get_ingest_cache_path,
+    ensure_directory_exists,
+    find_excel_files,
+    extract_year_from_filename,
+)
+
+
+# Bump whenever parsing changes, so cached years are parsed again
+PARSER_VERSION = 1
+
+# Number of rows scanned per sheet when looking for the 'Facility Id' marker
+SHEET_PROBE_ROWS = 5
+HEADER_PROBE_ROWS = 10
+
+# Default header row based on observed structure
+DEFAULT_HEADER_ROW = 3
+
+# Rows per Parquet row group in the ingestion cache; chunked reads decode
+# one row group at a time
+CACHE_ROW_GROUP_SIZE = 50_000
+
+# How many times each workbook has been opened in this process
+WORKBOOK_OPEN_COUNTS: Counter = Counter()
+
+
+def open_workbook(excel_file: Path) -> openpyxl.Workbook:
+    """
+    Open an Excel workbook in read-only (streaming) mode.
+    
+    Every open is recorded in WORKBOOK_OPEN_COUNTS. The caller is responsible
+    for calling close() on the returned workbook.
+    
+    Args:
+        excel_file: Path to Excel file
+        
+    Returns:
+        Read-only openpyxl Workbook
+    """
+    WORKBOOK_OPEN_COUNTS[str(excel_file)] += 1
+    # Same options pandas uses, so the handle can be passed to pd.ExcelFile
+    return openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+
+
+def _find_facility_id_row(worksheet, max_rows: int = HEADER_PROBE_ROWS) -> Optional[int]:
+    """
+    Stream the first rows of a worksheet and find the 'Facility Id' header row.
+    
+    Blank rows are not counted, matching how pandas numbers rows for header=.
+    
+    Args:
+        worksheet: Read-only openpyxl worksheet
+        max_rows: Number of non-blank rows to scan
+        
+    Returns:
+        Row index (0-based, blank rows skipped) or None if not found
+    """
+    if not hasattr(worksheet, 'iter_rows'):
+        # Chartsheets have no cells
+        return None
+    
+    idx = 0
+    for row in worksheet.iter_rows(values_only=True):
+        if idx >= max_rows:
+            break
+        if all(val is None or val == '' for val in row):
+            continue
+        if any(val is not None and 'facility id' in str(val).lower() for val in row):
+            return idx
+        idx += 1
+    return None
+
+
+def probe_workbook(workbook: openpyxl.Workbook) -> Tuple[Optional[str], int]:
+    """
+    Find the Direct Emitters sheet and its header row from an open workbook.
+    
+    Only the first rows of each sheet are streamed, so this is cheap even for
+    large workbooks.
+    
+    Args:
+        workbook: Read-only openpyxl Workbook (see open_workbook)
+        
+    Returns:
+        Tuple of (sheet name or None, header row index)
+    """
+    sheet_names = workbook.sheetnames
+    header_rows = {}
+    
+    # Prefer the first sheet with 'Facility Id' in its first few rows
+    for sheet_name in sheet_names:
+        header_row = _find_facility_id_row(workbook[sheet_name])
+        header_rows[sheet_name] = header_row
+        if header_row is not None and header_row < SHEET_PROBE_ROWS:
+            return sheet_name, header_row
+    
+    # Fallback: check sheet names for keywords
+    chosen = None
+    for sheet_name in sheet_names:
+        if 'direct' in sheet_name.lower() and 'emitter' in sheet_name.lower():
+            chosen = sheet_name
+            break
+    
+    # Last resort: first sheet
+    if chosen is None:
+        chosen = sheet_names[0] if sheet_names else None
+    
+    if chosen is None or header_rows.get(chosen) is None:
+        return chosen, DEFAULT_HEADER_ROW
+    return chosen, header_rows[chosen]
 
 
 def find_direct_emitters_sheet(excel_file: Path) -> Optional[str]:
@@ -21,19 +140,12 @@ def find_direct_emitters_sheet(excel_file: Path) -> Optional[str]:
         Sheet name or None if not found
     """
     try:
-        xl_file = pd.ExcelFile(excel_file)
-        for sheet_name in xl_file.sheet_names:
-            # Try to read first few rows to check for Facility Id
-            df_test = pd.read_excel(excel_file, sheet_name=sheet_name, header=None, nrows=5)
-            # Check if 'Facility Id' appears in any row
-            if df_test.astype(str).apply(lambda x: x.str.contains('Facility Id', case=False, na=False)).any().any():
-                return sheet_name
-        # Fallback: check sheet names for keywords
-        for sheet_name in xl_file.sheet_names:
-            if 'direct' in sheet_name.lower() and 'emitter' in sheet_name.lower():
-                return sheet_name
-        # Last resort: return first sheet
-        return xl_file.sheet_names[0] if xl_file.sheet_names else None
+        workbook = open_workbook(excel_file)
+        try:
+            sheet_name, _ = probe_workbook(workbook)
+        finally:
+            workbook.close()
+        return sheet_name
     except Exception as e:
         warnings.warn(f"Error reading {excel_file}: {e}")
         return None
@@ -51,21 +163,25 @@ def find_header_row(excel_file: Path, sheet_name: str) -> int:
         Row index (0-based) for header, default 3
     """
     try:
-        df_test = pd.read_excel(excel_file, sheet_name=sheet_name, header=None, nrows=10)
-        for idx in range(min(10, len(df_test))):
-            row_values = df_test.iloc[idx].astype(str).str.lower().tolist()
-            if any('facility id' in str(val) for val in row_values):
-                return idx
+        workbook = open_workbook(excel_file)
+        try:
+            header_row = _find_facility_id_row(workbook[sheet_name])
+        finally:
+            workbook.close()
+        if header_row is not None:
+            return header_row
     except Exception:
         pass
-    # Default based on observed structure
-    return 3
+    return DEFAULT_HEADER_ROW
 
 
 def load_ghgp_file(excel_file: Path, reporting_year: Optional[int] = None) -> Optional[pd.DataFrame]:
     """
     Load a single GHGRP Excel file.
     
+    The workbook is opened once: the sheet and header row are found by
+    streaming its first rows, and the data is parsed from the same handle.
+    
     Args:
         excel_file: Path to Excel file
         reporting_year: Year to assign (if None, extracted from filename)
@@ -80,52 +196,319 @@ def load_ghgp_file(excel_file: Path, reporting_year: Optional[int] = None) -> Op
         warnings.warn(f"Could not extract year from {excel_file.name}, skipping")
         return None
     
-    sheet_name = find_direct_emitters_sheet(excel_file)
-    if sheet_name is None:
-        warnings.warn(f"Could not find Direct Emitters sheet in {excel_file.name}, skipping")
+    try:
+        workbook = open_workbook(excel_file)
+    except Exception as e:
+        warnings.warn(f"Error reading {excel_file}: {e}")
         return None
     
-    header_row = find_header_row(excel_file, sheet_name)
-    
     try:
-        df = pd.read_excel(excel_file, sheet_name=sheet_name, header=header_row)
+        try:
+            sheet_name, header_row = probe_workbook(workbook)
+        except Exception as e:
+            warnings.warn(f"Error reading {excel_file}: {e}")
+            return None
+        
+        if sheet_name is None:
+            warnings.warn(f"Could not find Direct Emitters sheet in {excel_file.name}, skipping")
+            return None
+        
+        try:
+            df = pd.ExcelFile(workbook, engine='openpyxl').parse(sheet_name, header=header_row)
+            
+            # Add reporting year column
+            df['reporting_year'] = reporting_year
+            
+            return df
+        except Exception as e:
+            warnings.warn(f"Error loading {excel_file.name}: {e}")
+            return None
+    finally:
+        workbook.close()
+
+
+def _load_ghgp_file_timed(excel_file: Path) -> Tuple[Optional[pd.DataFrame], float, int]:
+    """
+    Load a single GHGRP Excel file and measure how long it took.
+    
+    Module-level so it can be pickled and sent to worker processes.
+    
+    Args:
+        excel_file: Path to Excel file
         
-        # Add reporting year column
-        df['reporting_year'] = reporting_year
+    Returns:
+        Tuple of (DataFrame or None, elapsed seconds, number of workbook opens)
+    """
+    opens_before = WORKBOOK_OPEN_COUNTS[str(excel_file)]
+    start = time.perf_counter()
+    df = load_ghgp_file(excel_file)
+    elapsed = time.perf_counter() - start
+    return df, elapsed, WORKBOOK_OPEN_COUNTS[str(excel_file)] - opens_before
+
+
+def compute_file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+    
+    Args:
+        path: Path to file
+        chunk_size: Bytes read per iteration
+        
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_cache_key(excel_file: Path) -> Dict[str, object]:
+    """
+    Build the cache key for a workbook.
+    
+    A cached year is only reused when the workbook's content hash, its mtime
+    and the parser version all match.
+    
+    Args:
+        excel_file: Path to Excel file
         
-        return df
+    Returns:
+        Dictionary with sha256, mtime_ns and parser_version
+    """
+    return {
+        'sha256': compute_file_hash(excel_file),
+        'mtime_ns': excel_file.stat().st_mtime_ns,
+        'parser_version': PARSER_VERSION,
+    }
+
+
+def _cache_paths(cache_dir: Path, excel_file: Path) -> Tuple[Path, Path]:
+    """Return (Parquet data path, JSON key path) for a workbook's cache entry."""
+    return cache_dir / f"{excel_file.stem}.parquet", cache_dir / f"{excel_file.stem}.json"
+
+
+def has_cached_file(excel_file: Path, cache_dir: Path, key: Dict[str, object]) -> bool:
+    """Whether the cache holds an entry for a workbook under the given key."""
+    data_path, key_path = _cache_paths(cache_dir, excel_file)
+    if not data_path.exists() or not key_path.exists():
+        return False
+    try:
+        with open(key_path) as f:
+            return json.load(f) == key
     except Exception as e:
-        warnings.warn(f"Error loading {excel_file.name}: {e}")
+        warnings.warn(f"Ignoring unreadable cache entry for {excel_file.name}: {e}")
+        return False
+
+
+def load_cached_file(excel_file: Path, cache_dir: Path, key: Dict[str, object]) -> Optional[pd.DataFrame]:
+    """
+    Load a previously ingested workbook from the cache.
+    
+    Args:
+        excel_file: Path to Excel file
+        cache_dir: Cache directory
+        key: Current cache key (see get_cache_key)
+        
+    Returns:
+        Cached DataFrame, or None if there is no valid entry for this key
+    """
+    if not has_cached_file(excel_file, cache_dir, key):
+        return None
+    try:
+        return pd.read_parquet(_cache_paths(cache_dir, excel_file)[0])
+    except Exception as e:
+        warnings.warn(f"Ignoring unreadable cache entry for {excel_file.name}: {e}")
         return None
 
 
-def load_all_ghgp_files(data_dir: Optional[Path] = None) -> List[pd.DataFrame]:
+def save_cached_file(excel_file: Path, cache_dir: Path, key: Dict[str, object], df: pd.DataFrame) -> None:
     """
-    Load all GHGRP Excel files from data_raw directory.
+    Store an ingested workbook in the cache.
+    
+    The key file is written last, so an interrupted write leaves an entry
+    that is simply treated as a miss.
     
     Args:
-        data_dir: Path to data directory (default: data_raw)
+        excel_file: Path to Excel file
+        cache_dir: Cache directory
+        key: Cache key (see get_cache_key)
+        df: DataFrame returned by load_ghgp_file
+    """
+    data_path, key_path = _cache_paths(cache_dir, excel_file)
+    try:
+        ensure_directory_exists(cache_dir)
+        key_path.unlink(missing_ok=True)
+        df.to_parquet(data_path, index=False, row_group_size=CACHE_ROW_GROUP_SIZE)
+        with open(key_path, 'w') as f:
+            json.dump(key, f)
+    except Exception as e:
+        warnings.warn(f"Could not cache {excel_file.name}: {e}")
+
+
+def load_ghgp_files(excel_files: List[Path],
+                    workers: Optional[int] = None,
+                    cache_dir: Optional[Path] = None,
+                    use_cache: bool = True) -> List[pd.DataFrame]:
+    """
+    Load the given GHGRP Excel files.
+    
+    Each workbook is parsed in its own worker process, since openpyxl parsing
+    is CPU-bound and single-threaded. Parsed years are kept in a Parquet cache,
+    so unchanged workbooks are not parsed again on the next run.
+    
+    Args:
+        excel_files: Paths to Excel files, in the order to return them
+        workers: Number of worker processes (default: CPU count).
+            Use 1 to load files sequentially in the current process.
+        cache_dir: Path to cache directory (default: data_cache/ingest)
+        use_cache: Whether to read and write the cache
         
     Returns:
-        List of DataFrames, one per year
+        List of DataFrames, one per successfully loaded file
     """
-    if data_dir is None:
-        data_dir = get_data_raw_path()
+    if cache_dir is None:
+        cache_dir = get_ingest_cache_path()
     
-    excel_files = find_excel_files(data_dir)
     dataframes = []
     
+    if not excel_files:
+        return dataframes
+    
+    start = time.perf_counter()
+    
+    # Serve unchanged workbooks from the cache
+    results = {}
+    cache_keys = {}
+    to_parse = []
     for excel_file in excel_files:
-        df = load_ghgp_file(excel_file)
+        if use_cache:
+            file_start = time.perf_counter()
+            cache_keys[excel_file] = get_cache_key(excel_file)
+            df = load_cached_file(excel_file, cache_dir, cache_keys[excel_file])
+            if df is not None:
+                results[excel_file] = (df, time.perf_counter() - file_start, None)
+                continue
+        to_parse.append(excel_file)
+    
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(to_parse) or 1))
+    
+    if workers == 1:
+        for excel_file in to_parse:
+            results[excel_file] = _load_ghgp_file_timed(excel_file)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_load_ghgp_file_timed, excel_file) for excel_file in to_parse]
+            for excel_file, future in zip(to_parse, futures):
+                try:
+                    results[excel_file] = future.result()
+                except Exception as e:
+                    warnings.warn(f"Error loading {excel_file.name}: {e}")
+                    results[excel_file] = (None, 0.0, 0)
+    
+    for excel_file in excel_files:
+        df, elapsed, opens = results[excel_file]
         if df is not None and not df.empty:
             dataframes.append(df)
-            print(f"✓ Loaded {excel_file.name}: {len(df)} rows, {len(df.columns)} columns")
+            if opens is None:
+                print(f"✓ Loaded {excel_file.name} from cache: {len(df)} rows, {len(df.columns)} columns "
+                      f"({elapsed:.2f}s)")
+            else:
+                print(f"✓ Loaded {excel_file.name}: {len(df)} rows, {len(df.columns)} columns "
+                      f"({elapsed:.2f}s, workbook opened {opens}x)")
+                if use_cache:
+                    save_cached_file(excel_file, cache_dir, cache_keys[excel_file], df)
         else:
             print(f"✗ Failed to load {excel_file.name}")
     
+    elapsed_total = time.perf_counter() - start
+    print(f"Ingested {len(dataframes)}/{len(excel_files)} files in {elapsed_total:.2f}s "
+          f"({len(excel_files) - len(to_parse)} from cache, {len(to_parse)} parsed using {workers} worker(s))")
+    
     return dataframes
 
 
+def iter_ghgp_chunks(excel_files: List[Path],
+                     chunk_rows: Optional[int] = None,
+                     cache_dir: Optional[Path] = None,
+                     use_cache: bool = True) -> Iterator[pd.DataFrame]:
+    """
+    Yield the given GHGRP Excel files one year, or one chunk of rows, at a time.
+    
+    Unlike load_ghgp_files, at most one year is held in memory. Cached years
+    are read from the Parquet cache in batches of chunk_rows, so only about
+    one chunk is decoded at a time; workbooks that need parsing are loaded
+    whole (openpyxl has no row-range reads), cached, and then sliced.
+    
+    Args:
+        excel_files: Paths to Excel files, in the order to yield them
+        chunk_rows: Largest number of rows per chunk (default: one chunk per year)
+        cache_dir: Path to cache directory (default: data_cache/ingest)
+        use_cache: Whether to read and write the cache
+        
+    Yields:
+        Raw DataFrames with a 'reporting_year' column, as load_ghgp_file returns them
+    """
+    if cache_dir is None:
+        cache_dir = get_ingest_cache_path()
+    
+    for excel_file in excel_files:
+        start = time.perf_counter()
+        key = get_cache_key(excel_file) if use_cache else None
+        if use_cache and has_cached_file(excel_file, cache_dir, key):
+            data_path, _ = _cache_paths(cache_dir, excel_file)
+            parquet_file = pq.ParquetFile(data_path)
+            if chunk_rows is None:
+                yield parquet_file.read().to_pandas()
+            else:
+                for batch in parquet_file.iter_batches(batch_size=chunk_rows):
+                    yield pa.Table.from_batches([batch]).to_pandas()
+            print(f"✓ Streamed {excel_file.name} from cache: {parquet_file.metadata.num_rows} rows "
+                  f"({time.perf_counter() - start:.2f}s)")
+            continue
+        
+        df, elapsed, _ = _load_ghgp_file_timed(excel_file)
+        if df is None or df.empty:
+            print(f"✗ Failed to load {excel_file.name}")
+            continue
+        if use_cache:
+            save_cached_file(excel_file, cache_dir, key, df)
+        print(f"✓ Loaded {excel_file.name}: {len(df)} rows, {len(df.columns)} columns ({elapsed:.2f}s)")
+        
+        if chunk_rows is None:
+            yield df
+        else:
+            for offset in range(0, len(df), chunk_rows):
+                yield df.iloc[offset:offset + chunk_rows].reset_index(drop=True)
+        del df
+
+
+def load_all_ghgp_files(data_dir: Optional[Path] = None,
+                        workers: Optional[int] = None,
+                        cache_dir: Optional[Path] = None,
+                        use_cache: bool = True) -> List[pd.DataFrame]:
+    """
+    Load all GHGRP Excel files from data_raw directory.
+    
+    Args:
+        data_dir: Path to data directory (default: data_raw)
+        workers: Number of worker processes (default: CPU count)
+        cache_dir: Path to cache directory (default: data_cache/ingest)
+        use_cache: Whether to read and write the cache
+        
+    Returns:
+        List of DataFrames, one per year (in year order)
+    """
+    if data_dir is None:
+        data_dir = get_data_raw_path()
+    
+    excel_files = find_excel_files(data_dir)
+    return load_ghgp_files(excel_files, workers=workers, cache_dir=cache_dir, use_cache=use_cache)
+
+
 if __name__ == "__main__":
     # Test ingestion
     dfs = load_all_ghgp_files()
@@ -2,23 +2,66 @@
 Cosine similarity module for comparing states and sectors by emissions profile.
 """
 
+import os
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from sklearn.preprocessing import StandardScaler
-from typing import Tuple
+from typing import Dict, Iterator, Optional, Tuple
 
 
-def compute_cosine_similarity_matrix(feature_matrix: pd.DataFrame, 
-                                     entity_col: str = 'state') -> pd.DataFrame:
+# Neighbours kept per entity in the top-k similarity files: most similar (the
+# backend's largest limit) and least similar
+SIMILARITY_TOP_K = 50
+SIMILARITY_BOTTOM_K = 10
+
+# Rows per block in the blocked similarity computations; a block needs about
+# 8 * DEFAULT_BLOCK_SIZE * N bytes at its peak (float32 scores and sort keys),
+# plus the selection temporaries of SELECT_ROWS rows
+DEFAULT_BLOCK_SIZE = 1024
+
+# Rows ranked at a time by top_k_neighbors; the argpartition indices and tie
+# comparisons of these rows take about 9 * SELECT_ROWS * N bytes
+SELECT_ROWS = 64
+
+# Normalized features of a blocked computation, set once in each pool worker
+_block_features: Optional[np.ndarray] = None
+
+
+def normalize_features(X: np.ndarray) -> np.ndarray:
     """
-    Compute cosine similarity matrix for entities (states or sectors).
+    Standardize feature columns and scale each row to unit length.
+    
+    The cosine similarity of two entities is the dot product of their
+    normalized rows. Rows that are all zero after scaling stay zero.
+    
+    Args:
+        X: Feature matrix (entities x features)
+        
+    Returns:
+        Normalized feature matrix of the same shape
+    """
+    # Normalize features using StandardScaler
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    # Normalize each row to unit length
+    norms = np.linalg.norm(X_scaled, axis=1, keepdims=True)
+    norms[norms == 0] = 1  # Avoid division by zero
+    return X_scaled / norms
+
+
+def _feature_values(feature_matrix: pd.DataFrame, entity_col: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split a feature matrix into entity names and numeric feature values.
     
     Args:
         feature_matrix: DataFrame with entity features
         entity_col: Name of column containing entity identifiers
         
     Returns:
-        DataFrame with cosine similarity matrix (entities x entities)
+        (entity names, feature values as entities x features)
     """
     # Extract entity names
     entities = feature_matrix[entity_col].values
@@ -30,19 +73,25 @@ def compute_cosine_similarity_matrix(feature_matrix: pd.DataFrame,
     if not feature_cols:
         raise ValueError("No numeric feature columns found")
     
-    # Extract features
-    X = feature_matrix[feature_cols].values
+    return entities, feature_matrix[feature_cols].values
+
+
+def compute_cosine_similarity_matrix(feature_matrix: pd.DataFrame, 
+                                     entity_col: str = 'state') -> pd.DataFrame:
+    """
+    Compute cosine similarity matrix for entities (states or sectors).
     
-    # Normalize features using StandardScaler
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    Args:
+        feature_matrix: DataFrame with entity features
+        entity_col: Name of column containing entity identifiers
+        
+    Returns:
+        DataFrame with cosine similarity matrix (entities x entities)
+    """
+    entities, X = _feature_values(feature_matrix, entity_col)
     
-    # Compute cosine similarity
-    # Cosine similarity = dot product of normalized vectors
-    # Normalize each row to unit length
-    norms = np.linalg.norm(X_scaled, axis=1, keepdims=True)
-    norms[norms == 0] = 1  # Avoid division by zero
-    X_normalized = X_scaled / norms
+    # Standardize and scale to unit length
+    X_normalized = normalize_features(X)
     
     # Compute similarity matrix
     similarity_matrix = np.dot(X_normalized, X_normalized.T)
@@ -102,6 +151,239 @@ def save_similarity_matrix(similarity_df: pd.DataFrame,
     print(f"✓ Saved similarity matrix to {output_path}")
 
 
+def top_k_neighbors(scores: np.ndarray,
+                    row_positions: np.ndarray,
+                    k: int = SIMILARITY_TOP_K,
+                    k_farthest: int = SIMILARITY_BOTTOM_K) -> Tuple[np.ndarray, ...]:
+    """
+    Find the k most and k_farthest least similar entities for rows of a similarity matrix.
+    
+    Each entity is excluded from its own lists. Ties are broken by entity position.
+    
+    Args:
+        scores: Similarity rows (rows x entities)
+        row_positions: Entity position of each row
+        k: Most similar neighbours per row (at most entities - 1)
+        k_farthest: Least similar neighbours per row (at most entities - 1)
+        
+    Returns:
+        (nearest positions, nearest scores, farthest positions, farthest scores);
+        nearest is most similar first, farthest least similar first
+    """
+    n_rows, n_entities = scores.shape
+    rows = np.arange(n_rows)
+    keyed = np.empty_like(scores)
+    
+    lists = []
+    for sign, k in ((1, k), (-1, k_farthest)):
+        k = max(min(k, n_entities - 1), 0)
+        # Order by descending (nearest) or ascending (farthest) score, self last;
+        # both orders reuse one buffer of sort keys
+        if sign > 0:
+            np.negative(scores, out=keyed)
+        else:
+            np.copyto(keyed, scores)
+        keyed[rows, row_positions] = np.inf
+        positions = np.empty((n_rows, k), dtype=np.int32)
+        if k > 0:
+            # A few rows at a time, so the index and comparison temporaries stay small
+            for start in range(0, n_rows, SELECT_ROWS):
+                block = keyed[start:start + SELECT_ROWS]
+                
+                # The k smallest keys of every row, sorted by key and then by position
+                candidates = np.sort(np.argpartition(block, k - 1, axis=1)[:, :k], axis=1)
+                values = np.take_along_axis(block, candidates, axis=1)
+                order = np.argsort(values, axis=1, kind='stable')
+                positions[start:start + SELECT_ROWS] = np.take_along_axis(candidates, order, axis=1)
+                
+                # Rows where other entities tie with the k-th: redo with all the tied entities
+                ties = (block <= values.max(axis=1, keepdims=True)).sum(axis=1) > k
+                for row in np.flatnonzero(ties):
+                    threshold = np.partition(block[row], k - 1)[k - 1]
+                    tied = np.flatnonzero(block[row] <= threshold)
+                    positions[start + row] = tied[np.lexsort((tied, block[row, tied]))[:k]]
+        lists += [positions, np.take_along_axis(scores, positions, axis=1)]
+    return tuple(lists)
+
+
+def _init_block_worker(X_normalized: np.ndarray) -> None:
+    """Keep the normalized features in a pool worker, so they are sent once per worker."""
+    global _block_features
+    _block_features = X_normalized
+
+
+def _block_to_memmap(start: int, stop: int, output_path: str, X_normalized: Optional[np.ndarray] = None) -> None:
+    """Compute similarity rows start:stop and write them to the output .npy file."""
+    X = _block_features if X_normalized is None else X_normalized
+    output = np.load(output_path, mmap_mode='r+')
+    output[start:stop] = X[start:stop] @ X.T
+    output.flush()
+    del output  # Unmap, so written pages do not stay resident
+
+
+def _block_to_topk(start: int, stop: int, k: int, k_farthest: int,
+                   X_normalized: Optional[np.ndarray] = None) -> Tuple[np.ndarray, ...]:
+    """Compute similarity rows start:stop and reduce them to top-k lists."""
+    X = _block_features if X_normalized is None else X_normalized
+    return top_k_neighbors(X[start:stop] @ X.T, np.arange(start, stop), k, k_farthest)
+
+
+def _run_blocks(func, X_normalized: np.ndarray, block_size: int, workers: Optional[int], *args) -> Iterator:
+    """
+    Run func(start, stop, *args) over row blocks of the normalized features.
+    
+    Args:
+        func: Block function taking the features as X_normalized when run in this process
+        X_normalized: Normalized features (entities x features)
+        block_size: Rows per block
+        workers: Number of worker processes (default: CPU count; 1 runs in this process)
+        
+    Returns:
+        Iterator over the block results, in row order
+    """
+    n = len(X_normalized)
+    spans = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(spans)))
+    
+    if workers == 1:
+        for start, stop in spans:
+            yield func(start, stop, *args, X_normalized=X_normalized)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_block_worker,
+                             initargs=(X_normalized,)) as executor:
+        futures = [executor.submit(func, start, stop, *args) for start, stop in spans]
+        for future in futures:
+            yield future.result()
+
+
+def compute_similarity_memmap(feature_matrix: pd.DataFrame,
+                              output_path: str,
+                              entity_col: str = 'state',
+                              block_size: int = DEFAULT_BLOCK_SIZE,
+                              workers: Optional[int] = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the cosine similarity matrix block by block into a memory-mapped .npy file.
+    
+    Same similarities as compute_cosine_similarity_matrix, in float32. Only
+    the normalized features and one block of rows per process are held in
+    memory; the N x N result is written to disk.
+    
+    Args:
+        feature_matrix: DataFrame with entity features
+        output_path: Path of the .npy file to write (float32, entities x entities)
+        entity_col: Name of column containing entity identifiers
+        block_size: Rows computed at a time
+        workers: Number of worker processes (default: 1; None for CPU count)
+        
+    Returns:
+        (entity names, read-only memory map of the similarity matrix)
+    """
+    entities, X = _feature_values(feature_matrix, entity_col)
+    X_normalized = normalize_features(X.astype('float32'))
+    
+    output = np.lib.format.open_memmap(output_path, mode='w+', dtype='float32',
+                                       shape=(len(entities), len(entities)))
+    del output
+    for _ in _run_blocks(_block_to_memmap, X_normalized, block_size, workers, output_path):
+        pass
+    return entities, np.load(output_path, mmap_mode='r')
+
+
+def compute_similarity_topk(feature_matrix: pd.DataFrame,
+                            entity_col: str = 'state',
+                            k: int = SIMILARITY_TOP_K,
+                            k_farthest: int = SIMILARITY_BOTTOM_K,
+                            block_size: int = DEFAULT_BLOCK_SIZE,
+                            workers: Optional[int] = 1) -> Dict[str, np.ndarray]:
+    """
+    Compute each entity's most and least similar entities block by block.
+    
+    Same similarities as compute_cosine_similarity_matrix, in float32, but
+    each block of rows is reduced to its top-k lists (top_k_neighbors) as soon
+    as it is computed, so memory is O(N*k) plus one block per process.
+    
+    Args:
+        feature_matrix: DataFrame with entity features
+        entity_col: Name of column containing entity identifiers
+        k: Most similar neighbours per entity
+        k_farthest: Least similar neighbours per entity
+        block_size: Rows computed at a time
+        workers: Number of worker processes (default: 1; None for CPU count)
+        
+    Returns:
+        Arrays as written by write_similarity_topk
+    """
+    entities, X = _feature_values(feature_matrix, entity_col)
+    X_normalized = normalize_features(X.astype('float32'))
+    
+    blocks = list(_run_blocks(_block_to_topk, X_normalized, block_size, workers, k, k_farthest))
+    nearest, nearest_scores, farthest, farthest_scores = (
+        np.concatenate([block[i] for block in blocks]) for i in range(4)
+    )
+    return {
+        'entities': np.asarray(pd.Index(entities).astype(str), dtype=str),
+        'nearest': nearest, 'nearest_scores': nearest_scores,
+        'farthest': farthest, 'farthest_scores': farthest_scores,
+    }
+
+
+def write_similarity_topk(lists: Dict[str, np.ndarray], output_path: str) -> None:
+    """
+    Write top-k similarity lists to a compact binary file.
+    
+    Stores O(N*k) scores instead of the dense N x N matrix, as an uncompressed
+    NumPy .npz archive with arrays: entities, nearest, nearest_scores,
+    farthest, farthest_scores (neighbours as positions in entities).
+    
+    Args:
+        lists: Arrays by name, as returned by compute_similarity_topk
+        output_path: Path to save the .npz file
+    """
+    # Write through a temporary file so readers never see a partial archive
+    tmp_path = f"{output_path}.tmp.npz"
+    np.savez(tmp_path, **lists)
+    Path(tmp_path).replace(output_path)
+    print(f"✓ Saved top-{lists['nearest'].shape[1]}/bottom-{lists['farthest'].shape[1]} "
+          f"similarity lists to {output_path}")
+
+
+def save_similarity_topk(similarity_df: pd.DataFrame,
+                         output_path: str,
+                         k: int = SIMILARITY_TOP_K,
+                         k_farthest: int = SIMILARITY_BOTTOM_K) -> None:
+    """
+    Save each entity's k nearest and k_farthest farthest neighbours from a dense matrix.
+    
+    Args:
+        similarity_df: Similarity matrix DataFrame (entities x entities)
+        output_path: Path to save the .npz file (see write_similarity_topk)
+        k: Most similar neighbours per entity
+        k_farthest: Least similar neighbours per entity
+    """
+    nearest, nearest_scores, farthest, farthest_scores = top_k_neighbors(
+        similarity_df.to_numpy(dtype='float64'), np.arange(len(similarity_df)), k, k_farthest
+    )
+    write_similarity_topk({
+        'entities': np.asarray(similarity_df.index.astype(str), dtype=str),
+        'nearest': nearest, 'nearest_scores': nearest_scores,
+        'farthest': farthest, 'farthest_scores': farthest_scores,
+    }, output_path)
+
+
+def load_similarity_topk(path: str) -> Dict[str, np.ndarray]:
+    """
+    Load a file written by write_similarity_topk.
+    
+    Returns:
+        Dictionary of array name -> array
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
 if __name__ == "__main__":
     # Test similarity computation
     from .ingest import load_all_ghgp_files
@@ -0,0 +1,155 @@
+"""
+Binary serving snapshot for the FastAPI backend.
+Stores the processed CSV outputs as uncompressed Arrow IPC (Feather v2) files,
+which the backend memory-maps at startup instead of parsing CSV.
+"""
+
+import hashlib
+import json
+import warnings
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pathlib import Path
+from typing import Dict, Optional
+from .utils import ensure_directory_exists
+
+
+SNAPSHOT_DIRNAME = "serving_snapshot"
+SNAPSHOT_MANIFEST_FILENAME = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+# CSV outputs served by the backend
+SNAPSHOT_SOURCES = [
+    "ghg_state_year.csv",
+    "ghg_sector_year.csv",
+    "ghg_state_sector_year.csv",
+    "similarity_states.csv",
+    "similarity_sectors.csv",
+    "ghg_facility_clean.csv",
+    "ghg_all_years_clean.csv",
+]
+
+# Binary outputs the backend reads as they are; the manifest versions them with the tables
+SNAPSHOT_FILES = [
+    "similarity_states_topk.npz",
+    "similarity_sectors_topk.npz",
+]
+
+
+def get_snapshot_path(output_dir: Path) -> Path:
+    """Get path to the serving snapshot inside the output directory."""
+    return output_dir / SNAPSHOT_DIRNAME
+
+
+def frame_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert a DataFrame to an Arrow table that reads back to the same frame.
+    
+    Numeric columns keep NaN as a value rather than a null, so they can be
+    memory-mapped without a copy when read back. Missing values in text
+    columns become nulls.
+    
+    Args:
+        df: DataFrame as read from a processed CSV
+    
+    Returns:
+        Arrow table with one column per DataFrame column
+    """
+    arrays = {}
+    for column in df.columns:
+        if df[column].dtype == object:
+            arrays[column] = pa.array(df[column], from_pandas=True)
+        else:
+            arrays[column] = pa.array(df[column].to_numpy(), from_pandas=False)
+    return pa.table(arrays)
+
+
+def write_serving_snapshot(output_dir: Path) -> Optional[Path]:
+    """
+    Write the serving snapshot for the CSV outputs in a directory.
+    
+    Each table is built by reading its CSV back the way the backend does, so
+    both load paths serve identical data. Every table is written as a single
+    record batch so its numeric columns map to contiguous arrays. The manifest
+    is written last and records the size and mtime of each source CSV and
+    binary output (SNAPSHOT_FILES); the backend ignores a snapshot whose
+    sources have changed since.
+    
+    Args:
+        output_dir: Path to data_processed directory
+    
+    Returns:
+        Path to the snapshot directory, or None if it could not be written
+    """
+    snapshot_dir = get_snapshot_path(output_dir)
+    manifest_path = snapshot_dir / SNAPSHOT_MANIFEST_FILENAME
+    
+    try:
+        ensure_directory_exists(snapshot_dir)
+        manifest_path.unlink(missing_ok=True)
+        
+        digest = hashlib.sha256()
+        tables: Dict[str, Dict] = {}
+        for source in SNAPSHOT_SOURCES:
+            source_path = output_dir / source
+            if not source_path.exists():
+                continue
+            stat = source_path.stat()
+            with warnings.catch_warnings():
+                # Mixed-type columns are kept as the backend's CSV loader reads them
+                warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+                df = pd.read_csv(source_path)
+            
+            table_path = snapshot_dir / f"{source_path.stem}.arrow"
+            tmp_path = table_path.with_suffix('.arrow.tmp')
+            feather.write_feather(frame_to_arrow(df), tmp_path,
+                                  compression='uncompressed', chunksize=max(len(df), 1))
+            tmp_path.replace(table_path)
+            
+            with open(table_path, 'rb') as f:
+                digest.update(source.encode() + b"\0")
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            
+            tables[source] = {
+                'file': table_path.name,
+                'rows': len(df),
+                'source_size': stat.st_size,
+                'source_mtime_ns': stat.st_mtime_ns,
+            }
+        
+        files: Dict[str, Dict] = {}
+        for name in SNAPSHOT_FILES:
+            path = output_dir / name
+            if not path.exists():
+                continue
+            stat = path.stat()
+            with open(path, 'rb') as f:
+                digest.update(name.encode() + b"\0")
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+            files[name] = {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+        
+        manifest = {
+            'version': SNAPSHOT_VERSION,
+            'dataset_version': digest.hexdigest(),
+            'tables': tables,
+            'files': files,
+        }
+        tmp_path = manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        tmp_path.replace(manifest_path)
+    except Exception as e:
+        warnings.warn(f"Could not write serving snapshot: {e}")
+        return None
+    
+    print(f"✓ Saved serving snapshot ({len(tables)} tables) to {snapshot_dir}")
+    return snapshot_dir
+
+
+if __name__ == "__main__":
+    # Build the snapshot for existing pipeline output
+    from .utils import get_data_processed_path
+    write_serving_snapshot(get_data_processed_path())
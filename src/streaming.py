@@ -0,0 +1,126 @@
+"""
+Streaming mode of the pipeline for data that does not fit in memory.
+Cleans and aggregates the raw data one year (or chunk of rows) at a time,
+appending the row-level exports as it goes and merging per-chunk partial
+sums, so peak memory is bounded by the chunk size rather than the history.
+"""
+
+import csv
+import os
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+from .clean import clean_ghgp_frame
+from .transform import aggregate_base_grain, merge_base_grains, prepare_facility_export, create_base_transformations
+
+
+# Partial base grains are folded into one after this many chunks, so their
+# total size stays bounded by the number of distinct keys
+MERGE_PARTIALS_EVERY = 32
+
+
+class CsvAppender:
+    """
+    Write a CSV file chunk by chunk, with the union of the chunks' columns.
+    
+    Columns are ordered by first appearance, as in pd.concat(..., sort=False).
+    Chunks missing a column get empty fields. If a later chunk brings new
+    columns, the rows written before it are padded with empty fields when
+    the file is closed (one pass over the file, a line at a time).
+    """
+    
+    def __init__(self, path: Path):
+        """
+        Initialize CsvAppender.
+        
+        Args:
+            path: Output CSV file (overwritten)
+        """
+        self.path = Path(path)
+        self.columns: List[str] = []
+        self.rows = 0
+        self._widened = False  # Columns were added after the first chunk
+        self.path.unlink(missing_ok=True)
+    
+    def append(self, df: pd.DataFrame) -> None:
+        """Append the rows of a chunk."""
+        new_columns = [col for col in df.columns if col not in self.columns]
+        first = not self.columns
+        self._widened = self._widened or (bool(new_columns) and not first)
+        self.columns += new_columns
+        
+        if list(df.columns) != self.columns:
+            df = df.reindex(columns=self.columns)
+        df.to_csv(self.path, mode='w' if first else 'a', header=first, index=False)
+        self.rows += len(df)
+    
+    def close(self) -> None:
+        """Finish the file: rewrite the header and pad early rows if columns were added."""
+        if not self._widened:
+            return
+        
+        width = len(self.columns)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(self.path, newline='') as source, open(temp_path, 'w', newline='') as target:
+            reader = csv.reader(source)
+            writer = csv.writer(target, lineterminator=os.linesep)
+            next(reader)
+            writer.writerow(self.columns)
+            for row in reader:
+                writer.writerow(row + [''] * (width - len(row)))
+        os.replace(temp_path, self.path)
+        self._widened = False
+
+
+def stream_clean_transform(chunks: Iterable[pd.DataFrame],
+                           clean_file: Path,
+                           facility_file: Path,
+                           compact: bool = False) -> Tuple[Dict[str, pd.DataFrame], Dict[str, int]]:
+    """
+    Clean and aggregate raw GHGRP data chunk by chunk.
+    
+    Each chunk is cleaned on its own (cleaning is row-wise), appended to the
+    cleaned and facility-level exports, and reduced to its state x sector x
+    year base grain. The partial base grains are merged into the aggregates
+    and feature matrices at the end.
+    
+    Args:
+        chunks: Raw DataFrames (see src.ingest.iter_ghgp_chunks)
+        clean_file: Output path of the cleaned dataset
+        facility_file: Output path of the facility-level export
+        compact: Clean into memory-lean dtypes (categoricals, float32, int16)
+    
+    Returns:
+        (transformations as create_base_transformations returns them,
+        row counts of the 'clean' and 'facility' exports)
+    """
+    clean_writer = CsvAppender(clean_file)
+    facility_writer = CsvAppender(facility_file)
+    partials = []
+    
+    chunk_count = 0
+    for chunk in chunks:
+        chunk_count += 1
+        df_clean = clean_ghgp_frame(chunk, compact=compact, verbose=False)
+        del chunk
+        
+        clean_writer.append(df_clean)
+        facility_writer.append(prepare_facility_export(df_clean))
+        partials.append(aggregate_base_grain(df_clean))
+        print(f"✓ Chunk {chunk_count}: {len(df_clean)} cleaned rows")
+        del df_clean
+        
+        if len(partials) >= MERGE_PARTIALS_EVERY:
+            partials = [merge_base_grains(partials)]
+    
+    if not chunk_count:
+        raise ValueError("No DataFrames provided")
+    
+    clean_writer.close()
+    facility_writer.close()
+    print(f"✓ Final cleaned dataset: {clean_writer.rows} rows, {len(clean_writer.columns)} columns")
+    
+    print("Merging state x sector x year base aggregates...")
+    transformations = create_base_transformations(merge_base_grains(partials))
+    
+    return transformations, {'clean': clean_writer.rows, 'facility': facility_writer.rows}
@@ -1,66 +1,181 @@
 """
 Data transformation module for GHGRP data.
 Creates aggregated datasets for state-year, sector-year, and facility-level analysis.
+
+All emissions aggregates are rolled up from a single state x sector x year
+base grain, so the facility-level data is only grouped once per run.
 """
 
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Iterable, Optional
 
 
-def aggregate_state_year(df: pd.DataFrame) -> pd.DataFrame:
+# Emissions columns summed at every grain: cleaned column -> output column
+EMISSIONS_COLUMNS = {
+    'total_reported_direct_emissions': 'total_emissions',
+    'co2_emissions_non_biogenic': 'co2',
+    'ch4_emissions': 'ch4',
+    'n2o_emissions': 'n2o',
+}
+
+# Key columns of the base grain
+BASE_GRAIN_KEYS = ['state', 'sector', 'year']
+
+# Grain name -> grouping keys (a subset of the base grain keys)
+GRAINS = {
+    'state_sector_year': ['state', 'sector', 'year'],
+    'state_year': ['state', 'year'],
+    'sector_year': ['sector', 'year'],
+    'state_sector': ['state', 'sector'],
+    'state': ['state'],
+    'sector': ['sector'],
+    'year': ['year'],
+}
+
+
+def fill_missing_sectors(sectors: pd.Series) -> pd.Series:
     """
-    Aggregate emissions by state and year.
+    Fill missing sector names with 'Unknown'.
+    
+    Works for categorical columns too, keeping the categories sorted so that
+    grouping and sorting order is the same as for plain strings.
+    
+    Args:
+        sectors: industry_type_sectors column
+        
+    Returns:
+        Series with missing values replaced by 'Unknown'
+    """
+    if isinstance(sectors.dtype, pd.CategoricalDtype) and 'Unknown' not in sectors.cat.categories:
+        sectors = sectors.cat.set_categories(sorted([*sectors.cat.categories, 'Unknown']))
+    return sectors.fillna('Unknown')
+
+
+def aggregate_base_grain(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate emissions at the finest grain (state x sector x year) in one pass.
+    
+    Rows without a state are kept (state is NaN) so that sector rollups still
+    include them; state rollups drop them. Missing sectors become 'Unknown'.
+    If the state or sector column is absent, that key is left out of the base.
     
     Args:
         df: Cleaned GHGRP DataFrame
         
     Returns:
-        DataFrame with columns: state, year, total_emissions, co2, ch4, n2o, facility_count
+        DataFrame with columns: state, sector, year, total_emissions, co2, ch4,
+        n2o, facility_count (emissions columns only if present in df)
     """
-    if 'state' not in df.columns or 'reporting_year' not in df.columns:
-        raise ValueError("DataFrame must contain 'state' and 'reporting_year' columns")
+    if 'reporting_year' not in df.columns:
+        raise ValueError("DataFrame must contain 'reporting_year' column")
+    
+    # Group by the key series directly, no copy of df
+    keys = []
+    if 'state' in df.columns:
+        keys.append(df['state'])
+    if 'industry_type_sectors' in df.columns:
+        keys.append(fill_missing_sectors(df['industry_type_sectors']).rename('sector'))
+    keys.append(df['reporting_year'].rename('year'))
+    
+    agg_dict = {col: 'sum' for col in EMISSIONS_COLUMNS if col in df.columns}
+    agg_dict['facility_id'] = 'count'
     
-    agg_dict = {}
+    df_base = df.groupby(keys, observed=True, dropna=False).agg(agg_dict).reset_index()
+    df_base = df_base.rename(columns={**EMISSIONS_COLUMNS, 'facility_id': 'facility_count'})
     
-    # Aggregate emissions (use actual column names)
-    if 'total_reported_direct_emissions' in df.columns:
-        agg_dict['total_reported_direct_emissions'] = 'sum'
-    if 'co2_emissions_non_biogenic' in df.columns:
-        agg_dict['co2_emissions_non_biogenic'] = 'sum'
-    if 'ch4_emissions' in df.columns:
-        agg_dict['ch4_emissions'] = 'sum'
-    if 'n2o_emissions' in df.columns:
-        agg_dict['n2o_emissions'] = 'sum'
+    return df_base
+
+
+def merge_base_grains(partials: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Merge base grains aggregated from separate chunks of the cleaned data.
     
-    # Count facilities
-    agg_dict['facility_id'] = 'count'
+    Every base grain column is a sum (facility_count counts rows), so the
+    base grain of the whole data is the sum of the chunks' base grains per key.
     
-    df_agg = df.groupby(['state', 'reporting_year']).agg(agg_dict).reset_index()
+    Args:
+        partials: Outputs of aggregate_base_grain, one per chunk
+        
+    Returns:
+        DataFrame in the layout of aggregate_base_grain
+    """
+    df_base = pd.concat(partials, ignore_index=True, sort=False)
+    keys = [key for key in BASE_GRAIN_KEYS if key in df_base.columns]
+    value_cols = [col for col in df_base.columns if col not in BASE_GRAIN_KEYS]
     
-    # Rename columns to output format
-    rename_dict = {
-        'facility_id': 'facility_count',
-        'reporting_year': 'year',
-        'total_reported_direct_emissions': 'total_emissions',
-        'co2_emissions_non_biogenic': 'co2',
-        'ch4_emissions': 'ch4',
-        'n2o_emissions': 'n2o'
-    }
-    df_agg = df_agg.rename(columns=rename_dict)
+    # Chunks may have different categories, so merge the keys as plain values
+    for key in keys:
+        if isinstance(df_base[key].dtype, pd.CategoricalDtype):
+            df_base[key] = df_base[key].astype(object)
     
-    # Fill missing values with 0
-    emissions_cols = ['total_emissions', 'co2', 'ch4', 'n2o']
-    for col in emissions_cols:
-        if col in df_agg.columns:
-            df_agg[col] = df_agg[col].fillna(0)
+    # Chunks without a sector column count as 'Unknown', as when concatenated first
+    if 'sector' in df_base.columns:
+        df_base['sector'] = fill_missing_sectors(df_base['sector'])
     
-    # Sort by state and year
-    df_agg = df_agg.sort_values(['state', 'year'])
+    return df_base.groupby(keys, dropna=False)[value_cols].sum().reset_index()
+
+
+def rollup(df_base: pd.DataFrame, grain: str) -> pd.DataFrame:
+    """
+    Roll the base grain up to a coarser grain by summing.
+    
+    Args:
+        df_base: Output of aggregate_base_grain
+        grain: Grain name (a key of GRAINS)
+        
+    Returns:
+        DataFrame with the grain's key columns followed by the summed
+        emissions and facility_count columns, sorted by the keys
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of: {', '.join(GRAINS)}")
+    
+    keys = GRAINS[grain]
+    missing = [key for key in keys if key not in df_base.columns]
+    if missing:
+        raise ValueError(f"Base grain has no {', '.join(missing)} column for grain '{grain}'")
+    
+    value_cols = [col for col in df_base.columns if col not in BASE_GRAIN_KEYS]
+    
+    # Missing states are dropped here, as in a direct groupby on the state
+    df_agg = df_base.groupby(keys, observed=True)[value_cols].sum().reset_index()
     
     return df_agg
 
 
+def aggregate_all_grains(df: pd.DataFrame,
+                         grains: Optional[Iterable[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Aggregate emissions at several grains from a single pass over df.
+    
+    Args:
+        df: Cleaned GHGRP DataFrame
+        grains: Grain names to compute (default: all of GRAINS)
+        
+    Returns:
+        Dictionary of grain name -> aggregated DataFrame
+    """
+    df_base = aggregate_base_grain(df)
+    return {grain: rollup(df_base, grain) for grain in (grains or GRAINS)}
+
+
+def aggregate_state_year(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate emissions by state and year.
+    
+    Args:
+        df: Cleaned GHGRP DataFrame
+        
+    Returns:
+        DataFrame with columns: state, year, total_emissions, co2, ch4, n2o, facility_count
+    """
+    if 'state' not in df.columns or 'reporting_year' not in df.columns:
+        raise ValueError("DataFrame must contain 'state' and 'reporting_year' columns")
+    
+    return rollup(aggregate_base_grain(df), 'state_year')
+
+
 def aggregate_sector_year(df: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregate emissions by sector and year.
@@ -74,48 +189,23 @@ def aggregate_sector_year(df: pd.DataFrame) -> pd.DataFrame:
     if 'industry_type_sectors' not in df.columns or 'reporting_year' not in df.columns:
         raise ValueError("DataFrame must contain 'industry_type_sectors' and 'reporting_year' columns")
     
-    # Handle missing sectors
-    df_work = df.copy()
-    df_work['sector'] = df_work['industry_type_sectors'].fillna('Unknown')
-    
-    agg_dict = {}
-    
-    # Aggregate emissions (use actual column names)
-    if 'total_reported_direct_emissions' in df_work.columns:
-        agg_dict['total_reported_direct_emissions'] = 'sum'
-    if 'co2_emissions_non_biogenic' in df_work.columns:
-        agg_dict['co2_emissions_non_biogenic'] = 'sum'
-    if 'ch4_emissions' in df_work.columns:
-        agg_dict['ch4_emissions'] = 'sum'
-    if 'n2o_emissions' in df_work.columns:
-        agg_dict['n2o_emissions'] = 'sum'
-    
-    # Count facilities
-    agg_dict['facility_id'] = 'count'
-    
-    df_agg = df_work.groupby(['sector', 'reporting_year']).agg(agg_dict).reset_index()
-    
-    # Rename columns to output format
-    rename_dict = {
-        'facility_id': 'facility_count',
-        'reporting_year': 'year',
-        'total_reported_direct_emissions': 'total_emissions',
-        'co2_emissions_non_biogenic': 'co2',
-        'ch4_emissions': 'ch4',
-        'n2o_emissions': 'n2o'
-    }
-    df_agg = df_agg.rename(columns=rename_dict)
-    
-    # Fill missing values with 0
-    emissions_cols = ['total_emissions', 'co2', 'ch4', 'n2o']
-    for col in emissions_cols:
-        if col in df_agg.columns:
-            df_agg[col] = df_agg[col].fillna(0)
+    return rollup(aggregate_base_grain(df), 'sector_year')
+
+
+def aggregate_state_sector_year(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate emissions by state, sector and year.
     
-    # Sort by sector and year
-    df_agg = df_agg.sort_values(['sector', 'year'])
+    Args:
+        df: Cleaned GHGRP DataFrame
+        
+    Returns:
+        DataFrame with columns: state, sector, year, total_emissions, co2, ch4, n2o, facility_count
+    """
+    if 'state' not in df.columns or 'industry_type_sectors' not in df.columns:
+        raise ValueError("DataFrame must contain 'state' and 'industry_type_sectors' columns")
     
-    return df_agg
+    return rollup(aggregate_base_grain(df), 'state_sector_year')
 
 
 def prepare_facility_export(df: pd.DataFrame) -> pd.DataFrame:
@@ -138,17 +228,47 @@ def prepare_facility_export(df: pd.DataFrame) -> pd.DataFrame:
     
     # Keep only columns that exist
     available_cols = [col for col in facility_cols if col in df.columns]
-    df_export = df[available_cols].copy()
+    df_export = df[available_cols]
     
     return df_export
 
 
-def create_state_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
+def add_derived_features(df_entity: pd.DataFrame, require_positive_total: bool = True) -> pd.DataFrame:
+    """
+    Add mean emissions per facility and gas shares to per-entity totals.
+    
+    Args:
+        df_entity: Entity key column followed by summed emissions and facility_count
+        require_positive_total: Only add gas shares if total emissions are positive
+        
+    Returns:
+        The same DataFrame with the derived feature columns added
+    """
+    if 'total_emissions' in df_entity.columns and 'facility_count' in df_entity.columns:
+        df_entity['mean_emissions_per_facility'] = (
+            df_entity['total_emissions'] / df_entity['facility_count'].replace(0, 1)
+        )
+    
+    if 'total_emissions' in df_entity.columns:
+        if not require_positive_total or df_entity['total_emissions'].sum() > 0:
+            for gas in ['co2', 'ch4', 'n2o']:
+                if gas in df_entity.columns:
+                    df_entity[f'share_{gas}'] = df_entity[gas] / df_entity['total_emissions'].replace(0, 1)
+    
+    # Fill NaN values (numeric columns only, the key may be categorical)
+    numeric_cols = df_entity.select_dtypes('number').columns
+    df_entity[numeric_cols] = df_entity[numeric_cols].fillna(0)
+    
+    return df_entity
+
+
+def create_state_feature_matrix(df: pd.DataFrame, df_base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Create feature matrix for states (for similarity analysis).
     
     Args:
         df: Cleaned GHGRP DataFrame
+        df_base: Precomputed output of aggregate_base_grain(df), if available
         
     Returns:
         DataFrame with state features (normalized)
@@ -156,60 +276,19 @@ def create_state_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
     if 'state' not in df.columns:
         raise ValueError("DataFrame must contain 'state' column")
     
-    # Aggregate by state (across all years)
-    agg_dict = {}
+    if df_base is None:
+        df_base = aggregate_base_grain(df)
     
-    if 'total_reported_direct_emissions' in df.columns:
-        agg_dict['total_reported_direct_emissions'] = 'sum'
-    if 'co2_emissions_non_biogenic' in df.columns:
-        agg_dict['co2_emissions_non_biogenic'] = 'sum'
-    if 'ch4_emissions' in df.columns:
-        agg_dict['ch4_emissions'] = 'sum'
-    if 'n2o_emissions' in df.columns:
-        agg_dict['n2o_emissions'] = 'sum'
-    
-    agg_dict['facility_id'] = 'count'
-    
-    df_state = df.groupby('state').agg(agg_dict).reset_index()
-    
-    # Rename columns
-    rename_dict = {
-        'facility_id': 'facility_count',
-        'total_reported_direct_emissions': 'total_emissions',
-        'co2_emissions_non_biogenic': 'co2',
-        'ch4_emissions': 'ch4',
-        'n2o_emissions': 'n2o'
-    }
-    df_state = df_state.rename(columns=rename_dict)
-    
-    # Calculate derived features
-    if 'total_emissions' in df_state.columns and 'facility_count' in df_state.columns:
-        df_state['mean_emissions_per_facility'] = (
-            df_state['total_emissions'] / df_state['facility_count'].replace(0, 1)
-        )
-    
-    if 'total_emissions' in df_state.columns:
-        total = df_state['total_emissions'].sum()
-        if total > 0:
-            if 'co2' in df_state.columns:
-                df_state['share_co2'] = df_state['co2'] / df_state['total_emissions'].replace(0, 1)
-            if 'ch4' in df_state.columns:
-                df_state['share_ch4'] = df_state['ch4'] / df_state['total_emissions'].replace(0, 1)
-            if 'n2o' in df_state.columns:
-                df_state['share_n2o'] = df_state['n2o'] / df_state['total_emissions'].replace(0, 1)
-    
-    # Fill NaN values
-    df_state = df_state.fillna(0)
-    
-    return df_state
+    return add_derived_features(rollup(df_base, 'state'))
 
 
-def create_sector_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
+def create_sector_feature_matrix(df: pd.DataFrame, df_base: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Create feature matrix for sectors (for similarity analysis).
     
     Args:
         df: Cleaned GHGRP DataFrame
+        df_base: Precomputed output of aggregate_base_grain(df), if available
         
     Returns:
         DataFrame with sector features (normalized)
@@ -217,90 +296,98 @@ def create_sector_feature_matrix(df: pd.DataFrame) -> pd.DataFrame:
     if 'industry_type_sectors' not in df.columns:
         raise ValueError("DataFrame must contain 'industry_type_sectors' column")
     
-    df_work = df.copy()
-    df_work['sector'] = df_work['industry_type_sectors'].fillna('Unknown')
-    
-    # Aggregate by sector (across all years)
-    agg_dict = {}
+    if df_base is None:
+        df_base = aggregate_base_grain(df)
     
-    if 'total_reported_direct_emissions' in df_work.columns:
-        agg_dict['total_reported_direct_emissions'] = 'sum'
-    if 'co2_emissions_non_biogenic' in df_work.columns:
-        agg_dict['co2_emissions_non_biogenic'] = 'sum'
-    if 'ch4_emissions' in df_work.columns:
-        agg_dict['ch4_emissions'] = 'sum'
-    if 'n2o_emissions' in df_work.columns:
-        agg_dict['n2o_emissions'] = 'sum'
-    
-    agg_dict['facility_id'] = 'count'
+    return add_derived_features(rollup(df_base, 'sector'), require_positive_total=False)
+
+
+def create_feature_matrix_from_year_aggregates(df_year: pd.DataFrame,
+                                               entity_col: str = 'state') -> pd.DataFrame:
+    """
+    Create a feature matrix from state-year or sector-year aggregates.
     
-    df_sector = df_work.groupby('sector').agg(agg_dict).reset_index()
-    
-    # Rename columns
-    rename_dict = {
-        'facility_id': 'facility_count',
-        'total_reported_direct_emissions': 'total_emissions',
-        'co2_emissions_non_biogenic': 'co2',
-        'ch4_emissions': 'ch4',
-        'n2o_emissions': 'n2o'
-    }
-    df_sector = df_sector.rename(columns=rename_dict)
-    
-    # Calculate derived features
-    if 'total_emissions' in df_sector.columns and 'facility_count' in df_sector.columns:
-        df_sector['mean_emissions_per_facility'] = (
-            df_sector['total_emissions'] / df_sector['facility_count'].replace(0, 1)
-        )
+    Produces the same features as create_state_feature_matrix and
+    create_sector_feature_matrix, but sums the per-year aggregates instead of
+    re-scanning the facility-level data.
     
-    if 'total_emissions' in df_sector.columns:
-        if 'co2' in df_sector.columns:
-            df_sector['share_co2'] = df_sector['co2'] / df_sector['total_emissions'].replace(0, 1)
-        if 'ch4' in df_sector.columns:
-            df_sector['share_ch4'] = df_sector['ch4'] / df_sector['total_emissions'].replace(0, 1)
-        if 'n2o' in df_sector.columns:
-            df_sector['share_n2o'] = df_sector['n2o'] / df_sector['total_emissions'].replace(0, 1)
+    Args:
+        df_year: Output of aggregate_state_year or aggregate_sector_year
+        entity_col: Entity column ('state' or 'sector')
+        
+    Returns:
+        DataFrame with entity features
+    """
+    if entity_col not in df_year.columns:
+        raise ValueError(f"DataFrame must contain '{entity_col}' column")
     
-    # Fill NaN values
-    df_sector = df_sector.fillna(0)
+    sum_cols = [col for col in ['total_emissions', 'co2', 'ch4', 'n2o', 'facility_count']
+                if col in df_year.columns]
+    df_entity = df_year.groupby(entity_col, observed=True)[sum_cols].sum().reset_index()
     
-    return df_sector
+    # Sector features keep their gas shares whatever the total, as in create_sector_feature_matrix
+    return add_derived_features(df_entity, require_positive_total=(entity_col == 'state'))
 
 
-def create_all_transformations(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+def create_base_transformations(df_base: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     """
-    Create all transformation outputs.
+    Create the aggregate and feature matrix outputs from the base grain.
     
     Args:
-        df: Cleaned GHGRP DataFrame
+        df_base: Output of aggregate_base_grain (or merge_base_grains)
         
     Returns:
-        Dictionary of transformed DataFrames
+        Dictionary of transformed DataFrames (every output of
+        create_all_transformations but the facility export)
     """
     results = {}
     
+    results['state_sector_year'] = rollup(df_base, 'state_sector_year')
+    print(f"✓ State-sector-year: {len(results['state_sector_year'])} rows")
+    
     print("Creating state-year aggregates...")
-    results['state_year'] = aggregate_state_year(df)
+    results['state_year'] = rollup(df_base, 'state_year')
     print(f"✓ State-year: {len(results['state_year'])} rows")
     
     print("Creating sector-year aggregates...")
-    results['sector_year'] = aggregate_sector_year(df)
+    results['sector_year'] = rollup(df_base, 'sector_year')
     print(f"✓ Sector-year: {len(results['sector_year'])} rows")
     
-    print("Preparing facility export...")
-    results['facility'] = prepare_facility_export(df)
-    print(f"✓ Facility: {len(results['facility'])} rows")
-    
     print("Creating state feature matrix...")
-    results['state_features'] = create_state_feature_matrix(df)
+    results['state_features'] = add_derived_features(rollup(df_base, 'state'))
     print(f"✓ State features: {len(results['state_features'])} rows")
     
     print("Creating sector feature matrix...")
-    results['sector_features'] = create_sector_feature_matrix(df)
+    results['sector_features'] = add_derived_features(rollup(df_base, 'sector'), require_positive_total=False)
     print(f"✓ Sector features: {len(results['sector_features'])} rows")
     
     return results
 
 
+def create_all_transformations(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Create all transformation outputs.
+    
+    The facility-level data is aggregated once at the state x sector x year
+    grain; every other aggregate is rolled up from it.
+    
+    Args:
+        df: Cleaned GHGRP DataFrame
+        
+    Returns:
+        Dictionary of transformed DataFrames
+    """
+    print("Creating state x sector x year base aggregates...")
+    df_base = aggregate_base_grain(df)
+    results = create_base_transformations(df_base)
+    
+    print("Preparing facility export...")
+    results['facility'] = prepare_facility_export(df)
+    print(f"✓ Facility: {len(results['facility'])} rows")
+    
+    return results
+
+
 if __name__ == "__main__":
     # Test transformations
     from .ingest import load_all_ghgp_files
@@ -34,6 +34,11 @@ def get_data_processed_path() -> Path:
     return Path(__file__).parent.parent / "data_processed"
 
 
+def get_ingest_cache_path() -> Path:
+    """Get path to the cache of ingested Excel files."""
+    return Path(__file__).parent.parent / "data_cache" / "ingest"
+
+
 def ensure_directory_exists(path: Path) -> None:
     """Create directory if it doesn't exist."""
     path.mkdir(parents=True, exist_ok=True)
@@ -15,7 +15,8 @@ fi
 # Start backend API server
 echo "Starting Backend API (port 8001)..."
 cd backend
-python3 -m uvicorn main:app --host 0.0.0.0 --port 8001 --reload &
+# No --reload: the backend picks up new data_processed/ output itself
+python3 -m uvicorn main:app --host 0.0.0.0 --port 8001 &
 BACKEND_PID=$!
 cd ..
 
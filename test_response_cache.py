@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Regression test: a batch pinned to an old snapshot must not leak its
+responses into the response cache after a reload
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+
+from backend.batch import _get, run_batch
+from backend.cache import ResponseCache, ResponseCacheMiddleware, make_etag
+from backend.utils import DataManager
+
+
+def test_reload_during_batch():
+    """A sub-request finishing on the old version after a reload leaves the new version's cache intact."""
+    manager = DataManager(data_dir=Path("."))
+    old = SimpleNamespace(dataset_version="v1")
+    new = SimpleNamespace(dataset_version="v2")
+    manager._snapshot = old
+    
+    async def scenario():
+        gate = asyncio.Event()
+        app = FastAPI()
+        
+        @app.get("/api/value")
+        async def value():
+            version = manager.snapshot.dataset_version
+            if version == "v1":
+                await gate.wait()
+            return {"version": version}
+        
+        cache = ResponseCache()
+        wrapped = ResponseCacheMiddleware(
+            app, cache=cache,
+            get_version=lambda: manager.dataset_version,
+            get_live_version=lambda: manager.live_version,
+        )
+        
+        async def batch(snapshot):
+            with manager.pinned(snapshot):
+                return await run_batch(wrapped, ["/value"], snapshot.dataset_version)
+        
+        # The batch pins v1, then a reload swaps in v2 before its sub-request runs
+        snapshot = manager.snapshot
+        manager._snapshot = new
+        pending = asyncio.create_task(batch(snapshot))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        
+        status, body = await _get(wrapped, "/api/value", b"")
+        assert status == 200 and json.loads(body) == {"version": "v2"}
+        
+        gate.set()
+        batch_body = json.loads(await pending)
+        assert batch_body["results"][0]["body"] == {"version": "v1"}
+        
+        # The same path on the live version still gets the v2 body, from the cache
+        hits = cache.hits
+        status, body = await _get(wrapped, "/api/value", b"")
+        assert status == 200 and json.loads(body) == {"version": "v2"}
+        assert cache.hits == hits + 1
+        assert cache.version == "v2" and len(cache) == 1
+        
+        # And its ETag is the v2 tag
+        headers = {}
+        
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                headers.update(message['headers'])
+        
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        
+        await wrapped({'type': 'http', 'method': 'GET', 'path': '/api/value', 'query_string': b'',
+                       'headers': []}, receive, capture)
+        assert headers[b'etag'] == make_etag("v2", "/api/value").encode()
+    
+    asyncio.run(scenario())